@@ -24,8 +24,9 @@ def cli(ctx, prod, profile):
 
     # Set profile
     ctx.obj['PROFILE'] = profile
-    # Set Saxo object
-    ctx.obj['SAXO'] = Saxo(profile_name=ctx.obj['PROFILE'])
+    # Set Saxo object, watch-all creates one per profile (see SaxoFanout)
+    if ctx.invoked_subcommand != "watch-all":
+        ctx.obj['SAXO'] = Saxo(profile_name=ctx.obj['PROFILE'])
     os.environ["PRODUCTION"] = str(prod)
 
 @cli.command()
@@ -192,29 +193,30 @@ def trade(ctx, signal, tweet):
         from northy.db import Database
         db = Database()
         for doc in db.find({"tid": tweet}):
-            for signal in doc["signals"]:
-                saxo.trade(signal=signal)
+            saxo.trade_many(doc["signals"])
     
     else:
         click.echo(ctx.get_help())
 
 @cli.command()
-@click.option('--symbol', default="NDX", type=str, help='Get Latest Price for Symbol')
+@click.option('--symbol', default="NDX", type=str, help='Get Latest Price for Symbol (comma separated)')
 @click.pass_context
 def price(ctx, symbol):
     """ 
         Get Latest Price for Symbol 
 
         Example:
-        python cli_saxo.py price --symbol NDX
+        python cli_saxo.py price --symbol NDX,SPX
     """
     saxo = ctx.obj['SAXO']
     saxo_helper = SaxoHelper()
 
     if symbol:
-        uic = saxo_helper.symbol_to_uic(symbol)
-        price = saxo.price(uic)
-        logger.info(price)
+        # Fetch all prices in one request
+        uics = [saxo_helper.symbol_to_uic(s.strip()) for s in symbol.split(",")]
+        prices = saxo.prices([uic for uic in uics if uic is not None])
+        for uic, price in prices.items():
+            logger.info(price)
     
     else:
         click.echo(ctx.get_help())
@@ -238,11 +240,22 @@ def instruments(ctx):
     print(saxo.instruments())
 
 @cli.command()
+@click.option('--stream_prices', default=False, is_flag=True, type=bool,
+              help='Stream prices of all tickers (no price requests when trading)')
+@click.option('--stream_portfolio', default=False, is_flag=True, type=bool,
+              help='Stream positions and orders (no position requests when trading)')
 @click.pass_context
-def watch(ctx):
+def watch(ctx, stream_prices, stream_portfolio):
     """
         Watch for alerts and execute trades
     """
+    # Pre-authenticate, build order templates and keep the connection warm
+    ctx.obj['SAXO'].warm_up()
+    if stream_prices:
+        ctx.obj['SAXO'].stream_prices()
+    if stream_portfolio:
+        ctx.obj['SAXO'].stream_portfolio()
+
     while True:
         try:
             saxo = ctx.obj['SAXO']
@@ -252,6 +265,26 @@ def watch(ctx):
             p.send(f"cli_saxo.py watch crashed \n{e}\nRestarting..")
             logger.error(e, exc_info=True)
 
+@cli.command()
+@click.option('--profiles', default=None, type=str,
+              help='Comma separated list of profiles (default: all profiles)')
+@click.pass_context
+def watch_all(ctx, profiles):
+    """
+        Watch for alerts and execute trades on multiple accounts
+    """
+    from northy.saxo_fanout import SaxoFanout
+    names = profiles.split(",") if profiles else None
+    fanout = SaxoFanout.from_profiles(names)
+    fanout.warm_up()
+    while True:
+        try:
+            fanout.watch()
+        except Exception as e:
+            p = Prowl()
+            p.send(f"cli_saxo.py watch-all crashed \n{e}\nRestarting..")
+            logger.error(e, exc_info=True)
+
 if __name__ == '__main__':
     # Automatically add all commands to the group
     for name, obj in globals().copy().items():
@@ -1,12 +1,17 @@
 import os
 import click
+import itertools
+import numpy as np
 import inspect
 import logging
 from northy.config import Config
 from northy.prowl import Prowl
-from northy.signal2 import Signal
+from northy.signal2 import Signal, SignalHelper
+from northy.bars import BarStore, YAHOO_TICKERS
+from northy.backtest import Backtester, Params
 from northy.logger import setup_logger
 from northy.utils import Utils
+from datetime import date, timedelta
 
 config = Config().config
 
@@ -36,6 +41,85 @@ def parse(ctx, tid, update_db):
     else:
         click.echo(ctx.get_help())
 
+@cli.command()
+@click.option('--limit', default=0, type=int, help='Max number of tweets to parse (default: all)')
+@click.option('--batch_size', default=500, type=int, help='Tweets per chunk (default: 500)')
+@click.option('--workers', default=0, type=int, help='Number of worker processes (default: 0, parse inline)')
+@click.option('--force', default=False, is_flag=True, type=bool, help='Parse tweets with an up-to-date fingerprint too')
+def updateall(limit, batch_size, workers, force):
+    """
+        Re-parse trading signals of all alert tweets.
+    """
+    def progress(c):
+        logger.info(f"{c['read']}/{c['total']} read, {c['parsed']} parsed, {c['skipped']} skipped, "
+                    f"{c['failed']} failed, {c['modified']} modified ({c['rate']:.0f} tweets/sec)")
+
+    signal = Signal()
+    c = signal.parse_many(limit=limit, force=force, batch_size=batch_size, workers=workers, progress=progress)
+    logger.info(f"Done in {c['elapsed']:.1f}s ({c['rate']:.0f} tweets/sec)")
+
+@cli.command()
+@click.option('--bars', default=".bars", type=str, help='Bar store directory (default: .bars, intraday bars in .bars/<interval>)')
+@click.option('--interval', default="1d", type=str, help='Bar size, e.g. 1d, 1h, 5m (default: 1d)')
+@click.option('--history', default=365, type=int, help='Days to backtest, and to download when a symbol has no bars (default: 365)')
+@click.option('--seed', default=None, type=str, help='Directory of <SYMBOL>.csv files to seed the bar store from, e.g. years of intraday bars')
+@click.option('--no_update', default=False, is_flag=True, type=bool, help="Don't download missing bars from Yahoo Finance")
+@click.option('--stop', multiple=True, type=str, help='Stop points to try for a symbol, e.g. SPX=10,15 (default: stop of the signal)')
+@click.option('--scale_out', default="0.25", type=str, help='Scale out fractions to try, e.g. 0.25,0.5 (default: 0.25)')
+@click.option('--order', default="Market", type=str, help='Order preferences to try, e.g. Market,Limit (default: Market)')
+@click.option('--workers', default=0, type=int, help='Number of worker processes (default: 0, run inline)')
+@click.option('--output', default="backtest.csv", type=str, help='Stats of every run (default: backtest.csv)')
+@click.option('--equity', default="equity.csv", type=str, help='Equity curve of the best run (default: equity.csv)')
+def pnl(bars, interval, history, seed, no_update, stop, scale_out, order, workers, output, equity):
+    """
+        Backtest the P&L of all signals against stored bars, for every
+        combination of parameters.
+
+        Yahoo Finance only has recent intraday bars (e.g. 60 days of 5m
+        bars), seed older ones from CSV files.
+
+        Example:
+        python cli_signal.py pnl --interval 5m --history 1825 --seed data/5m --stop SPX=10,15 --stop NDX=25,50 --scale_out 0.25,0.5 --order Market,Limit --workers 4
+    """
+    directory = bars if interval == "1d" else os.path.join(bars, interval)
+    store = BarStore(directory=directory, history=history, interval=interval)
+    symbols = list(SignalHelper().tickers)
+    for symbol in symbols:
+        if seed and os.path.exists(os.path.join(seed, f"{symbol}.csv")):
+            added = store.seed_csv(symbol, os.path.join(seed, f"{symbol}.csv"))
+            logger.info(f"Seeded {added} {interval} bars of {symbol}")
+        if not no_update and symbol in YAHOO_TICKERS:
+            try:
+                store.update(symbol, YAHOO_TICKERS[symbol])
+            except Exception as e:
+                logger.warning(f"Failed to update {interval} bars of {symbol}: {e}")
+
+    # Bars of the last `history` days, signals before them are skipped
+    since = np.datetime64(date.today() - timedelta(days=history), "ns")
+    symbol_bars = {s: store.bars(s) for s in symbols}
+    symbol_bars = {s: b[b["time"] >= since] for s, b in symbol_bars.items()}
+    for s, b in symbol_bars.items():
+        logger.info(f"{s}: {len(b)} {interval} bars" + (f" from {b['time'][0]} to {b['time'][-1]}" if len(b) else ""))
+    backtester = Backtester(Signal().signal_history(), symbol_bars)
+
+    # {"SPX": [10, 15], "NDX": [25, 50]} -> [{"SPX": 10, "NDX": 25}, ..]
+    stops = dict((k, [float(p) for p in v.split(",")]) for k, v in (s.split("=") for s in stop))
+    grid = {
+        "stop_points": [dict(zip(stops, values)) for values in itertools.product(*stops.values())],
+        "scale_out": [float(f) for f in scale_out.split(",")],
+        "order_preference": order.split(","),
+    }
+    results = backtester.sweep(grid, workers=workers)
+    results.to_csv(output, index=False)
+    logger.info(f"Stats of {len(results)} runs written to {output}\n{results.head(10).to_string()}")
+
+    # Equity curve of the best run
+    best = results.iloc[0]
+    params = Params(stop_points={s: best[f"stop_{s}"] for s in stops},
+                    scale_out=best["scale_out"], order_preference=best["order_preference"])
+    backtester.run(params).equity.to_csv(equity)
+    logger.info(f"Equity curve of the best run written to {equity}")
+
 @cli.command()
 def watch():
     """ 
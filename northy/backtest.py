@@ -0,0 +1,307 @@
+import time
+import logging
+import itertools
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Backtest parameters
+# * stop_points (dict): Stop loss points by symbol, e.g. `{"SPX": 15}`. Symbols
+#   without a value use the stop of the signal.
+# * scale_out (float): Part of the trade size closed by a SCALEOUT signal
+# * order_preference (str): `Market` (fill at the next open) or `Limit`
+#   (fill at the signal entry price, if traded before the next signal)
+Params = namedtuple("Params", ["stop_points", "scale_out", "order_preference"],
+                    defaults=(None, 0.25, "Market"))
+
+# Result of a backtest run
+Result = namedtuple("Result", ["params", "trades", "equity", "stats"])
+
+TRADE_COLUMNS = ["symbol", "direction", "amount", "entry_time", "entry", "stop",
+                 "exit_time", "exit", "points", "pnl", "reason", "signal"]
+
+def nanoseconds(t) -> np.int64:
+    """ Naive UTC time (datetime, or aware datetime converted to UTC) in ns """
+    t = pd.Timestamp(t)
+    if t.tzinfo is not None:
+        t = t.tz_convert("UTC").tz_localize(None)
+    return np.int64(t.value)
+
+def parse_signal(signal:str) -> dict:
+    """
+        Fields of a signal used by the backtest (see `Saxo.signal_to_tuple()`).
+        `None` if the action isn't simulated.
+    """
+    s = signal.split("_")
+    symbol, action = s[0], s[1]
+    if action == "TRADE":
+        # NDX_TRADE_SHORT_IN_13199_SL_25
+        return {"symbol": symbol, "action": action, "direction": 1 if s[2] == "LONG" else -1,
+                "entry": float(s[4]), "stoploss": float(s[6])}
+    if action == "SCALEOUT":
+        # SPX_SCALEOUT_IN_3809_OUT_4153_POINTS_344
+        return {"symbol": symbol, "action": action, "entry": float(s[3]), "exit": float(s[5])}
+    if action in ("FLAT", "FLATSTOP", "CLOSED"):
+        return {"symbol": symbol, "action": action}
+    return None
+
+class Bars:
+    """ Bars of one symbol, as contiguous arrays """
+    def __init__(self, bars:np.ndarray) -> None:
+        field = "time" if "time" in bars.dtype.names else "date"
+        self.times = np.asarray(bars[field]).astype("datetime64[ns]").astype(np.int64)
+        self.open = np.ascontiguousarray(bars["open"], dtype="f8")
+        self.high = np.ascontiguousarray(bars["high"], dtype="f8")
+        self.low = np.ascontiguousarray(bars["low"], dtype="f8")
+        self.close = np.ascontiguousarray(bars["close"], dtype="f8")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def index(self, t:np.int64) -> int:
+        """ Index of the first bar that starts after `t` """
+        return int(np.searchsorted(self.times, t, side="right"))
+
+    def time(self, i:int) -> pd.Timestamp:
+        return pd.Timestamp(self.times[min(i, len(self) - 1)])
+
+class Position:
+    """ Open position of a backtest """
+    def __init__(self, signal, direction, amount, entry, stop, entry_time, checked) -> None:
+        self.signal = signal
+        self.direction = direction
+        self.amount = amount
+        self.entry = entry
+        self.stop = stop
+        self.entry_time = entry_time
+        self.checked = checked  # First bar not checked for a stop
+
+class Backtester:
+    """
+        Replays stored trading signals against historical bars, and reports
+        the P&L of the strategy.
+
+        Signals are executed like `Saxo.trade()` does:
+
+        * TRADE opens a position, with a stop `stoploss` points from the
+          signal entry. Market orders fill at the open of the next bar,
+          limit orders at the entry price when a later bar trades through it
+          (cancelled at the next signal of the symbol).
+        * FLAT moves the stop of positions in profit to their entry.
+        * SCALEOUT closes `scale_out` of the trade size at the next open.
+        * CLOSED closes positions opened in the last `max_close_age` minutes
+          at the next open.
+        * FLATSTOP is an observation only, positions are closed by their stop.
+
+        Stops are checked with vectorized searches over the bars between two
+        signals of a symbol. A bar that gaps through a stop exits at its open.
+        Positions still open at the end are closed at the last close.
+
+        Bars are structured arrays with `time` (or `date`), `open`, `high`,
+        `low` and `close` fields, of any size, e.g. `BarStore.bars()` of a
+        daily or intraday store. Bar times and event times are naive UTC.
+        Signals before the first bar of their symbol are skipped.
+
+        Args:
+            events (list): Signals by time, `[(created_at, ["SPX_FLAT", ..]), ..]`
+            bars (dict): Bars by symbol
+            sizes (dict): Trade size by symbol (default: 1)
+            max_close_age (float): Minutes, see CLOSED
+
+        Example:
+            backtester = Backtester(signal.signal_history(), {"SPX": store.bars("SPX")})
+            backtester.run(Params(stop_points={"SPX": 15})).stats
+            backtester.sweep({"scale_out": [0.25, 0.5]}, workers=4)
+    """
+    def __init__(self, events:list, bars:dict, sizes:dict=None, max_close_age:float=60) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.bars = {symbol: Bars(b) for symbol, b in bars.items() if len(b)}
+        self.sizes = sizes or {}
+        self.max_close_age = np.int64(max_close_age * 60 * 10**9)
+
+        # Parse once, group by symbol: {symbol: [(time, signal, fields)]}
+        self.events = {}
+        skipped = 0
+        for created_at, signals in sorted(events, key=lambda e: e[0]):
+            t = nanoseconds(created_at)
+            for signal in signals:
+                try:
+                    fields = parse_signal(signal)
+                except (IndexError, ValueError):
+                    fields = None
+                if fields is None or fields["symbol"] not in self.bars \
+                        or t < self.bars[fields["symbol"]].times[0]:
+                    skipped += 1
+                    continue
+                self.events.setdefault(fields["symbol"], []).append((t, signal, fields))
+        if skipped:
+            self.logger.info(f"Skipped {skipped} signals (not simulated, or no bars at their time)")
+
+    def run(self, params:Params=Params()) -> Result:
+        """
+            Run a backtest.
+
+            Returns:
+                Result: `params`, `trades` (data frame, one row per exit),
+                        `equity` (cumulative P&L by exit time) and `stats`
+        """
+        trades = []
+        for symbol, events in self.events.items():
+            trades.extend(self._run_symbol(symbol, events, params))
+
+        trades = pd.DataFrame(trades, columns=TRADE_COLUMNS).sort_values("exit_time", kind="stable")
+        trades = trades.reset_index(drop=True)
+        equity = trades.set_index("exit_time")["pnl"].cumsum()
+        return Result(params, trades, equity, self.stats(trades))
+
+    def _run_symbol(self, symbol:str, events:list, params:Params) -> list:
+        bars = self.bars[symbol]
+        size = self.sizes.get(symbol, 1)
+        stop_points = (params.stop_points or {}).get(symbol)
+        positions, pending, trades = [], None, []
+
+        def close(p, i, price, reason, amount=None):
+            amount = p.amount if amount is None else amount
+            points = (price - p.entry) * p.direction
+            trades.append([symbol, p.direction, amount, p.entry_time, p.entry, p.stop,
+                           bars.time(i), price, points, points * amount, reason, p.signal])
+            p.amount -= amount
+
+        def check_stops(until):
+            # First bar in [checked, until) that trades through the stop
+            for p in positions:
+                if p.checked >= until:
+                    continue
+                if p.direction > 0:
+                    hit = bars.low[p.checked:until] <= p.stop
+                else:
+                    hit = bars.high[p.checked:until] >= p.stop
+                if hit.any():
+                    i = p.checked + int(np.argmax(hit))
+                    gap = bars.open[i] < p.stop if p.direction > 0 else bars.open[i] > p.stop
+                    close(p, i, bars.open[i] if gap else p.stop, "stop")
+                p.checked = until
+            positions[:] = [p for p in positions if p.amount > 0]
+
+        def fill_pending(until):
+            # Limit order: first bar in [index, until) that trades through the entry
+            nonlocal pending
+            signal, direction, entry, stop, index = pending
+            pending = None
+            if direction > 0:
+                hit = bars.low[index:until] <= entry
+            else:
+                hit = bars.high[index:until] >= entry
+            if not hit.any():
+                return
+            i = index + int(np.argmax(hit))
+            price = min(bars.open[i], entry) if direction > 0 else max(bars.open[i], entry)
+            positions.append(Position(signal, direction, size, price, stop, bars.time(i), i))
+
+        for t, signal, s in events:
+            k = bars.index(t)  # Next bar, orders fill at its open
+            # Bars that ended before the signal, the current bar is checked
+            # with the stops set by the signal
+            if pending is not None:
+                fill_pending(k)
+            check_stops(max(k - 1, 0))
+            last = bars.open[k - 1] if k > 0 else None  # Last known price
+
+            if s["action"] == "TRADE":
+                points = s["stoploss"] if stop_points is None else stop_points
+                stop = s["entry"] - points * s["direction"]
+                if params.order_preference == "Limit":
+                    pending = (signal, s["direction"], s["entry"], stop, k)
+                elif k < len(bars):
+                    positions.append(Position(signal, s["direction"], size, bars.open[k], stop,
+                                              bars.time(k), k))
+
+            elif s["action"] == "FLAT" and last is not None:
+                for p in positions:
+                    if (last - p.entry) * p.direction > 0:
+                        p.stop = p.entry
+
+            elif s["action"] == "SCALEOUT" and positions and k < len(bars):
+                # Oldest positions first
+                remaining = size * params.scale_out
+                for p in positions:
+                    amount = min(p.amount, remaining)
+                    close(p, k, bars.open[k], "scaleout", amount)
+                    remaining -= amount
+                    if remaining <= 0:
+                        break
+
+            elif s["action"] == "CLOSED" and k < len(bars):
+                for p in positions:
+                    if t - p.entry_time.value <= self.max_close_age:
+                        close(p, k, bars.open[k], "closed")
+
+            positions[:] = [p for p in positions if p.amount > 0]
+
+        # After the last signal
+        if pending is not None:
+            fill_pending(len(bars))
+        check_stops(len(bars))
+        for p in positions:
+            close(p, len(bars) - 1, bars.close[-1], "end")
+        return trades
+
+    @staticmethod
+    def stats(trades:pd.DataFrame) -> dict:
+        """ Summary statistics of the trades of a run """
+        pnl = trades["pnl"].to_numpy()
+        equity = np.concatenate([[0.0], np.cumsum(pnl)])
+        wins, losses = pnl[pnl > 0], pnl[pnl < 0]
+        return {
+            "trades": len(pnl),
+            "pnl": float(pnl.sum()),
+            "win_rate": float(len(wins) / len(pnl)) if len(pnl) else 0.0,
+            "avg_trade": float(pnl.mean()) if len(pnl) else 0.0,
+            "profit_factor": float(wins.sum() / -losses.sum()) if len(losses) else float("inf"),
+            "max_drawdown": float((np.maximum.accumulate(equity) - equity).max()),
+        }
+
+    def sweep(self, grid:dict, workers:int=0) -> pd.DataFrame:
+        """
+            Run a backtest for every combination of parameters.
+
+            Args:
+                grid (dict): Values of each parameter, e.g.
+                    `{"stop_points": [{"SPX": 10}, {"SPX": 15}], "order_preference": ["Market", "Limit"]}`.
+                    Parameters that aren't given keep their default.
+                workers (int): Run in a pool of worker processes (0 = inline)
+
+            Returns:
+                pd.DataFrame: Parameters and stats of each run, best P&L first
+        """
+        names = list(grid)
+        combinations = [Params(**dict(zip(names, values)))
+                        for values in itertools.product(*(grid[n] for n in names))]
+        start = time.perf_counter()
+
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker,
+                                     initargs=(self,)) as pool:
+                stats = list(pool.map(_run_stats, combinations, chunksize=max(1, len(combinations) // (workers * 4))))
+        else:
+            stats = [self.run(params).stats for params in combinations]
+
+        self.logger.info(f"Ran {len(combinations)} backtests in {time.perf_counter() - start:.1f}s")
+        rows = []
+        for params, s in zip(combinations, stats):
+            row = {f"stop_{symbol}": points for symbol, points in (params.stop_points or {}).items()}
+            row.update(scale_out=params.scale_out, order_preference=params.order_preference, **s)
+            rows.append(row)
+        return pd.DataFrame(rows).sort_values("pnl", ascending=False, kind="stable").reset_index(drop=True)
+
+# Backtester of the current sweep() worker process
+_sweep_worker = None
+
+def _init_sweep_worker(backtester):
+    global _sweep_worker
+    _sweep_worker = backtester
+
+def _run_stats(params:Params) -> dict:
+    return _sweep_worker.run(params).stats
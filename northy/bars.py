@@ -0,0 +1,263 @@
+import os
+import logging
+import threading
+import functools
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from collections import deque
+from datetime import date, timedelta
+from northy.utils import Utils
+
+utils = Utils()
+
+# OHLC bar. `time` is the start of the bar, naive UTC (midnight of the
+# trading day for daily bars).
+BAR_DTYPE = np.dtype([
+    ("time", "datetime64[ns]"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+])
+
+# Yahoo Finance tickers of the indices
+YAHOO_TICKERS = {
+    "RUT": "^RUT",
+    "NDX": "^NDX",
+    "SPX": "^GSPC",
+    "DJIA": "^DJI",
+}
+
+def yahoo_bars(ticker:str, start:date, end:date=None, interval:str="1d", timeout:float=10) -> pd.DataFrame:
+    """
+        Download bars of `ticker` from Yahoo Finance, from `start`
+        (inclusive) to `end` (exclusive, default: today).
+
+        Intraday bars are only available for recent days, e.g. 60 days of
+        5 minute bars, 730 days of hourly bars.
+
+        Uses `Ticker.history()`, which can run in several threads at once
+        (`yf.download()` shares state between calls).
+    """
+    return yf.Ticker(ticker).history(start=start, end=end, interval=interval, actions=False,
+                                     auto_adjust=False, timeout=timeout, raise_errors=True)
+
+def to_bars(df:pd.DataFrame, interval:str="1d") -> np.ndarray:
+    """
+        Convert a data frame of bars (`yfinance` download or CSV with
+        `Date,Open,High,Low,Close,Volume` columns, or `Datetime` for
+        intraday bars) to a bar array, sorted by time.
+
+        Daily bars keep the trading day of the exchange. Intraday times with
+        a timezone are converted to UTC, naive times are taken as UTC.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        # Recent yfinance versions return (column, ticker) columns
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    for column in ("Datetime", "Date"):
+        if column in df.columns:
+            df = df.set_index(column)
+            break
+
+    if interval == "1d":
+        times = pd.DatetimeIndex(pd.to_datetime(df.index))
+        if times.tz is not None:
+            times = times.tz_localize(None)
+        times = times.normalize()
+    else:
+        times = pd.DatetimeIndex(pd.to_datetime(df.index, utc=True)).tz_localize(None)
+
+    bars = np.zeros(len(df), dtype=BAR_DTYPE)
+    bars["time"] = times.values
+    for column in ("open", "high", "low", "close", "volume"):
+        bars[column] = df[column.capitalize()].to_numpy(dtype="f8") \
+            if column.capitalize() in df.columns else np.nan
+    bars = bars[~np.isnan(bars["close"])]
+    return np.sort(bars, order="time")
+
+class RollingMean:
+    """
+        Mean of the last `window` values, updated in O(1) per new value.
+        The last value can be removed again with `pop()`, e.g. to replace
+        the bar of a session that was still open.
+
+        Example:
+            ma = RollingMean(200, closes)
+            ma.push(4512.5)
+            ma.value
+    """
+    def __init__(self, window:int, values=()) -> None:
+        self.window = window
+        self._values = deque()
+        self._sum = 0.0
+        for value in values[-window:]:
+            self.push(value)
+
+    def push(self, value:float) -> None:
+        self._values.append(float(value))
+        self._sum += float(value)
+        if len(self._values) > self.window:
+            self._sum -= self._values.popleft()
+
+    def pop(self) -> float:
+        """ Remove the last value """
+        value = self._values.pop()
+        self._sum -= value
+        return value
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def value(self) -> float:
+        """ Mean, `None` until `window` values were pushed """
+        if len(self._values) < self.window:
+            return None
+        return self._sum / self.window
+
+class BarStore:
+    """
+        Local store of OHLC bars of one size (daily by default), one
+        memory-mapped `.npy` file per symbol.
+
+        `update()` only downloads the days after the last stored bar (the
+        bars of the last day are downloaded again, as its session may have
+        been open). Moving averages are kept up to date as bars are
+        appended, instead of being computed from a full download.
+
+        Bars can be seeded from CSV files, e.g. years of intraday bars for
+        a backtest, or to run tests offline.
+
+        Args:
+            directory (str): Directory of the bar files
+            fetch (callable): `fetch(ticker, start)` returns a data frame of
+                bars from `start` (default: `yahoo_bars()` of `interval`)
+            history (int): Days downloaded when a symbol has no bars yet
+            today (callable): Current date
+            interval (str): Bar size, e.g. `1d`, `1h` or `5m`
+
+        Example:
+            store = BarStore()
+            store.update("SPX", "^GSPC")
+            store.moving_average("SPX", 200)
+
+            intraday = BarStore(".bars/5m", interval="5m")
+            intraday.seed_csv("SPX", "SPX-5m.csv")
+    """
+    def __init__(self, directory=".bars", fetch=None, history=365, today=date.today,
+                 interval="1d") -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.fetch = fetch or functools.partial(yahoo_bars, interval=interval)
+        self.history = history
+        self.today = today
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._averages = {}  # {(symbol, window): RollingMean}
+        self.metrics = {"fetches": 0, "bars_fetched": 0}
+
+    def filename(self, symbol:str) -> str:
+        return os.path.join(self.directory, f"{symbol}.npy")
+
+    def bars(self, symbol:str) -> np.ndarray:
+        """ Stored bars of `symbol` (read-only, memory-mapped), empty if none """
+        try:
+            bars = np.load(self.filename(symbol), mmap_mode="r")
+        except FileNotFoundError:
+            return np.zeros(0, dtype=BAR_DTYPE)
+        if "date" in bars.dtype.names:
+            # Daily bars of the first file format, rewritten on next append
+            converted = np.zeros(len(bars), dtype=BAR_DTYPE)
+            converted["time"] = bars["date"].astype("datetime64[ns]")
+            for column in ("open", "high", "low", "close", "volume"):
+                converted[column] = bars[column]
+            return converted
+        return bars
+
+    def last_date(self, symbol:str) -> date:
+        """ Date of the last stored bar, `None` if there are no bars """
+        bars = self.bars(symbol)
+        return bars["time"][-1].astype("datetime64[D]").astype(date) if len(bars) else None
+
+    def _save(self, symbol:str, bars:np.ndarray) -> None:
+        """ Write bars (atomic, see `Utils.write_atomic()`) """
+        os.makedirs(self.directory, exist_ok=True)
+        utils.write_atomic(self.filename(symbol), lambda f: np.save(f, bars),
+                           binary=True, prefix=f".{symbol}-", suffix=".npy")
+
+    def append(self, symbol:str, new:np.ndarray) -> int:
+        """
+            Merge bars into the store. New bars replace stored bars of the
+            same and later times.
+
+            Returns:
+                int: Number of bars added
+        """
+        if len(new) == 0:
+            return 0
+        new = np.sort(new.astype(BAR_DTYPE), order="time")
+        with self._lock:
+            stored = self.bars(symbol)
+            keep = stored[stored["time"] < new["time"][0]]
+            replaced = len(stored) - len(keep)
+            added = len(np.setdiff1d(new["time"], stored["time"]))
+            self._save(symbol, np.concatenate([keep, new]))
+
+            # Keep moving averages up to date: replaced bars are removed,
+            # new bars added. If there are fewer new bars than replaced
+            # ones, the mean lacks older values, and is rebuilt on next use
+            # from the last `window` bars.
+            for (s, window), ma in list(self._averages.items()):
+                if s != symbol:
+                    continue
+                if replaced > len(ma) or len(new) < replaced:
+                    del self._averages[(s, window)]
+                    continue
+                for _ in range(replaced):
+                    ma.pop()
+                for close in new["close"]:
+                    ma.push(close)
+        return added
+
+    def seed_csv(self, symbol:str, filename:str) -> int:
+        """
+            Seed bars of `symbol` from a CSV file with
+            `Date,Open,High,Low,Close,Volume` columns (`Datetime` for
+            intraday bars, e.g. exported from Yahoo Finance).
+
+            Returns:
+                int: Number of bars added
+        """
+        return self.append(symbol, to_bars(pd.read_csv(filename), interval=self.interval))
+
+    def update(self, symbol:str, ticker:str) -> int:
+        """
+            Download the bars of `ticker` missing since the last stored bar.
+
+            Returns:
+                int: Number of bars added
+        """
+        today = self.today()
+        last = self.last_date(symbol)
+        if last is not None and last >= today:
+            return 0
+        start = last if last is not None else today - timedelta(days=self.history)
+
+        self.logger.info(f"Fetching {self.interval} bars of {symbol} ({ticker}) from {start}")
+        new = to_bars(self.fetch(ticker, start), interval=self.interval)
+        self.metrics["fetches"] += 1
+        self.metrics["bars_fetched"] += len(new)
+        return self.append(symbol, new)
+
+    def moving_average(self, symbol:str, window:int=200) -> float:
+        """ Moving average of the close, `None` if there are fewer than `window` bars """
+        key = (symbol, window)
+        with self._lock:
+            ma = self._averages.get(key)
+            if ma is None:
+                ma = self._averages[key] = RollingMean(window, self.bars(symbol)["close"])
+            return ma.value
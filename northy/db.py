@@ -1,9 +1,9 @@
 import os
 import logging
 import shutil
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
-from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from datetime import datetime, timezone
 from northy.color import colored
 from northy.config import Config
 from northy.secrets_manager import SecretsManager
@@ -13,6 +13,10 @@ import bson
 sm = SecretsManager()
 sm.read()
 
+# Error codes raised when a change stream can't be resumed from a token
+# (InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost)
+RESUME_TOKEN_ERRORS = (260, 280, 286)
+
 class Database(object):
     def __init__(self, connection_string=None, production:bool=None,
                  database_name="northy", collection_name="tweets") -> None:
@@ -151,3 +155,114 @@ class Database(object):
         """
         data = list(self.db.tweets.aggregate(pipeline))
         return data
+
+    def bulk_update(self, updates:list) -> int:
+        """
+            Run unordered bulk update.
+
+            Args:
+                updates (list): List of (filter, update) tuples
+
+            Returns:
+                int: Number of modified documents
+        """
+        if not updates:
+            return 0
+
+        # mongomock doesn't support bulk_write() with recent pymongo versions
+        if isinstance(self.client, mongomock.MongoClient):
+            return sum(self.tweets.update_one(f, u).modified_count for f, u in updates)
+
+        requests = [UpdateOne(f, u) for f, u in updates]
+        return self.tweets.bulk_write(requests, ordered=False).modified_count
+
+    def get_resume_token(self, name:str) -> dict:
+        """
+            Get the persisted change stream state of a watcher.
+
+            Returns:
+                dict: `{"_id": "signal", "token": {"_data": "8265..."}, "updated_at": datetime}`
+                      or `None` if the watcher never ran
+        """
+        return self.db.resume_tokens.find_one({"_id": name})
+
+    def save_resume_token(self, name:str, token:dict) -> None:
+        """
+            Persist the change stream resume token of a watcher.
+        """
+        self.db.resume_tokens.update_one(
+            {"_id": name},
+            {"$set": {"token": token, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    def get_checkpoint(self, name:str) -> dict:
+        """
+            Get a named checkpoint, e.g. the high-water mark of a backlog scan.
+
+            Returns:
+                dict: `{"_id": "signal_backlog", "last_id": ObjectId("65d8..."), "updated_at": datetime}`
+                      or `None` if there is no checkpoint
+        """
+        return self.db.checkpoints.find_one({"_id": name})
+
+    def save_checkpoint(self, name:str, **fields) -> None:
+        """
+            Save (or update) the fields of a named checkpoint.
+        """
+        fields["updated_at"] = datetime.now(timezone.utc)
+        self.db.checkpoints.update_one({"_id": name}, {"$set": fields}, upsert=True)
+
+    def watch(self, name:str, pipeline:list, catchup=None, max_await_time_ms=5000, **kwargs):
+        """
+            Resumable change stream on the tweets collection.
+
+            The resume token is persisted (see `save_resume_token()`) once a
+            change has been handled by the caller, so a restarted watcher
+            continues exactly where it stopped. Changes are delivered at least
+            once; the change being handled when the watcher crashed is
+            delivered again.
+
+            If there is no token yet, or the token has expired from the
+            oplog, a new stream is opened and `catchup(since)` is called, where
+            `since` is the time the token was last saved (`None` if there was
+            no token).
+
+            Args:
+                name (str): Watcher name, e.g. `signal`
+                pipeline (list): Change stream pipeline
+                catchup (callable): Process changes the stream can't replay
+                **kwargs: Passed to `Collection.watch()`, e.g. `full_document`
+
+            Yields:
+                dict: Change event
+        """
+        state = self.get_resume_token(name)
+        token = state["token"] if state else None
+        kwargs["max_await_time_ms"] = max_await_time_ms
+
+        try:
+            stream = self.tweets.watch(pipeline, resume_after=token, **kwargs)
+        except OperationFailure as e:
+            if token is None or e.code not in RESUME_TOKEN_ERRORS:
+                raise
+            self.logger.warning(f"Resume token of '{name}' has expired ({e.code})")
+            token = None
+            stream = self.tweets.watch(pipeline, **kwargs)
+
+        with stream:
+            # Stream is already open, so nothing is missed while catching up
+            if token is None and catchup:
+                since = state["updated_at"] if state else None
+                self.logger.info(f"Catching up '{name}' since {since}")
+                catchup(since)
+
+            while stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    yield change
+
+                # Also advances while idle (post batch resume token)
+                if stream.resume_token is not None and stream.resume_token != token:
+                    token = stream.resume_token
+                    self.save_resume_token(name, token)
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import logging
+import threading
+import dateutil.parser
+from datetime import datetime, timezone
+from northy.utils import Utils
+
+utils = Utils()
+
+# Session states in which orders are executed
+TRADING_STATES = ("AutomatedTrading", "CallAuctionTrading")
+
+class InstrumentCache:
+    """
+        On-disk cache of instrument reference data (asset type, tick size,
+        minimum amount, trading sessions), refreshed after `ttl` seconds.
+
+        Reference data rarely changes, so it's read from disk on start and
+        only fetched when missing or expired. The file is replaced
+        atomically, so other processes never read a partial file.
+
+        Args:
+            fetch (callable): `fetch(uic, asset_type)` returns instrument
+                details, see `Saxo.instrument_details()`
+            filename (str): Cache file
+            ttl (float): Seconds before details are fetched again
+
+        Example:
+            cache = InstrumentCache(fetch=saxo.instrument_details)
+            cache.get(4913, "CfdOnIndex")["TickSize"]
+            cache.is_market_open(4913, "CfdOnIndex")
+    """
+    def __init__(self, fetch, filename=".instruments", ttl=86400, clock=time.time) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.fetch = fetch
+        self.filename = filename
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = self._load()  # {key: {"stored_at": .., "data": ..}}
+        self.metrics = {"hits": 0, "fetches": 0}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.filename) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            self.logger.warning(f"Invalid instrument cache {self.filename}, ignoring it")
+            return {}
+
+    def _save(self, entries:dict) -> bool:
+        """
+            Write cache (atomic, see `Utils.write_atomic()`).
+
+            Returns:
+                bool: False if it couldn't be written, e.g. the details are
+                      not JSON serializable
+        """
+        try:
+            utils.write_atomic(self.filename, lambda f: json.dump(entries, f))
+            return True
+        except Exception as e:
+            self.logger.warning(f"Failed to write instrument cache {self.filename}: {e}")
+            return False
+
+    def cached(self, key:str, fetch, ttl:float=None):
+        """
+            Get `key` from the cache, or store the result of `fetch()` if
+            it's missing or older than `ttl` (default: cache TTL) seconds.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry["stored_at"] <= ttl:
+                self.metrics["hits"] += 1
+                return entry["data"]
+
+        data = fetch()
+        with self._lock:
+            self.metrics["fetches"] += 1
+            # Only cached once it's written
+            entries = dict(self._entries)
+            entries[key] = {"stored_at": self.clock(), "data": data}
+            if self._save(entries):
+                self._entries = entries
+        return data
+
+    def get(self, uic:int, asset_type:str) -> dict:
+        """ Instrument details of `uic` """
+        return self.cached(f"{asset_type}:{uic}", lambda: self.fetch(uic, asset_type))
+
+    def invalidate(self, uic:int, asset_type:str) -> None:
+        with self._lock:
+            if self._entries.pop(f"{asset_type}:{uic}", None) is not None:
+                self._save(self._entries)
+
+    #### Trading hours ####
+    def is_market_open(self, uic:int, asset_type:str, now:datetime=None) -> bool:
+        """
+            True if orders are executed at `now` (default: current time),
+            based on the cached trading sessions. If the sessions don't
+            cover `now`, they are fetched again. If trading hours are
+            unknown, the market is assumed to be open.
+        """
+        now = now or datetime.now(timezone.utc)
+        for refetch in (False, True):
+            if refetch:
+                self.invalidate(uic, asset_type)
+            sessions = self.get(uic, asset_type).get("TradingSessions", {}).get("Sessions", [])
+            for session in sessions:
+                start = dateutil.parser.isoparse(session["StartTime"])
+                end = dateutil.parser.isoparse(session["EndTime"])
+                if start <= now < end:
+                    return session["State"] in TRADING_STATES
+            if not sessions:
+                return True
+        self.logger.warning(f"No trading session of {asset_type} {uic} covers {now}")
+        return True
+
+    #### Order pre-validation ####
+    def tick_size(self, details:dict, price:float) -> float:
+        """ Tick size at `price`, from the tick size scheme if there is one """
+        scheme = details.get("TickSizeScheme")
+        if scheme:
+            for element in sorted(scheme.get("Elements", []), key=lambda e: e["HighPrice"]):
+                if price <= element["HighPrice"]:
+                    return element["TickSize"]
+            return scheme["DefaultTickSize"]
+        return details.get("TickSize")
+
+    def round_price(self, details:dict, price:float) -> float:
+        """ Round price to the nearest tick """
+        tick = self.tick_size(details, price)
+        if not tick:
+            return price
+        decimals = max(0, -int(f"{tick:e}".split("e")[1])) + 2
+        return round(round(price / tick) * tick, decimals)
+
+    def prepare_order(self, order:dict, quote:dict=None) -> list:
+        """
+            Validate and round an order (and its related orders) in place,
+            before it is sent to the broker.
+
+            * Prices are rounded to the tick size
+            * Amounts must be positive, and at least the minimum trade size
+            * Stop orders must be on the right side of the market, if a
+              `quote` is given (`OnWrongSideOfMarket`)
+
+            Args:
+                order (dict): Order, e.g. the body of `POST /trade/v2/orders`
+                quote (dict): Latest quote of the instrument, e.g. `{"Bid": 1, "Ask": 2}`
+
+            Returns:
+                list: Problems, empty if the order is valid
+        """
+        problems = []
+        for o in [order] + order.get("Orders", []):
+            if "Uic" not in o:
+                continue
+            details = self.get(o["Uic"], o["AssetType"])
+
+            if "OrderPrice" in o:
+                o["OrderPrice"] = self.round_price(details, o["OrderPrice"])
+
+            amount = o.get("Amount")
+            if amount is not None:
+                minimum = details.get("MinimumTradeSize", 0)
+                if amount <= 0:
+                    problems.append(f"Amount must be greater than 0 ({amount})")
+                elif amount < minimum:
+                    problems.append(f"Amount {amount} is below the minimum trade size {minimum}")
+
+            if quote and o.get("OrderType") == "StopIfTraded" and "OrderPrice" in o:
+                if o["BuySell"] == "Sell" and quote.get("Bid") is not None \
+                        and o["OrderPrice"] >= quote["Bid"]:
+                    problems.append(f"Sell stop {o['OrderPrice']} is not below the bid {quote['Bid']}")
+                if o["BuySell"] == "Buy" and quote.get("Ask") is not None \
+                        and o["OrderPrice"] <= quote["Ask"]:
+                    problems.append(f"Buy stop {o['OrderPrice']} is not above the ask {quote['Ask']}")
+        return problems
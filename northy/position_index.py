@@ -0,0 +1,109 @@
+from datetime import datetime
+from functools import cached_property
+
+# Format of ExecutionTimeOpen / ExecutionTimeClose
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+class PositionIndex:
+    """
+        Indexed view of a list of positions, used to answer any combination
+        of filters with set intersections.
+
+        Each index (by status, asset type, symbol, profit, hidden legs) is
+        built on first use, in one pass over the positions. Symbols are
+        looked up once per Uic, and timestamps are only compared for closed
+        positions.
+
+        Args:
+            positions (list): Positions (`Data` of a positions object)
+            uic_to_symbol (callable): Symbol lookup, e.g. `SaxoHelper.uic_to_symbol`
+
+        Example:
+            index = PositionIndex(positions["Data"], saxo_helper.uic_to_symbol)
+            index.filter(symbol="SPX", status=["Open"])
+    """
+    def __init__(self, positions:list, uic_to_symbol) -> None:
+        self.positions = positions
+        self.uic_to_symbol = uic_to_symbol
+
+    def _group(self, key) -> dict:
+        groups = {}
+        for i, p in enumerate(self.positions):
+            groups.setdefault(key(p), set()).add(i)
+        return groups
+
+    @cached_property
+    def by_status(self) -> dict:
+        """ `{status: {index, ..}}` """
+        return self._group(lambda p: p["PositionBase"]["Status"])
+
+    @cached_property
+    def by_asset_type(self) -> dict:
+        """ `{asset_type: {index, ..}}` """
+        return self._group(lambda p: p["PositionBase"]["AssetType"])
+
+    @cached_property
+    def by_symbol(self) -> dict:
+        """ `{symbol: {index, ..}}` """
+        symbols = {}  # {uic: symbol}
+        def symbol(p):
+            uic = p["PositionBase"]["Uic"]
+            if uic not in symbols:
+                symbols[uic] = self.uic_to_symbol(uic)
+            return symbols[uic]
+        return self._group(symbol)
+
+    @cached_property
+    def profitable(self) -> set:
+        """ Positions in profit """
+        return {i for i, p in enumerate(self.positions)
+                if p["PositionView"]["ProfitLossOnTrade"] > 0}
+
+    @cached_property
+    def hidden(self) -> set:
+        """
+            When a position is closed, another position in the opposite
+            direction is created. These "opposite" positions (opened after
+            they were closed) are hidden.
+        """
+        hidden = set()
+        for i in self.by_status.get("Closed", ()):
+            p_base = self.positions[i]["PositionBase"]
+            if self.later(p_base["ExecutionTimeOpen"], p_base["ExecutionTimeClose"]):
+                hidden.add(i)
+        return hidden
+
+    @staticmethod
+    def later(a:str, b:str) -> bool:
+        """
+            True if timestamp `a` is later than `b`. Timestamps of the same
+            length are compared as strings (the format is fixed-width and
+            ordered), others are parsed.
+        """
+        if len(a) == len(b):
+            return a > b
+        return datetime.strptime(a, TIME_FORMAT) > datetime.strptime(b, TIME_FORMAT)
+
+    def select(self, cfd_only:bool=True, profit_only:bool=True,
+               symbol:str=None, status:list=None) -> list:
+        """
+            Indexes of the positions matching all filters, in order (see
+            `SaxoHelper.filter_positions()`).
+        """
+        if status is None: status = ["Open", "Closed", "Waiting"]
+
+        selected = set()
+        for s in status:
+            selected |= self.by_status.get(s, set())
+        if cfd_only:
+            selected &= self.by_asset_type.get("CfdOnIndex", set())
+        if profit_only:
+            selected &= self.profitable
+        if symbol is not None:
+            selected &= self.by_symbol.get(symbol, set())
+        selected -= self.hidden
+        return sorted(selected)
+
+    def filter(self, **filters) -> list:
+        """ Positions matching all filters, in order (see `select()`) """
+        return [self.positions[i] for i in self.select(**filters)]
@@ -0,0 +1,82 @@
+import time
+import logging
+import threading
+
+class QuoteCache:
+    """
+        Thread-safe cache of the latest quote of each Uic.
+
+        Quotes are fresh for `ttl` seconds after they were stored. Use
+        `QuoteCache.instance()` to get the cache shared by all `Saxo`
+        instances of an environment.
+
+        Example:
+            cache = QuoteCache(ttl=2)
+            cache.put(4912, {"Uic": 4912, "Quote": {"Bid": 15013.92, "Ask": 15014.92}})
+            cache.get(4912)
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, ttl=2.0, clock=time.monotonic) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._quotes = {}  # {uic: (stored_at, quote)}
+        self.metrics = {"hits": 0, "misses": 0}
+
+    @classmethod
+    def instance(cls, name="default") -> "QuoteCache":
+        """
+            Get the shared cache for `name` (e.g. the OpenAPI base URL).
+        """
+        cache = cls._instances.get(name)
+        if cache is None:
+            with cls._instances_lock:
+                cache = cls._instances.setdefault(name, cls())
+        return cache
+
+    def get(self, uic:int, max_age:float=None) -> dict:
+        """
+            Get quote of `uic` if it's not older than `max_age` (default: `ttl`)
+            seconds, otherwise `None`.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._quotes.get(int(uic))
+            if entry is None or self.clock() - entry[0] > max_age:
+                self.metrics["misses"] += 1
+                return None
+            self.metrics["hits"] += 1
+            return entry[1]
+
+    def get_many(self, uics:list, max_age:float=None) -> tuple:
+        """
+            Get fresh quotes of `uics`.
+
+            Returns:
+                tuple: (quotes, missing), e.g. `({4912: {..}}, [4913])`
+        """
+        quotes, missing = {}, []
+        for uic in uics:
+            quote = self.get(uic, max_age=max_age)
+            if quote is None:
+                missing.append(int(uic))
+            else:
+                quotes[int(uic)] = quote
+        return quotes, missing
+
+    def put(self, uic:int, quote:dict) -> None:
+        """ Store quote of `uic` """
+        with self._lock:
+            self._quotes[int(uic)] = (self.clock(), quote)
+
+    def invalidate(self, uic:int=None) -> None:
+        """ Remove quote of `uic`, or all quotes """
+        with self._lock:
+            if uic is None:
+                self._quotes.clear()
+            else:
+                self._quotes.pop(int(uic), None)
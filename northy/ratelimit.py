@@ -0,0 +1,195 @@
+import re
+import time
+import random
+import logging
+import threading
+
+# X-RateLimit-<Dimension>-<Field>, e.g. X-RateLimit-SessionOrders-Remaining
+HEADER_RE = re.compile(r"^x-ratelimit-(?P<dimension>.+)-(?P<field>limit|remaining|reset)$",
+                       re.IGNORECASE)
+
+# Status codes that are retried with backoff
+# 409 - Duplicate order operation, 429 - Too many requests, 5xx - Server errors
+RETRY_STATUS = (409, 429, 500, 502, 503, 504)
+
+class Bucket:
+    """
+        Token bucket of a single rate limit dimension (e.g. `SessionOrders`).
+
+        Saxo limits are fixed windows, so the bucket is refilled to `limit`
+        once the reset time reported by the server has passed. Until the next
+        response corrects it, the new window is assumed to be as long as the
+        last reported reset.
+    """
+    def __init__(self) -> None:
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.window = 1
+
+    def update(self, now:float, limit:int=None, remaining:int=None, reset:int=None) -> None:
+        """ Update bucket from response headers """
+        if limit is not None:
+            self.limit = limit
+        if remaining is not None:
+            self.remaining = remaining
+        if reset is not None:
+            self.reset_at = now + reset
+            self.window = max(reset, 1)
+
+    def wait(self, now:float) -> float:
+        """ Seconds until a token is available """
+        if now >= self.reset_at and self.limit is not None:
+            # Refill
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining is None or self.remaining > 0:
+            return 0.0
+        return self.reset_at - now
+
+    def take(self) -> None:
+        """ Take a token (corrected by the next response headers) """
+        if self.remaining is not None:
+            self.remaining -= 1
+
+class RateLimiter:
+    """
+        Rate limiter for the SaxoBank OpenAPI.
+
+        Saxo reports the rate limits of each service group in the response
+        headers, e.g. for `/trade/v2/orders`:
+
+            X-RateLimit-SessionOrders-Limit: 1
+            X-RateLimit-SessionOrders-Remaining: 0
+            X-RateLimit-SessionOrders-Reset: 1
+
+        Every dimension is tracked as a token bucket per service group
+        (`trade`, `port`, `ref`, ...). Requests only wait when a bucket is
+        empty. Reference: https://www.developer.saxo/openapi/learn/rate-limiting
+
+        Example:
+            limiter = RateLimiter()
+            limiter.acquire("/trade/v2/orders")
+            rsp = requests.post(...)
+            limiter.update("/trade/v2/orders", rsp.headers)
+    """
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, max_backoff=30.0) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.clock = clock
+        self.sleep = sleep
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._buckets = {}  # {group: {dimension: Bucket}}
+
+    def group(self, path:str) -> str:
+        """
+            Service group of a path.
+
+            Input:
+                /trade/v2/orders
+
+            Output:
+                trade
+        """
+        return path.lstrip("/").split("/", 1)[0]
+
+    def acquire(self, path:str) -> float:
+        """
+            Take a token for a request to `path`, waiting until every bucket of
+            its service group has one.
+
+            Returns:
+                float: Seconds waited
+        """
+        group = self.group(path)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                buckets = self._buckets.get(group, {}).values()
+                wait = max([b.wait(now) for b in buckets], default=0.0)
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.take()
+                    return waited
+
+            self.logger.info(f"Rate limit of '{group}' exhausted, waiting {wait:.1f}s")
+            self.sleep(wait)
+            waited += wait
+
+    def update(self, path:str, headers:dict) -> None:
+        """
+            Update the buckets of `path` from `X-RateLimit-*` response headers.
+        """
+        dimensions = self.parse_headers(headers)
+        if not dimensions:
+            return
+
+        with self._lock:
+            now = self.clock()
+            buckets = self._buckets.setdefault(self.group(path), {})
+            for dimension, fields in dimensions.items():
+                buckets.setdefault(dimension, Bucket()).update(now, **fields)
+
+    def parse_headers(self, headers:dict) -> dict:
+        """
+            Parse `X-RateLimit-*` headers.
+
+            Input:
+                {"X-RateLimit-SessionOrders-Remaining": "0", "X-RateLimit-SessionOrders-Reset": "1"}
+
+            Output:
+                {"SessionOrders": {"remaining": 0, "reset": 1}}
+        """
+        dimensions = {}
+        for key, value in headers.items():
+            match = HEADER_RE.match(key)
+            if match is None:
+                continue
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                self.logger.warning(f"Invalid rate limit header {key}: {value}")
+                continue
+            dimensions.setdefault(match["dimension"], {})[match["field"].lower()] = value
+        return dimensions
+
+    def is_rate_limited(self, rsp) -> bool:
+        """
+            True if the request was rejected by a rate limit: 429, or 409
+            with an exhausted `X-RateLimit-*` limit. Other 409 responses are
+            duplicate order operations.
+        """
+        if rsp.status_code == 429:
+            return True
+        if rsp.status_code != 409:
+            return False
+        return any(f.get("remaining", 1) <= 0 for f in self.parse_headers(rsp.headers).values())
+
+    def backoff(self, rsp, attempt:int) -> float:
+        """
+            Seconds to wait before retrying a failed request.
+
+            Rate limited responses (see `is_rate_limited()`) wait for the
+            reset of the exhausted limit (or `Retry-After`). Other responses back off exponentially with jitter.
+
+            Args:
+                rsp (requests.Response): Failed response
+                attempt (int): Number of retries so far
+
+            Returns:
+                float: Seconds
+        """
+        if self.is_rate_limited(rsp):
+            if "Retry-After" in rsp.headers:
+                try:
+                    return min(float(rsp.headers["Retry-After"]), self.max_backoff)
+                except ValueError:
+                    pass
+            resets = [f["reset"] for f in self.parse_headers(rsp.headers).values()
+                      if f.get("remaining", 1) <= 0 and "reset" in f]
+            if resets:
+                return min(max(resets + [1]), self.max_backoff)
+
+        delay = min(0.5 * 2 ** attempt, self.max_backoff)
+        return delay * random.uniform(0.8, 1.2)
@@ -1,24 +1,48 @@
 import os
 import sys
+import copy
 from zoneinfo import ZoneInfo
 import dateutil.parser
-import jwt
 import requests
-import yfinance as yf
 from requests import Response
 import pandas as pd
 import time, uuid
+import threading
+import contextvars
 from northy.utils import Utils
 from northy.db import Database
+from northy.tickers import TickerRegistry, TickerRefresher
+from northy.ratelimit import RateLimiter, RETRY_STATUS
+from northy.saxo_token import TokenManager
+from northy.quotes import QuoteCache
+from northy.shared_quotes import SharedQuoteCache
+from northy.instruments import InstrumentCache
+from northy.bars import BarStore, YAHOO_TICKERS
+from northy.position_index import PositionIndex
+from northy.saxo_ledger import PositionLedger, OrderStore
+from northy.scheduler import KeyedScheduler
+from northy.saxo_planner import TradePlanner
+from northy.saxo_streaming import (StreamingConnection, PriceSubscription, QuoteBook,
+    PositionSubscription, OrderSubscription)
 from northy.secrets_manager import SecretsManager
-from datetime import datetime, timezone
-from collections import namedtuple
+from datetime import datetime, timezone, timedelta
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
 from requests.auth import HTTPBasicAuth
-from jwt.exceptions import ExpiredSignatureError
 import logging
 
 utils = Utils()
 
+# Field groups of positions read by the trader (PositionBase, PositionView.ProfitLossOnTrade)
+POSITION_FIELD_GROUPS = "PositionBase,PositionView"
+
+# Per-symbol order template, see `Saxo.order_template()`
+OrderTemplate = namedtuple("OrderTemplate", ["symbol", "order", "amount", "stoploss_points", "version"])
+
+# `time.perf_counter()` when the alert being executed was received, used to
+# measure event to order latency (see `Saxo.record_latency()`)
+EVENT_TIME = contextvars.ContextVar("event_time", default=None)
+
 class Saxo:
     def __init__(self, profile_name):
         # Create a logger instance for the class
@@ -35,11 +59,166 @@ class Saxo:
 
         # Setup Saxo API connection
         self.s = requests.session()
+        self.rate_limiter = RateLimiter()
+        self.max_retries = 4
+
+        # Token is refreshed in the background, `TokenRefreshMargin` seconds
+        # before it expires
+        self.tokens = TokenManager(refresh=self.refresh_token,
+                                   margin=float(self.env.get("TokenRefreshMargin", 60)))
         self.token = self.__get_bearer()
 
+        # Latest quotes, shared by all instances using the same environment
+        self.quotes = QuoteCache.instance(self.base_url)
+
+        # ..and by all processes on this host (memory-mapped file in
+        # `SharedQuotesDir`), unless `SharedQuotes` is False
+        self.shared_quotes = None
+        if str(self.env.get("SharedQuotes", "True")).lower() == "true":
+            self.shared_quotes = SharedQuoteCache.instance(
+                self.base_url, directory=self.env.get("SharedQuotesDir"))
+
+        # Streamed quotes and orders, see stream_prices() and stream_portfolio().
+        # Streamed quotes are published to the shared quote cache.
+        self.quote_book = QuoteBook(on_update=self.publish_quotes)
+        self.order_store = OrderStore()
+        self.streaming = None
+        self._client_key = None
+
+        # Local positions, reconciled with the broker every
+        # `PositionLedgerMaxAge` seconds, when our orders changed them, and
+        # before acting on positions (see sync_positions())
+        self.ledger = PositionLedger(
+            fetch=self.fetch_positions,
+            max_age=float(self.env.get("PositionLedgerMaxAge", 300)))
+
+        # Executes signals of different symbols in parallel, see trade_many()
+        self.scheduler = KeyedScheduler(max_workers=8, name="saxo-trade")
+        self.planner = TradePlanner(parse=self.signal_to_tuple)
+
+        # Fast path: orders are sent first, position snapshots, printing and
+        # verbose logging run afterwards in a background worker
+        self.fast_path = str(self.profile.get("FastPath", "True")).lower() == "true"
+        self._diagnostics = ThreadPoolExecutor(max_workers=1, thread_name_prefix="saxo-diagnostics")
+        self.latency = deque(maxlen=1000)  # Event to order POST (ms)
+
+        # Instrument reference data, used to validate orders before they
+        # are sent (see pre_validate())
+        self.instrument_cache = InstrumentCache(
+            fetch=self.instrument_details,
+            ttl=float(self.env.get("InstrumentCacheTTL", 86400)))
+
+        # Daily bars of the indices, for moving averages (see build_tickers())
+        self.bar_store = BarStore()
+        self.ticker_refresher = TickerRefresher(build=self.build_tickers)
+
+        # Warm start, see warm_up()
+        self.order_templates = {}  # {symbol: OrderTemplate}
+        self._last_request = 0
+        self._keep_alive = None
+        self._keep_alive_stop = threading.Event()
+
+    @property
+    def token(self) -> str:
+        """ Access token (see `TokenManager`) """
+        return self.tokens.token
+
+    @token.setter
+    def token(self, token:str) -> None:
+        self.tokens.set_token(token)
+
     def tradesize(self, symbol):
         """ Get trade size for symbol """
         return self.profile[symbol]
+
+    def warm_up(self, symbols:list=None, keep_alive:float=None) -> None:
+        """
+            Prepare the trader, so the first signal after a quiet period
+            doesn't pay for the setup:
+
+            * The access token is validated (and refreshed if needed)
+            * Order templates are built for all symbols (see `order_template()`),
+              and their instrument details are cached
+            * A connection to the gateway is opened, and kept alive with a
+              cheap request when no other request was made for `keep_alive`
+              seconds (default: `KeepAliveInterval` of the environment, 60)
+
+            Args:
+                symbols (list): Symbols to trade (default: symbols of the
+                    profile with a ticker config)
+        """
+        self.tokens.get_token()
+
+        if symbols is None:
+            symbols = [s for s in self.saxo_helper.tickers if s in self.profile]
+        for symbol in symbols:
+            template = self.order_template(symbol)
+            try:
+                self.instrument_cache.get(template.order["Uic"], template.order["AssetType"])
+            except Exception as e:
+                self.logger.warning(f"Failed to get instrument details of {symbol}: {e}")
+        self.logger.info(f"Order templates ready for {', '.join(symbols)}")
+
+        self.ping()
+        if keep_alive is None:
+            keep_alive = float(self.env.get("KeepAliveInterval", 60))
+        self.start_keep_alive(keep_alive)
+
+    def order_template(self, symbol:str) -> OrderTemplate:
+        """
+            Order template of a symbol, with everything but the direction,
+            price and amount of an order. Templates are built once, and
+            rebuilt when the ticker config changes.
+
+            Returns:
+                OrderTemplate: `order` (copy it before use), the default
+                `amount` (trade size of the profile) and `stoploss_points`
+                (used when a TRADE signal has no stop) of the symbol
+        """
+        version = self.saxo_helper.registry.version
+        template = self.order_templates.get(symbol)
+        if template is not None and template.version == version:
+            return template
+
+        uic = self.saxo_helper.symbol_to_uic(symbol)
+        order = {
+            "Uic": uic,
+            "AssetType": self.saxo_helper.get_asset_type(uic),
+            "ManualOrder": False,
+            "AccountKey": self.AccountKey,
+            "OrderDuration": { "DurationType": "DayOrder" },
+        }
+        template = OrderTemplate(symbol=symbol, order=order,
+                                 amount=self.profile.get(symbol),
+                                 stoploss_points=self.saxo_helper.get_stoploss(symbol),
+                                 version=version)
+        self.order_templates[symbol] = template
+        return template
+
+    def ping(self) -> bool:
+        """ Cheap request, opens (or keeps open) the connection to the gateway """
+        try:
+            return self.get("/root/v1/diagnostics/get").status_code == 200
+        except Exception as e:
+            self.logger.warning(f"Keep-alive request failed: {e}")
+            return False
+
+    def start_keep_alive(self, interval:float=60) -> None:
+        """ Ping the gateway when it was idle for `interval` seconds """
+        if self._keep_alive is not None and self._keep_alive.is_alive():
+            return
+
+        def keep_alive():
+            while not self._keep_alive_stop.wait(interval / 2):
+                if time.monotonic() - self._last_request >= interval:
+                    self.ping()
+
+        self._keep_alive_stop.clear()
+        self._keep_alive = threading.Thread(target=keep_alive, name="saxo-keep-alive", daemon=True)
+        self._keep_alive.start()
+
+    def stop_keep_alive(self) -> None:
+        self._keep_alive_stop.set()
     
     def set_profile(self, profile_name) -> None:
         """ Load saxo profile form encrypted file """
@@ -47,6 +226,7 @@ class Saxo:
         sm.read(file="conf/saxo_config.encrypted")
         try:
             self.profile = sm.get_dict()[profile_name]
+            self.profile_name = profile_name
         except KeyError:
             profile_names = [p for p in sm.get_dict() if "env" not in p]
             self.logger.error(f"Profile {profile_name} not found in saxo_config.encrypted. Available profiles: {profile_names}")
@@ -59,7 +239,8 @@ class Saxo:
         # Log profile info
         self.logger.info(f"Using Saxo profile: {profile_name} ({self.profile})")
 
-    def signal_to_tuple(self, signal):
+    @staticmethod
+    def signal_to_tuple(signal):
         """ 
             Convert signal into a namedtuple
             
@@ -294,18 +475,14 @@ class Saxo:
     def valid_token(self, token) -> bool:
         """
             Check if token is valid. If not, refresh token.
+
+            The token expiry is decoded once by `TokenManager`.
         """
-        try:
-            jwt.decode(token, options={"verify_signature": False})
+        if token == self.tokens.token and not self.tokens.expired():
             return True
-        except ExpiredSignatureError:
-            self.logger.error("Token has expired")
-            self.refresh_token()
-            return False
-        except Exception as e:
-            self.logger.error(f"Error in valid_token(): {e}")
-            self.refresh_token()
-            return False
+        self.logger.error("Token has expired")
+        self.tokens.refresh()
+        return False
 
     def get(self, path) -> Response:
         """
@@ -319,21 +496,7 @@ class Saxo:
             Returns:
                 tuple: (status_code, json)
         """
-        # Check if token is valid (passive check)
-        self.valid_token(self.token)
-
-        # Make request
-        url = self.base_url + path
-        self.logger.debug("GET {}".format(url))
-        rsp = self.s.get(url)
-
-        if rsp.status_code == 401:
-            self.logger.warning("401 Unauthorized")
-            self.__authenticate()
-            self.logger.debug("GET {} (retry)".format(url))
-            rsp = self.s.get(url)
-
-        return rsp
+        return self.__send("GET", path)
 
     def post(self, path, data, method_override="POST") -> Response:
         """
@@ -347,49 +510,13 @@ class Saxo:
             Returns:
                 tuple: (status_code, json)
         """
-        # Check if token is valid (passive check)
-        self.valid_token(self.token)
-
-        # Method Override
+        # Method Override (per request, the session is shared by threads)
         # https://www.developer.saxo/openapi/learn/openapi-request-response?phrase=405
-        self.s.headers.update({"X-HTTP-Method-Override": method_override})
+        headers = {"X-HTTP-Method-Override": method_override}
 
         # Make request
         url = self.base_url + path
-        self.logger.debug("POST {}".format(url))
-        rsp = self.s.post(url, json=data)
-
-        # 401 - Unauthorized
-        if rsp.status_code == 401:
-            self.logger.warning("401 Unauthorized")
-            self.__authenticate()
-            self.logger.debug("POST {} (retry)".format(url))
-            rsp = self.s.post(url, json=data)
-
-        # 409 - Duplicate order operations
-        # https://www.developer.saxo/openapi/learn/rate-limiting
-        if rsp.status_code == 409:
-            self.logger.warning("409 Conflict - Duplicate order operations (Rate limit)")
-            self.logger.warning("Retryning after 15 seconds..")
-            time.sleep(15)
-            self.logger.debug("POST {} (retry)".format(url))
-            rsp = self.s.post(url, json=data)
-
-        # If 429, Exceeding Limits
-        # https://www.developer.saxo/openapi/learn/rate-limiting
-        if rsp.status_code == 429:
-            self.logger.warning("409 Too Many Requests - Exceeding Limits (Rate limit)")
-            self.logger.critical(rsp.headers)
-
-            # Not all end-points return X-RateLimit-Session-Reset
-            if "X-RateLimit-Session-Reset" in rsp.headers:
-                session_reset = rsp.headers["X-RateLimit-Session-Reset"]
-                self.logger.warning(f"Retryning after {session_reset} seconds..")
-                time.sleep(session_reset)
-
-            self.logger.debug("POST {} (retry)".format(url))
-            rsp = self.s.post(url, json=data)
-            #sys.exit(1)
+        rsp = self.__send("POST", path, json=data, headers=headers)
 
         if rsp.status_code == 204: # 204 - No Content
             return rsp
@@ -408,12 +535,78 @@ class Saxo:
 
         return rsp
 
-    def trade(self, signal) -> Response:
+    def __send(self, method, path, **kwargs) -> Response:
+        """
+            Send rate limited request to SaxoBank API (see `RateLimiter`).
+
+            The access token is taken from `TokenManager`, which refreshes
+            it in the background before it expires.
+
+            Requests only wait when a rate limit reported by the
+            `X-RateLimit-*` headers is exhausted. 409, 429 and 5xx responses
+            are retried with backoff. Other non-GET requests are not retried
+            on 500.
+
+            Order operations (non-GET requests to `/trade/`) are only retried
+            when rate limited (see `RateLimiter.is_rate_limited()`). The order
+            might have been placed when a 5xx is returned, and a retry
+            within 15s of a duplicate order (409) is rejected again, so these
+            are left to the caller.
+
+            Args:
+                method (str): HTTP method
+                path (str): Path to resource
+                **kwargs: Passed to `requests.Session.request()`
+
+            Returns:
+                requests.Response: Response of the last attempt
+        """
+        url = self.base_url + path
+        order = method != "GET" and path.startswith("/trade/")
+        retry_status = RETRY_STATUS if method == "GET" else [s for s in RETRY_STATUS if s != 500]
+        headers = kwargs.pop("headers", {})
+        authenticated = False
+        attempt = 0
+        while True:
+            headers["Authorization"] = "Bearer " + self.tokens.get_token()
+            self.rate_limiter.acquire(path)
+            self.logger.debug(f"{method} {url}")
+            rsp = self.s.request(method, url, headers=headers, **kwargs)
+            self._last_request = time.monotonic()
+            self.rate_limiter.update(path, rsp.headers)
+
+            # 401 - Unauthorized
+            if rsp.status_code == 401 and not authenticated:
+                self.logger.warning("401 Unauthorized")
+                self.tokens.record("blocking_refreshes")
+                self.__authenticate()
+                authenticated = True
+                continue
+
+            # 409 - Duplicate order operations, 429 - Exceeding limits, 5xx
+            # https://www.developer.saxo/openapi/learn/rate-limiting
+            if order:
+                retry = self.rate_limiter.is_rate_limited(rsp)
+            else:
+                retry = rsp.status_code in retry_status
+            if not retry or attempt >= self.max_retries:
+                return rsp
+
+            delay = self.rate_limiter.backoff(rsp, attempt)
+            attempt += 1
+            self.logger.warning(f"{method} {url} failed with status code {rsp.status_code}, "
+                                f"retrying in {delay:.1f}s ({attempt}/{self.max_retries})")
+            self.rate_limiter.sleep(delay)
+
+    def trade(self, signal, show:bool=True, synced:bool=False) -> Response:
         """ 
             Execute Trade based on signal
 
             Args:
                 signal (str): Signal to execute. (e.g. `SPX_TRADE_SHORT_IN_4162_SL_10`)
+                show (bool): Print positions before and after the trade
+                synced (bool): Positions were reconciled for this signal
+                    already (see `sync_positions()`)
 
             Returns:
                 requests.Response: Order response
@@ -422,28 +615,42 @@ class Saxo:
                 `{'OrderId': '5014824029', 'Orders': [{'OrderId': '5014824030'}]}`
         """
         self.logger.info(f"Executing trade signal: {signal}")
-        self.logger.info("Positions prior to trade:")
-        self.positions(cfd_only=False, profit_only=False, show=True, status=["Open"])
 
         # Convert signal to namedtuple
         s = self.signal_to_tuple(signal)
         self.logger.debug(s)
 
+        if s.action in TradePlanner.POSITION_ACTIONS and not synced:
+            self.sync_positions()
+
+        if show and self.fast_path:
+            # Snapshot from memory, printed in the background
+            before = self.ledger.positions(refresh=False)
+            self.defer(self.show_positions, "Positions prior to trade:", before)
+        elif show:
+            self.logger.info("Positions prior to trade:")
+            self.positions(cfd_only=False, profit_only=False, show=True,
+                           status=["Open"], cached=True)
+
         # Determine action
         if s.action == "TRADE":
+            # Amount and default stop loss points from the symbol's template
+            template = self.order_template(s.symbol)
+            stoploss = s.stoploss or template.stoploss_points
+
             # Calculate stoploss price based on signal entry
             self.logger.info(f"Calculating stoploss price for {s.symbol} "
-                             f"Entry: {s.entry}, Stoploss: {s.stoploss}")
-            __stoploss_price = s.entry - s.stoploss if s.buy else s.entry + s.stoploss
+                             f"Entry: {s.entry}, Stoploss: {stoploss}")
+            __stoploss_price = s.entry - stoploss if s.buy else s.entry + stoploss
 
             if self.profile["OrderPreference"] == "Market":
                 return self.market(symbol=s.symbol, 
-                                   amount=self.tradesize(s.symbol),
+                                   amount=template.amount,
                                    buy=s.buy, stoploss_price=__stoploss_price)
                 
             elif self.profile["OrderPreference"] == "Limit":
                 return self.limit(symbol=s.symbol, limit=s.entry,
-                                  amount=self.tradesize(s.symbol),
+                                  amount=template.amount,
                                   buy=s.buy, stoploss_price=__stoploss_price)
             else:
                 self.logger.error("Profile OrderPreference is not set")
@@ -453,10 +660,10 @@ class Saxo:
         if s.action == "SCALEOUT":
             # Scale parameters
             self.logger.info(f"Scaling out of {s.symbol}..")
-            pos_size = self.tradesize(s.symbol)
+            pos_size = self.order_template(s.symbol).amount
             scale_size = pos_size * 0.25
             positions = self.positions(cfd_only=True, profit_only=False,
-                                       show=True, symbol=s.symbol)
+                                       show=True, symbol=s.symbol, cached=True)
 
             # Ensure we only scaleout of an existing position
             if positions["__count"] == 0:
@@ -478,7 +685,7 @@ class Saxo:
             # Close latest positions that are not flat
             self.logger.debug(f"Closing recently opened {s.symbol} position")
             positions = self.positions(cfd_only=True, profit_only=False,
-                                       show=True, symbol=s.symbol)
+                                       show=True, symbol=s.symbol, cached=True)
             tz = ZoneInfo('America/Chicago')
             
             def __position_age(position) -> int:
@@ -520,12 +727,8 @@ class Saxo:
             self.logger.info("FLATSTOP not implemented yet")
             pass
 
-        self.logger.debug("Current positions:")
-        self.positions(cfd_only=False, profit_only=False, show=True)
-
-        # Sleep to avoid rate limiting
-        self.logger.info("Sleeping for 15 seconds to avoid rate limiting..")
-        time.sleep(15)
+        if show:
+            self.defer(self.show_positions, "Current positions:")
 
     def enable_real_time_prices(self):
         """
@@ -544,7 +747,7 @@ class Saxo:
         time.sleep(10)
 
     def positions(self, cfd_only:bool=True, profit_only:bool=True, symbol=None, 
-                  status:list=None, show:bool=False) -> dict:
+                  status:list=None, show:bool=False, cached:bool=False) -> dict:
         # TODO: symbol is set to None, it should be a str, default to "" perhaps?
         """
             Get all positions
@@ -555,6 +758,8 @@ class Saxo:
                 symbol (str): Filter by symbol
                 status (list): Filter by status (e.g. ["Open", "Closed", "Working"])
                 show (bool): Print positions
+                cached (bool): Read positions from the ledger (see
+                    `PositionLedger`), fetched only if the ledger is stale
 
             Example output:
                 See `tests/mock_data/SaxoTrader_Saxo_positions.json`
@@ -563,31 +768,86 @@ class Saxo:
                     'Data': [..]
                 }
         """
-        self.logger.warning("Prices are delayed by 15 minutes.")
-
-        # Get all positions
-        pos = self.get(f"/port/v1/positions/me").json()
+        if cached:
+            # Get positions from the ledger
+            uic = self.saxo_helper.symbol_to_uic(symbol) if symbol else None
+            pos = self.ledger.positions(uic=uic)
+        else:
+            # Get all positions
+            self.logger.warning("Prices are delayed by 15 minutes.")
+            pos = self.fetch_positions()
+            self.ledger.reconcile(pos)
 
         # Filter positions
-        saxo_helper = SaxoHelper()
-        pos = saxo_helper.filter_positions(pos, cfd_only=cfd_only, 
+        pos = self.saxo_helper.filter_positions(pos, cfd_only=cfd_only, 
             profit_only=profit_only, symbol=symbol, status=status)
 
         if show:
-            saxo_helper.pprint_positions(pos)
+            self.saxo_helper.pprint_positions(pos)
 
         return pos
 
-    def orders(self, orderId:str=None):
+    def fetch_positions(self, page_size:int=200) -> dict:
+        """
+            Fetch positions of the profile's account.
+
+            Only the field groups the trader reads are requested, and
+            positions are filtered by account server-side. Pages are
+            followed until all positions are read (see `get_pages()`).
+
+            Returns:
+                dict: Positions object, `{"__count": 3, "Data": [..]}`
+        """
+        path = (f"/port/v1/positions?ClientKey={self.client_key()}"
+                f"&AccountKey={self.AccountKey}&FieldGroups={POSITION_FIELD_GROUPS}"
+                f"&$top={page_size}")
+        data = list(self.get_pages(path))
+        return {"__count": len(data), "Data": data}
+
+    def get_pages(self, path:str):
+        """
+            Get all items of a paged resource. The `__next` page is only
+            requested once the items of the current page are consumed.
+            Response size and parse time are logged per page.
+
+            Args:
+                path (str): Path to resource (first page)
+
+            Yields:
+                dict: Items (`Data`) of all pages
+        """
+        while path:
+            rsp = self.get(path)
+            start = time.perf_counter()
+            data = rsp.json()
+            elapsed = (time.perf_counter() - start) * 1000
+            items = data.get("Data", [])
+            self.logger.info(f"GET {path.split('?')[0]}: {len(rsp.content):,} bytes, "
+                             f"{len(items)} items, parsed in {elapsed:.1f} ms")
+            yield from items
+
+            # `__next` is an absolute URL
+            path = data.get("__next")
+            if path and path.startswith(self.base_url):
+                path = path[len(self.base_url):]
+
+    def orders(self, orderId:str=None, cached:bool=False):
         """
             Get open order(s)
 
             Args:
                 orderId (str): Order ID
+                cached (bool): Read orders from the order store while it is
+                    streamed (see `stream_portfolio()`)
 
             Example output:
                 See `tests/mock_data/SaxoTrader_Saxo_orders.json`
         """
+        if cached and self.order_store.live:
+            if orderId:
+                return self.order_store.get(orderId)
+            return self.order_store.orders()
+
         if orderId:
             # Get specific order
             ClientKey = self.AccountKey
@@ -609,23 +869,31 @@ class Saxo:
 
     def action_flat(self, symbol, profit_only=True):
         """ Execute FLATSTOP signal """
-        # Get all profitable positions
-        
-        # TODO: Get real-time pricing working for positions().
-        # Meanwhile, we'll work with delayed prices.
-        # set profit_only=False until we can get real-time prices
+        # Get all positions. Profit is checked against the latest quotes, as
+        # the P&L of positions() is delayed.
         positions = self.positions(cfd_only=True, 
-                                    profit_only=profit_only,
-                                    symbol=symbol)
+                                    profit_only=False,
+                                    symbol=symbol,
+                                    cached=True)
+        profit = self.position_profit(positions) if profit_only else {}
         
-        saxo_helper = SaxoHelper()
-        saxo_helper.pprint_positions(positions)
+        self.saxo_helper.pprint_positions(positions)
 
         # Loop through positions        
         for position in positions["Data"]:
             pos_id = position["PositionId"]
             p_base = position["PositionBase"]
 
+            # Only profitable positions can be set to flat
+            if profit_only:
+                points = profit.get(pos_id)
+                if points is None:
+                    # No quote, fall back to (delayed) P&L
+                    points = position["PositionView"]["ProfitLossOnTrade"]
+                if points <= 0:
+                    self.logger.info(f"{pos_id} is not in profit. Skipping..")
+                    continue
+
             # Try to get entry and stoploss price
             # If RelatedOpenOrders doesn't exist, no stoploss exists.
             is_flat = False
@@ -642,15 +910,19 @@ class Saxo:
             if not is_flat:
                 self.set_stoploss(position=position, points=0)
 
-    def price(self, uic):
+    def price(self, uic, max_age=None, shared=False):
         """ 
-            Get price for uic
+            Get price for uic (cached, see `prices()`)
 
             Args:
                 uic (int): Uic
+                max_age (float): Max age of a cached quote in seconds
+                shared (bool): Serve it from the cache shared by all processes,
+                    which only keeps Bid, Ask, Mid, MarketState, PriceTypeBid,
+                    PriceTypeAsk, AssetType and LastUpdated (see `prices()`)
 
             Returns:
-                dict: Price response
+                dict: Price response, `None` if not available
 
             Example response:
             ```json
@@ -677,29 +949,175 @@ class Saxo:
                 }
             ```
         """
-        # TODO: Implement caching, when running e.g. "SXP_FLATSTOP", 
-        # we will need to fetch prices for all positions
-        asset_type = self.saxo_helper.get_asset_type(uic)
-        path = f"/trade/v1/infoprices/?Uic={uic}&AssetType={asset_type}"
-        rsp = self.get(path=path)
-        if rsp.status_code != 200:
-            return None
-        
-        rsp_json = rsp.json()
-        self.logger.debug(rsp_json)
+        return self.prices([uic], max_age=max_age, shared=shared).get(int(uic))
+
+    def prices(self, uics:list, max_age=None, shared=False) -> dict:
+        """
+            Get prices for multiple Uics.
 
-        if rsp_json["Quote"]["PriceTypeBid"] == "NoAccess":
-            # https://openapi.help.saxo/hc/en-us/articles/4405160773661
-            # https://openapi.help.saxo/hc/en-us/articles/4416934146449
-            url = "https://openapi.help.saxo/hc/en-us/articles/4416934146449"
-            self.logger.error(f"No access to price data. See: {url}")
+            Streamed quotes are used while streaming is live (see
+            `stream_prices()`). Otherwise quotes are served from the quote
+            cache (see `QuoteCache`) when they are not older than `max_age`
+            seconds (default: cache TTL).
+            Missing quotes are fetched with one `infoprices/list` request per
+            asset type.
 
-        time.sleep(1)  # Lame way to avoid rate limiting
+            With `shared`, quotes of other processes (see `SharedQuoteCache`)
+            are used before fetching. The shared cache only keeps the fields
+            used for trading: `Quote` has Bid, Ask, Mid, MarketState,
+            PriceTypeBid and PriceTypeAsk, and the response AssetType and
+            LastUpdated. Only use it if Bid/Ask are all that's needed.
 
-        return rsp.json()
+            Args:
+                uics (list): Uics (e.g. `[4912, 4913]`)
+                max_age (float): Max age of cached quotes in seconds
+                shared (bool): Use quotes of other processes (reduced fields)
+
+            Returns:
+                dict: Price response by Uic, see `price()`. Uics without a
+                      price are left out.
+        """
+        # Streamed quotes first (see stream_prices()), then cached quotes,
+        # then quotes of other processes
+        quotes, uics = self.quote_book.get_many(uics)
+        cached, missing = self.quotes.get_many(uics, max_age=max_age)
+        quotes.update(cached)
+        if missing and shared and self.shared_quotes is not None:
+            shared, missing = self.shared_quotes.get_many(missing, max_age=max_age)
+            quotes.update(shared)
+        if not missing:
+            return quotes
+
+        # infoprices/list takes one asset type per request
+        by_asset_type = {}
+        for uic in missing:
+            asset_type = self.saxo_helper.get_asset_type(uic)
+            by_asset_type.setdefault(asset_type, []).append(uic)
+
+        for asset_type, _uics in by_asset_type.items():
+            uic_list = ",".join(str(u) for u in _uics)
+            path = f"/trade/v1/infoprices/list?Uics={uic_list}&AssetType={asset_type}"
+            rsp = self.get(path=path)
+            if rsp.status_code != 200:
+                self.logger.error(f"Failed to get prices for {uic_list} ({rsp.status_code})")
+                continue
+
+            data = rsp.json().get("Data", [])
+            for quote in data:
+                self.logger.debug(quote)
+                if quote["Quote"].get("PriceTypeBid") == "NoAccess":
+                    # https://openapi.help.saxo/hc/en-us/articles/4405160773661
+                    # https://openapi.help.saxo/hc/en-us/articles/4416934146449
+                    url = "https://openapi.help.saxo/hc/en-us/articles/4416934146449"
+                    self.logger.error(f"No access to price data. See: {url}")
+                self.quotes.put(quote["Uic"], quote)
+                quotes[int(quote["Uic"])] = quote
+
+            self.publish_quotes(data)
+
+        return quotes
+
+    def publish_quotes(self, quotes:list) -> None:
+        """ Store quotes in the cache shared by all processes (see `SharedQuoteCache`) """
+        if self.shared_quotes is not None:
+            self.shared_quotes.put_many(quotes)
+
+    def stream_prices(self, uics:list=None) -> StreamingConnection:
+        """
+            Stream prices into the quote book. While the stream is live,
+            `price()`, `prices()` and `action_flat()` read quotes without a
+            network round trip.
+
+            Args:
+                uics (list): Uics to stream (default: all tickers)
+
+            Returns:
+                StreamingConnection: Streaming connection (running)
+        """
+        if uics is None:
+            uics = [t["Uic"] for t in self.saxo_helper.tickers.values()]
+
+        # One subscription per asset type
+        streaming = self.streaming_connection()
+        by_asset_type = {}
+        for uic in uics:
+            by_asset_type.setdefault(self.saxo_helper.get_asset_type(uic), []).append(uic)
+        for asset_type, _uics in by_asset_type.items():
+            streaming.add(PriceSubscription(self.quote_book, _uics, asset_type))
+
+        streaming.start()
+        return streaming
+
+    def stream_portfolio(self) -> StreamingConnection:
+        """
+            Stream positions into the position ledger, and open orders into
+            the order store. While the stream is live, `positions(cached=True)`
+            and `orders(cached=True)` never fetch, and see fills, stop-outs
+            and closes as soon as they happen.
+
+            Returns:
+                StreamingConnection: Streaming connection (running)
+        """
+        streaming = self.streaming_connection()
+        client_key = self.client_key()
+        streaming.add(PositionSubscription(self.ledger, client_key, self.AccountKey))
+        streaming.add(OrderSubscription(self.order_store, client_key, self.AccountKey))
+        streaming.start()
+        return streaming
+
+    def streaming_connection(self) -> StreamingConnection:
+        """
+            Streaming connection shared by all subscriptions of this instance.
+
+            The streaming URL is read from `StreamingUrl` in the environment
+            config, or derived from `OpenApiBaseUrl`.
+        """
+        if self.streaming is None:
+            url = self.env.get("StreamingUrl") or self.base_url.replace(
+                "https://gateway.", "wss://streaming.") + "/streamingws"
+            self.streaming = StreamingConnection(client=self, url=url,
+                                                 token=lambda: self.tokens.token)
+        return self.streaming
+
+    def client_key(self) -> str:
+        """ ClientKey of the logged in user (fetched once) """
+        if self._client_key is None:
+            self._client_key = self.get("/port/v1/clients/me").json()["ClientKey"]
+        return self._client_key
+
+    def position_profit(self, positions:dict) -> dict:
+        """
+            Profit/loss in points of positions, based on the latest quotes
+            (one batched price request for all positions).
+
+            Long positions are valued at the Bid, short positions at the Ask
+            (the price they can be closed at).
+
+            Args:
+                positions (dict): Positions object
+
+            Returns:
+                dict: Points by PositionId, `None` if no quote is available.
+                      E.g. `{"5014824029": 12.5}`
+        """
+        uics = {p["PositionBase"]["Uic"] for p in positions["Data"]}
+        quotes = self.prices(sorted(uics), shared=True)  # Bid/Ask only
+
+        profit = {}
+        for p in positions["Data"]:
+            p_base = p["PositionBase"]
+            quote = quotes.get(p_base["Uic"], {}).get("Quote", {})
+            if p_base["Amount"] > 0:
+                close_price = quote.get("Bid")
+                points = None if close_price is None else close_price - p_base["OpenPrice"]
+            else:
+                close_price = quote.get("Ask")
+                points = None if close_price is None else p_base["OpenPrice"] - close_price
+            profit[p["PositionId"]] = points
+        return profit
 
     ####### TRADING #######
-    def stoploss_order(self, uic, stoploss_price, BuySell, amount):
+    def stoploss_order(self, uic, stoploss_price, BuySell, amount, asset_type=None):
         """ 
             Creates stop loss order. This is used when new positions are created.
         """
@@ -712,7 +1130,7 @@ class Saxo:
         stoploss_order = {
             "Uic": uic,
             "AccountKey": self.AccountKey,
-            "AssetType": self.saxo_helper.get_asset_type(uic),
+            "AssetType": asset_type or self.saxo_helper.get_asset_type(uic),
             "OrderType": "StopIfTraded",
             "ManualOrder": False,
             "BuySell": BuySell,
@@ -791,14 +1209,54 @@ class Saxo:
         }
         return [stoploss_order]
 
-    def base_order(self, symbol, amount, buy=True, limit=None, 
+    def pre_validate(self, order:dict) -> bool:
+        """
+            Validate and round an order locally, before it is sent (see
+            `InstrumentCache.prepare_order()`). Market orders are not sent
+            while the market is closed.
+
+            Stop orders are checked against the latest quote, if one is
+            available without a request (streamed or cached).
+
+            If the reference data can't be fetched, the order is sent as is,
+            and validated by the broker.
+
+            Returns:
+                bool: False if the order would be rejected
+        """
+        legs = [o for o in [order] + order.get("Orders", []) if "Uic" in o]
+        if not legs:
+            return True
+        uic, asset_type = legs[0]["Uic"], legs[0]["AssetType"]
+
+        try:
+            if any(o.get("OrderType") == "Market" for o in legs) and \
+                    not self.instrument_cache.is_market_open(uic, asset_type):
+                self.logger.warning(f"Market of {asset_type} {uic} is closed, skipping order")
+                return False
+
+            quote = self.quote_book.get(uic) or self.quotes.get(uic) or \
+                (self.shared_quotes.get(uic) if self.shared_quotes is not None else None)
+            problems = self.instrument_cache.prepare_order(
+                order, quote=quote.get("Quote") if quote else None)
+        except Exception as e:
+            self.logger.warning(f"Failed to validate order locally: {e}")
+            return True
+
+        if problems:
+            self.logger.error(f"Order rejected locally: {'; '.join(problems)}. Order: {order}")
+            return False
+        return True
+
+    def base_order(self, symbol, amount=None, buy=True, limit=None, 
                    stoploss_price=None, OrderType="Market") -> Response:
         """
             Handles placing new orders
 
             Args:
                 symbol (str): Symbol
-                amount (int): Amount of contracts
+                amount (int): Amount of contracts (default: the symbol's
+                    trade size, see `order_template()`)
                 buy (bool): Buy or Sell
                 limit (float): Limit price
                 stoploss_price (float): Stop loss price
@@ -815,41 +1273,40 @@ class Saxo:
                     ]
                 }
         """
-        # Base order parameters
-        saxo_helper = SaxoHelper()
-        uic = saxo_helper.symbol_to_uic(symbol)
-        asset_type = self.saxo_helper.get_asset_type(uic)
-        self.order = dict()
-        self.order["Uic"] = uic
-        self.order["AssetType"] = asset_type
-        self.order["OrderType"] = OrderType
-        self.order["ManualOrder"] = False
+        # Base order parameters from the symbol's template (local,
+        # base_order() runs in multiple threads)
+        template = self.order_template(symbol)
+        order = copy.deepcopy(template.order)
+        uic = order["Uic"]
+        order["OrderType"] = OrderType
 
         # Market order
-        self.order["BuySell"] = "Buy" if buy == True else "Sell"
-        self.order["Amount"] = amount
-        self.order["AccountKey"] = self.AccountKey
-        self.order["OrderDuration"] = { "DurationType": "DayOrder" }
+        order["BuySell"] = "Buy" if buy == True else "Sell"
+        order["Amount"] = template.amount if amount is None else amount
 
         # Limit order
         if OrderType == "Limit" and limit is not None:
-            self.order["OrderPrice"] = limit
+            order["OrderPrice"] = limit
 
         # Stop Loss
         if stoploss_price:
             # Set fixed Stop Loss
-            self.order["Orders"] = self.stoploss_order(uic=self.order["Uic"], 
+            order["Orders"] = self.stoploss_order(uic=order["Uic"], 
                                         stoploss_price=stoploss_price, 
-                                        BuySell=self.order["BuySell"],
-                                        amount=self.order["Amount"])
+                                        BuySell=order["BuySell"],
+                                        amount=order["Amount"],
+                                        asset_type=order["AssetType"])
 
-        # Execute order
-        self.logger.info(f"POST /trade/v2/orders --> {self.order}")
-        rsp = self.post(path="/trade/v2/orders", data=self.order)
-        self.logger.info(f"Response: {rsp.json()}")
-        
-        # Sleep to avoid rate limiting
-        time.sleep(2)
+        if not self.pre_validate(order):
+            return None
+
+        # Execute order, log afterwards
+        self.record_latency("order")
+        rsp = self.post(path="/trade/v2/orders", data=order)
+        self.defer(lambda: self.logger.info(f"POST /trade/v2/orders --> {order}\n"
+                                            f"Response: {rsp.json()}"))
+        if rsp.status_code == 200:
+            self.ledger.order_placed(uic, order_ids=self.order_ids(rsp))
 
         return rsp
 
@@ -897,15 +1354,18 @@ class Saxo:
         }
 
         # Execute order
-        self.logger.debug(order)
         self.logger.info(f"Closing position: {PositionId}")
+        if not self.pre_validate(order):
+            return None
+        self.record_latency("close")
         rsp = self.post(path="/trade/v2/orders", data=order)
-        time.sleep(1) # Sleep to avoid rate limiting
+        self.defer(self.logger.debug, order)
 
         if rsp.status_code != 200:
             self.logger.error(f"Failed to close position: {PositionId}. Response: {rsp.json()}")
         else:
             self.logger.info(f"Position {PositionId} closed. Order placed to close: {rsp.json()}")
+            self.ledger.position_closed(PositionId)
 
         return rsp
 
@@ -918,33 +1378,255 @@ class Saxo:
                                stoploss_price=stoploss_price,
                                OrderType="Limit")
 
-    def watch(self):
+    def watch(self, max_age=15, dispatch=None, profiles=None):
+        """
+            Watch for alerts and execute trades.
+
+            The change stream resumes where it stopped (see `Database.watch()`).
+            If the resume token has expired, alerts from the last `max_age`
+            minutes that were missed are executed before watching again.
+            Alerts replayed from a resume token that are older than `max_age`
+            minutes are skipped, e.g. after a long outage.
+
+            Only the first parse of a tweet is matched, i.e. the update that
+            sets `alert` and `signals` (see `Signal.parse()`). Re-parsing
+            (`cli_signal.py updateall`), manual edits and backfills never
+            trigger trades. Each alert is dispatched once per profile (see
+            `dispatch()`). The ticker configuration is refreshed in the
+            background while watching (see `tickers()`).
+
+            Args:
+                max_age (int): Minutes of missed alerts to execute on restart
+                dispatch (callable): `dispatch(db, doc)` claims and executes an
+                    alert (default: `dispatch()`), see `SaxoFanout` for
+                    multiple accounts
+                profiles (list): Profiles the alerts are dispatched to
+                    (default: this profile)
+        """
         self.logger.info("Starting change stream....")
-        while True:
-            db = Database().db
-            
-            # Watch for new documents (tweets) where "alert" is not set
-            pipeline = [
+        db = Database()
+        dispatch = dispatch or self.dispatch
+        self.tickers(background=True)
+        profiles = profiles or [self.profile_name]
+
+        pipeline = [
+            { "$match": {
                 # 'insert', 'update', 'replace', 'delete'
-                { "$match": { "operationType": { "$in": ["update"] } } },
+                "operationType": "update",
+
+                # Only first parse of "alert" Tweets
+                "updateDescription.updatedFields.alert": True,
+                "updateDescription.updatedFields.signals": { "$exists": True },
+
+                # Not dispatched to all profiles yet
+                "$or": [{f"fullDocument.dispatched.{name}": { "$exists": False }}
+                        for name in profiles],
+            } },
+
+            # Only send the fields we need
+            { "$project": {
+                "fullDocument._id": 1,
+                "fullDocument.tid": 1,
+                "fullDocument.signals": 1,
+                "fullDocument.created_at": 1,
+            } },
+        ]
+
+        def catchup(since):
+            # Nothing was missed on the first start
+            if since is None:
+                return
+            for doc in self.missed_alerts(db, since, max_age=max_age, profiles=profiles):
+                EVENT_TIME.set(time.perf_counter())
+                dispatch(db, doc)
+
+        # One resume token per watcher, so traders of different profiles
+        # don't move each other's position in the stream
+        name = f"saxo-{','.join(profiles)}"
+        for change in db.watch(name, pipeline, catchup=catchup, full_document='updateLookup'):
+            EVENT_TIME.set(time.perf_counter())
+            doc = change["fullDocument"]
+
+            # Skip tweets older than `max_age` minutes, e.g. changes replayed
+            # after a long outage. Trading on old alerts is not safe.
+            if self.saxo_helper.doc_older_than(doc, max_age=max_age):
+                continue
+
+            dispatch(db, doc)
+
+            # Keep the moving averages up to date, after the trades
+            if self.ticker_refresher.stale():
+                self.ticker_refresher.refresh_in_background()
+
+    def claim(self, db, doc) -> bool:
+        """
+            Claim alert for this profile (atomic), so its signals are never
+            executed twice by the traders of the profile, e.g. when a change
+            is delivered again after a restart.
+
+            The claim is stored in `dispatched.<profile_name>`, other profiles
+            claim the same alert independently.
+
+            Returns:
+                bool: False if the alert was dispatched to this profile already
+        """
+        field = f"dispatched.{self.profile_name}"
+        claimed = db.tweets.find_one_and_update(
+            {"_id": doc["_id"], field: {"$exists": False}},
+            {"$set": {field: datetime.now(tz=timezone.utc)}},
+            projection={"_id": 1}
+        )
+        return claimed is not None
+
+    def dispatch(self, db, doc, trade=None) -> bool:
+        """
+            Claim alert (see `claim()`) and execute trades for its signals.
+
+            Args:
+                db (Database): Database
+                doc (dict): Alert tweet with `_id`, `tid` and `signals`
+                trade (callable): Executes the signals (default: `trade_many()`)
+
+            Returns:
+                bool: True if trades were executed
+        """
+        if not self.claim(db, doc):
+            self.logger.info(f"Skipping {doc['tid']}, signals were dispatched to {self.profile_name} already")
+            return False
+
+        # Execute trades for signals in tweet
+        trade = trade or self.trade_many
+        trade(doc["signals"])
+        return True
+
+    def trade_many(self, signals:list) -> list:
+        """
+            Execute trades for multiple signals, e.g. the signals of a tweet.
+
+            The signals are planned first (see `TradePlanner`): no-op signals
+            are dropped, and positions are reconciled once for all signals
+            that need them (see `sync_positions()`), instead of before and
+            after every signal.
+
+            Signals for different symbols are executed in parallel, signals
+            for the same symbol in order (see `KeyedScheduler`). Failed
+            signals are logged, and don't stop the others.
+
+            Args:
+                signals (list): Signals (e.g. `["SPX_FLAT", "NDX_FLAT"]`)
+
+            Returns:
+                list: Result of `trade()` per signal, the exception raised, or
+                      `None` if the signal was dropped
+        """
+        steps = self.planner.plan(signals)
+
+        # One position lookup for the whole plan
+        if any(step.needs_positions for step in steps):
+            self.sync_positions()
+
+        futures = {step.index: self.scheduler.submit(step.symbol, self.trade,
+                                                     step.signal, show=False, synced=True)
+                   for step in steps}
+
+        results = [None] * len(signals)
+        for index, future in futures.items():
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                self.logger.error(f"Failed to execute {signals[index]}: {e}", exc_info=True)
+                results[index] = e
+
+        if steps:
+            self.defer(self.show_positions, "Positions after trades:")
+        return results
 
-                # Only watch for "alert" Tweets
-                { "$match": { "fullDocument.alert": True } },
-            ]
+    def sync_positions(self) -> None:
+        """
+            Reconcile the position ledger before acting on positions (FLAT,
+            SCALEOUT, CLOSED), unless positions are streamed (see
+            `stream_portfolio()`). Otherwise stop-outs and closes by the
+            broker would only be seen after `PositionLedgerMaxAge` seconds.
+        """
+        if not self.ledger.live:
+            self.ledger.reconcile()
 
-            # Create a change stream
-            stream = db.tweets.watch(pipeline, full_document='updateLookup')
-            for change in stream:
-                doc = change["fullDocument"]
+    def show_positions(self, title:str, positions:dict=None) -> None:
+        """
+            Print open positions (default: from the ledger, with the Uics of
+            orders placed since the last reconcile refreshed)
+        """
+        if positions is None:
+            positions = self.ledger.positions()
+        positions = self.saxo_helper.filter_positions(positions, cfd_only=False,
+                                                      profit_only=False, status=["Open"])
+        self.logger.info(title)
+        self.saxo_helper.pprint_positions(positions)
+
+    def defer(self, fn, *args, **kwargs) -> None:
+        """
+            Run `fn` in the background in fast path mode, right away
+            otherwise. Used for diagnostics that aren't needed to place
+            orders (printing, verbose logging). Errors are logged.
+        """
+        def run():
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                self.logger.warning(f"Deferred {getattr(fn, '__name__', fn)} failed: {e}")
 
-                # Skip tweets older than 15 minutes
-                # Safe guard to avoid executing trades on old tweets
-                #if saxo_helper.doc_older_than(doc, max_age=20):
-                #    continue
+        if self.fast_path:
+            self._diagnostics.submit(run)
+        else:
+            run()
 
-                # Execute trades for signals in tweet
-                for signal in doc["signals"]:
-                    self.trade(signal)
+    def record_latency(self, action:str) -> float:
+        """
+            Record time from the change stream event to the order POST of
+            the alert being executed (see `EVENT_TIME`).
+
+            Returns:
+                float: Latency in ms, `None` if not executing an alert
+        """
+        event_time = EVENT_TIME.get()
+        if event_time is None:
+            return None
+        latency = (time.perf_counter() - event_time) * 1000
+        self.latency.append(latency)
+        self.defer(self.logger.info, f"Event to {action} POST: {latency:.1f} ms")
+        return latency
+
+    def missed_alerts(self, db, since, max_age=15, limit=50, profiles=None) -> list:
+        """
+            Alerts created after `since`, but at most `max_age` minutes ago,
+            that were not dispatched to all `profiles` yet.
+
+            Used to catch up when the change stream can't be resumed. Trading
+            on older alerts is not safe.
+
+            Args:
+                db (Database): Database
+                since (datetime): Last time the change stream was known to be current
+                max_age (int): Max age of alerts in minutes
+                limit (int): Max number of alerts
+                profiles (list): Profile names (default: this profile)
+
+            Returns:
+                list: Alert tweets, oldest first
+        """
+        # created_at is stored as naive UTC
+        since = since.replace(tzinfo=None)
+        oldest = datetime.now(tz=timezone.utc).replace(tzinfo=None) - timedelta(minutes=max_age)
+        query = {
+            "alert": True,
+            "signals": {"$exists": True},
+            "$or": [{f"dispatched.{name}": {"$exists": False}}
+                    for name in profiles or [self.profile_name]],
+            "created_at": {"$gte": max(since, oldest)}
+        }
+        projection = {"tid": 1, "signals": 1, "created_at": 1}
+        cursor = db.tweets.find(query, projection).sort("created_at", 1).limit(limit)
+        return list(cursor)
 
     def set_stoploss(self, position, points=0) -> bool:
         """
@@ -970,8 +1652,10 @@ class Saxo:
 
         msg = f"Stop loss set to {stoploss_price} ({points} points) on {pos_id}"
         self.logger.info(msg)
+        if not self.pre_validate(order):
+            return False
+        self.record_latency("stop loss")
         rsp = self.post(path="/trade/v2/orders", data=order)
-        time.sleep(1) # Sleep to avoid rate limiting
 
         if rsp.status_code != 200:
             # Cases
@@ -982,8 +1666,25 @@ class Saxo:
             self.logger.error(f"Failed to set stop loss for position: {pos_id}. Response: {rsp.json()}")
             return False
 
+        order_ids = self.order_ids(rsp)
+        self.ledger.stoploss_set(pos_id, sl_order[0]["OrderPrice"],
+                                 order_id=order_ids[0] if order_ids else None)
         return True
 
+    def order_ids(self, rsp:Response) -> list:
+        """
+            Order IDs of an order response, e.g.
+            `{'OrderId': '5014824029', 'Orders': [{'OrderId': '5014824030'}]}`
+            returns `['5014824029', '5014824030']`
+        """
+        try:
+            data = rsp.json()
+        except ValueError:
+            return []
+        ids = [data["OrderId"]] if "OrderId" in data else []
+        ids += [o["OrderId"] for o in data.get("Orders", []) if "OrderId" in o]
+        return ids
+
     def cancel_order(self, orders:str):
         """
             Cancel order(s)
@@ -1017,41 +1718,80 @@ class Saxo:
         return rsp
 
     #### UTILS ####
+    def instrument_details(self, uic:int, asset_type:str) -> dict:
+        """
+            Get instrument details (reference data), cached on disk by
+            `InstrumentCache`.
+
+            Example output:
+                `{"Uic": 4913, "AssetType": "CfdOnIndex", "TickSize": 0.25,
+                  "MinimumTradeSize": 1, "TradingSessions": {"Sessions": [..]}, ..}`
+        """
+        field_groups = "OrderSetting,SupportedOrderTypeSettings,TradingSessions"
+        rsp = self.get(f"/ref/v1/instruments/details/{uic}/{asset_type}"
+                       f"?AccountKey={self.AccountKey}&FieldGroups={field_groups}")
+        if rsp.status_code != 200:
+            raise Exception(f"Failed to get instrument details of {asset_type} {uic} ({rsp.status_code})")
+        return rsp.json()
+
     def instruments(self):
         """ Get all instruments """
         rsp = self.get(path=f"/ref/v1/instruments?AccountKey={self.AccountKey}&Keywords=Micro%202000&ExchangeId=CME&AssetTypes=ContractFutures")
         return rsp.json()
 
-    def tickers(self) -> dict:
+    def tickers(self, background=False) -> dict:
         """
             Get ticker configuration.
 
-            This method will generate a .tickers file to cache the configuration.
-            The file contains the Saxo configuration for the different indexes.
-            It will calculate the 200-day moving average for each index.
+            The configuration is cached in a .tickers file, which contains the
+            Saxo configuration for the different indexes and their 200-day
+            moving average. When the file is older than a day, it's refreshed
+            (see `TickerRefresher` and `build_tickers()`).
 
+            Args:
+                background (bool): Return the current configuration, and
+                    refresh it in a background thread. Only for long-running
+                    processes, e.g. `watch()`.
         """
-        filename = ".tickers"
-        
-        def modification_date(filename):
-            t = os.path.getmtime(filename)
-            return datetime.fromtimestamp(t)
-        
-        def get_ma():
-            # Define tickers for RUT, NDX, SPX, DJIA
-            tickers = {
-                'RUT': '^RUT',
-                'NDX': '^NDX',
-                'SPX': '^GSPC',
-                'DJIA': '^DJI'
-            }
+        tickers = self.ticker_refresher.get(background=background)
+        self.logger.info(tickers)
+        return tickers
+
+    def build_tickers(self, previous:dict=None, timeout:float=30) -> dict:
+        """
+            Build the ticker configuration.
 
-            # Fetch data for the past year to calculate the 200-day moving average
-            data = {ticker: yf.download(symbol, period='1y', progress=False) for ticker, symbol in tickers.items()}
+            The 200-day moving averages and the RUT Futures Uic are fetched in
+            parallel. Values that can't be fetched within `timeout` seconds
+            are taken from the `previous` configuration.
 
-            # Calculate the 200-day moving average for each index
-            ma_200 = {ticker: round(data[ticker]['Close'].rolling(window=200).mean().iloc[-1]) for ticker in tickers}
-            return ma_200
+            Raises:
+                ValueError: A value could neither be fetched nor taken from
+                    the `previous` configuration. An incomplete configuration
+                    is never returned, so it's not published (see
+                    `TickerRefresher.refresh()`).
+
+            Args:
+                previous (dict): Current ticker configuration
+                timeout (float): Seconds to wait for all fetches
+
+            Returns:
+                dict: Ticker configuration
+        """
+        previous = previous or {}
+
+        def get_ma(ticker, symbol):
+            # Fetch the days missing from the bar store, and get the 200-day moving average
+            self.bar_store.update(ticker, symbol)
+            ma = self.bar_store.moving_average(ticker, 200)
+            if ma is None:
+                raise ValueError("not enough bars for the 200-day moving average")
+            return round(ma)
+
+        def get_rut_uic():
+            # Dynamically set the RUT Futures Uic
+            instruments = self.instrument_cache.cached("search:Micro 2000:CME", self.instruments)
+            return instruments["Data"][0]["Identifier"]
 
         # Default ticker configuration
         tickers = {
@@ -1082,25 +1822,31 @@ class Saxo:
             }
         }
 
-        # if .200ma file is older than 1 day, update it
-        if not os.path.exists(filename) or (datetime.now() - modification_date(filename)).days > 1:
-            self.logger.info(f"Updating ticker config cache ({filename})..")
+        # Threads that don't finish in time are left behind, not waited for
+        pool = ThreadPoolExecutor(max_workers=len(YAHOO_TICKERS) + 1, thread_name_prefix="saxo-tickers")
+        futures = {(ticker, "200ma"): pool.submit(get_ma, ticker, symbol)
+                   for ticker, symbol in YAHOO_TICKERS.items()}
+        futures[("RUT", "Uic")] = pool.submit(get_rut_uic)
+        pool.shutdown(wait=False)
 
-            # Update 200ma values
-            ma_values = get_ma()
-            for symbol in ma_values:
-                tickers[symbol]["200ma"] = ma_values[symbol]
-
-            # Dynamically set the RUT Futures Uic
-            rut_uic = self.instruments()["Data"][0]["Identifier"]
-            tickers["RUT"]["Uic"] = rut_uic
-
-            tickers = utils.write_json(filename=filename, data=tickers)
-        else:
-            self.logger.info("Getting ticker config from cache (.ticker)")
-            tickers = utils.read_json(filename=filename)
+        deadline = time.monotonic() + timeout
+        missing = []
+        for (ticker, key), future in futures.items():
+            try:
+                tickers[ticker][key] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except Exception as e:
+                value = previous.get(ticker, {}).get(key)
+                if value is None:
+                    self.logger.error(f"Failed to get {key} of {ticker} ({e or type(e).__name__}), "
+                                      f"and there is no previous value")
+                    missing.append(f"{ticker} {key}")
+                    continue
+                self.logger.warning(f"Failed to get {key} of {ticker} ({e or type(e).__name__}), "
+                                    f"using previous value {value}")
+                tickers[ticker][key] = value
 
-        self.logger.info(tickers)
+        if missing:
+            raise ValueError(f"Ticker config is incomplete, missing {', '.join(missing)}")
         return tickers
 
 
@@ -1109,8 +1855,13 @@ class SaxoHelper():
     def __init__(self):
         # Create a logger instance for the class
         self.logger = logging.getLogger(__name__)
-        self.tickers = utils.read_json(".tickers")
-        
+        self.registry = TickerRegistry.instance()
+
+    @property
+    def tickers(self) -> dict:
+        """ Ticker configuration (shared, reloaded when `.tickers` changes) """
+        return self.registry.tickers
+
     def doc_older_than(self, document, max_age=15):
         """
         Check if document is older than max_age. `created_at` from db is
@@ -1223,6 +1974,36 @@ class SaxoHelper():
         """
             Filter positions
 
+            Positions are indexed once (see `PositionIndex`), and filters are
+            answered with set intersections. Output is identical to
+            `filter_positions_legacy()`.
+
+            Args:
+                positions (dict): Positions object
+                cfd_only (bool): Show CFDs only
+                profit_only (bool): Show positions in profit only
+                symbol (str): Show positions for symbol only
+                status (list): Show positions with status [Open, Closed, Working]
+
+            Returns:
+                dict: Filtered positions object
+
+            Example:
+                `{'__count': len(new_positions), 'Data': [..]}`
+        """
+        index = PositionIndex(positions["Data"], self.uic_to_symbol)
+        new_positions = index.filter(cfd_only=cfd_only, profit_only=profit_only,
+                                     symbol=symbol, status=status)
+        return {'__count': len(new_positions), 'Data': new_positions}
+
+    def filter_positions_legacy(self, positions:dict, cfd_only:bool=True,
+                                profit_only:bool=True, symbol:bool=None,
+                                status:list=None) -> dict:
+        # TODO: symbol is set as bool, should be str
+        """
+            Filter positions (previous implementation, kept for
+            `scripts/bench_filter_positions.py`)
+
             Args:
                 positions (dict): Positions object
                 cfd_only (bool): Show CFDs only
@@ -1295,13 +2076,8 @@ class SaxoHelper():
             Example:
                 saxo.uic_to_symbol(4162) --> SPX
         """
-        # TODO: Split this into two separate functions
-        uic = int(uic)
-        for symbol, v in self.tickers.items():
-            if v["Uic"] == uic:
-                return symbol
-        
-        return f"N/A"
+        symbol = self.registry.uic_to_symbol(int(uic))
+        return "N/A" if symbol is None else symbol
 
     def symbol_to_uic(self, symbol) -> int:
         """
@@ -1317,12 +2093,10 @@ class SaxoHelper():
                 saxo.symbol_to_uic("SPX") --> 4162
         """
         symbol = symbol.upper()
-        try:
-            ret = self.tickers[symbol]["Uic"]
-            return ret
-        except Exception:
+        uic = self.registry.symbol_to_uic(symbol)
+        if uic is None:
             self.logger.error(f"symbol_to_uic failed for {symbol}")
-            return None
+        return uic
 
     def get_stoploss(self, symbol):
         """
@@ -1339,7 +2113,5 @@ class SaxoHelper():
             return 9
 
     def get_asset_type(self, uic):
-        for ticker, info in self.tickers.items():
-            if info['Uic'] == uic:
-                return info['AssetType']
-        return None
+        """ Lookup AssetType by Uic, returns None if unknown """
+        return self.registry.uic_to_asset_type(uic)
@@ -0,0 +1,167 @@
+import logging
+import itertools
+import threading
+from urllib.parse import urlparse, parse_qs
+from websockets.sync.server import serve
+from websockets.exceptions import ConnectionClosed
+from northy.saxo_streaming import encode_message
+
+class FakeResponse:
+    """ Minimal stand-in for `requests.Response` """
+    def __init__(self, status_code:int, data:dict=None) -> None:
+        self.status_code = status_code
+        self.data = data or {}
+
+    def json(self) -> dict:
+        return self.data
+
+class FakeStreamingServer:
+    """
+        Local stand-in for the SaxoBank streaming API, for tests and
+        benchmarks without network access.
+
+        Serves the websocket endpoint on `url`, and the subscription
+        endpoints through `post()` (same signature as `Saxo.post()`), so the
+        server can be passed as `client` to `StreamingConnection`.
+
+        All messages are kept, so a client reconnecting with `messageid`
+        gets the messages it missed. Messages sent while a context is not
+        connected are delivered when it connects.
+
+        Args:
+            snapshots (dict): Snapshot data by subscription path, e.g.
+                `{"/trade/v1/infoprices/subscriptions": lambda args: [..]}`
+            token (str): Required access token (default: any)
+
+        Example:
+            server = FakeStreamingServer(snapshots=snapshots)
+            server.start()
+            streaming = StreamingConnection(client=server, url=server.url, token=lambda: "token")
+            server.push("/trade/v1/infoprices/subscriptions", [{"Uic": 4912, "Quote": {"Bid": 1}}])
+            server.stop()
+    """
+    def __init__(self, snapshots:dict=None, token:str=None) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.snapshots = snapshots or {}
+        self.token = token
+        self.subscriptions = {}  # {(context_id, reference_id): {"path": .., "arguments": ..}}
+        self.connections = {}  # {context_id: connection}
+        self.messages = []  # [(message_id, context_id, frame)]
+        self.delivered = {}  # {context_id: last delivered message_id}
+        self.requests = []  # [(method, path, data)]
+        self._message_ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._server = None
+        self._thread = None
+        self.url = None
+
+    def start(self) -> None:
+        self._server = serve(self._handler, "127.0.0.1", 0, process_request=self._authorize)
+        port = self._server.socket.getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}/streamingws"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._thread.join()
+
+    #### Subscription endpoints ####
+    def post(self, path, data, method_override="POST") -> FakeResponse:
+        """ Create (POST) or delete (DELETE) a subscription """
+        with self._lock:
+            self.requests.append((method_override, path, data))
+            if method_override == "DELETE":
+                # {path}/{context_id}/{reference_id}
+                context_id, reference_id = path.rstrip("/").split("/")[-2:]
+                self.subscriptions.pop((context_id, reference_id), None)
+                return FakeResponse(202)
+
+            key = (data["ContextId"], data["ReferenceId"])
+            self.subscriptions[key] = {"path": path, "arguments": data["Arguments"]}
+            snapshot = self.snapshots.get(path, lambda arguments: [])(data["Arguments"])
+            return FakeResponse(201, {
+                "ContextId": key[0],
+                "ReferenceId": key[1],
+                "State": "Active",
+                "Snapshot": {"Data": snapshot},
+            })
+
+    #### Streaming ####
+    def push(self, path:str, data) -> None:
+        """ Send data to all subscriptions of `path` """
+        with self._lock:
+            for (context_id, reference_id), sub in list(self.subscriptions.items()):
+                if sub["path"] == path:
+                    self.send(context_id, reference_id, data)
+
+    def send(self, context_id:str, reference_id:str, payload) -> int:
+        """
+            Send a message to a context (kept for replay if not connected).
+
+            Returns:
+                int: Message ID
+        """
+        with self._lock:
+            message_id = next(self._message_ids)
+            frame = encode_message(message_id, reference_id, payload)
+            self.messages.append((message_id, context_id, frame))
+            connection = self.connections.get(context_id)
+            if connection is not None:
+                try:
+                    connection.send(frame)
+                    self.delivered[context_id] = message_id
+                except ConnectionClosed:
+                    pass
+            return message_id
+
+    def heartbeat(self, context_id:str) -> int:
+        refs = [ref for ctx, ref in self.subscriptions if ctx == context_id]
+        heartbeats = [{"OriginatingReferenceId": ref, "Reason": "NoNewData"} for ref in refs]
+        return self.send(context_id, "_heartbeat", [{"ReferenceId": "_heartbeat", "Heartbeats": heartbeats}])
+
+    def reset_subscriptions(self, context_id:str, reference_ids:list=None) -> int:
+        """ Ask client to re-create subscriptions (all if `reference_ids` is empty) """
+        return self.send(context_id, "_resetsubscriptions", [{
+            "ReferenceId": "_resetsubscriptions",
+            "TargetReferenceIds": reference_ids or [],
+        }])
+
+    def disconnect(self, context_id:str, graceful:bool=False) -> None:
+        """ Drop the connection of a context, optionally sending `_disconnect` first """
+        with self._lock:
+            if graceful:
+                self.send(context_id, "_disconnect", [{"ReferenceId": "_disconnect"}])
+            connection = self.connections.pop(context_id, None)
+        if connection is not None:
+            connection.close()
+
+    def _authorize(self, connection, request):
+        if self.token and request.headers.get("Authorization") != f"Bearer {self.token}":
+            return connection.respond(401, "Unauthorized\n")
+        return None
+
+    def _handler(self, connection) -> None:
+        query = parse_qs(urlparse(connection.request.path).query)
+        context_id = query["contextId"][0]
+
+        with self._lock:
+            # Replay messages after `messageid`, or the undelivered ones
+            last_message_id = self.delivered.get(context_id, 0)
+            if "messageid" in query:
+                last_message_id = int(query["messageid"][0])
+            for message_id, ctx, frame in self.messages:
+                if ctx == context_id and message_id > last_message_id:
+                    connection.send(frame)
+                    self.delivered[context_id] = message_id
+            self.connections[context_id] = connection
+
+        try:
+            for _ in connection:
+                pass  # Clients don't send messages
+        except ConnectionClosed:
+            pass
+        finally:
+            with self._lock:
+                if self.connections.get(context_id) is connection:
+                    del self.connections[context_id]
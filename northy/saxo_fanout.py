@@ -0,0 +1,123 @@
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from northy.saxo import Saxo
+from northy.secrets_manager import SecretsManager
+
+class SaxoFanout:
+    """
+        Executes signals on multiple SaxoBank accounts (profiles) from one
+        watcher.
+
+        The signal stream is consumed once (one change stream, one Mongo
+        client), and each alert is dispatched to all accounts concurrently.
+        Every account is a `Saxo` instance with its own OAuth session,
+        `TokenManager` and `RateLimiter` budget, so a slow or failing account
+        doesn't hold back the others.
+
+        Args:
+            accounts (list): `Saxo` instances, one per profile
+
+        Example:
+            fanout = SaxoFanout.from_profiles(["market", "limit"])
+            fanout.watch()
+    """
+    def __init__(self, accounts:list) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        if not accounts:
+            raise ValueError("At least one account is required")
+        self.accounts = {saxo.profile_name: saxo for saxo in accounts}
+        self._executor = ThreadPoolExecutor(max_workers=len(self.accounts),
+                                            thread_name_prefix="saxo-fanout")
+
+    @classmethod
+    def from_profiles(cls, profile_names:list=None) -> "SaxoFanout":
+        """
+            Create fan-out for profiles in `conf/saxo_config.encrypted`.
+
+            Args:
+                profile_names (list): Profile names (default: all profiles)
+        """
+        if not profile_names:
+            profile_names = cls.profiles()
+        return cls([Saxo(profile_name=name) for name in profile_names])
+
+    @staticmethod
+    def profiles() -> list:
+        """ Names of all profiles (sections with an `environment`) """
+        sm = SecretsManager()
+        sm.read(file="conf/saxo_config.encrypted")
+        return [name for name, section in sm.get_dict().items() if "environment" in section]
+
+    def warm_up(self) -> None:
+        """ Warm up all accounts concurrently (see `Saxo.warm_up()`) """
+        futures = {name: self._executor.submit(saxo.warm_up)
+                   for name, saxo in self.accounts.items()}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                self.logger.error(f"Failed to warm up {name}: {e}", exc_info=True)
+
+    def trade_many(self, signals:list, names:list=None) -> dict:
+        """
+            Execute signals on all accounts concurrently (see
+            `Saxo.trade_many()`).
+
+            Args:
+                signals (list): Signals (e.g. `["SPX_FLAT", "NDX_FLAT"]`)
+                names (list): Profile names of the accounts (default: all accounts)
+
+            Returns:
+                dict: Results by profile name, e.g. `{"market": [..], "limit": [..]}`.
+                      If an account failed, its result is the exception.
+        """
+        start = time.perf_counter()
+        names = list(self.accounts) if names is None else names
+        futures = {name: self._executor.submit(contextvars.copy_context().run,
+                                               self.accounts[name].trade_many, signals)
+                   for name in names}
+
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                self.logger.error(f"Failed to execute {signals} for {name}: {e}", exc_info=True)
+                results[name] = e
+
+        elapsed = time.perf_counter() - start
+        self.logger.info(f"Executed {len(signals)} signal(s) on {len(names)} "
+                         f"account(s) in {elapsed:.2f}s")
+        return results
+
+    def dispatch(self, db, doc) -> dict:
+        """
+            Claim alert for each account (see `Saxo.claim()`), and execute its
+            signals on the accounts that claimed it. Accounts whose trader
+            (e.g. a separate `cli_saxo.py watch` process) claimed the alert
+            already are skipped.
+
+            Returns:
+                dict: Results by profile name, see `trade_many()`
+        """
+        names = [name for name, saxo in self.accounts.items() if saxo.claim(db, doc)]
+        if not names:
+            self.logger.info(f"Skipping {doc['tid']}, signals were dispatched to all accounts already")
+            return {}
+        return self.trade_many(doc["signals"], names=names)
+
+    def watch(self, max_age=15) -> None:
+        """
+            Watch for alerts and execute trades on all accounts (see
+            `Saxo.watch()`). The first account consumes the stream.
+        """
+        names = ", ".join(self.accounts)
+        self.logger.info(f"Watching for alerts, trading on: {names}")
+        watcher = next(iter(self.accounts.values()))
+        watcher.watch(max_age=max_age, dispatch=self.dispatch, profiles=list(self.accounts))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,241 @@
+import copy
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from northy.saxo_streaming import merge
+
+class PositionLedger:
+    """
+        Local ledger of SaxoBank positions.
+
+        The ledger is a state built from events: a full snapshot from the
+        broker (`reconciled`), and our own order responses (`order_placed`,
+        `position_closed`, `stoploss_set`). Queries are answered from memory.
+
+        Order responses don't include the resulting positions, so placing an
+        order marks its Uic as dirty. The ledger is reconciled with the broker
+        when a query touches a dirty Uic, when the last reconcile is older
+        than `max_age` seconds, or on demand with `reconcile()`.
+
+        While positions are streamed (see `PositionSubscription`), the
+        ledger is `live`: the snapshot reconciles it, every change of a
+        position is applied as a `position_updated` event, and queries never
+        fetch.
+
+        Args:
+            fetch (callable): Returns all positions from the broker, e.g.
+                `{"__count": 3, "Data": [..]}`
+            max_age (float): Seconds between reconciles
+
+        Example:
+            ledger = PositionLedger(fetch=saxo.fetch_positions)
+            ledger.positions(uic=4913)
+            ledger.stoploss_set("5015207989", 4148.49)
+    """
+    def __init__(self, fetch, max_age=300, clock=time.monotonic, max_events=1000) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.fetch = fetch
+        self.max_age = max_age
+        self.clock = clock
+        self.events = deque(maxlen=max_events)  # Latest events, for debugging
+
+        self._lock = threading.RLock()
+        self._reconcile_lock = threading.Lock()
+        self._positions = {}  # {PositionId: position}
+        self._dirty = set()  # Uics with positions not known by the ledger
+        self._reconciled_at = None
+        self.live = False
+
+        self.metrics = {"events": 0, "reconciles": 0, "queries": 0}
+
+    #### Queries ####
+    def stale(self, uic:int=None) -> bool:
+        """
+            True if the ledger must be reconciled before answering a query
+            for `uic` (or any Uic).
+        """
+        with self._lock:
+            if self.live:
+                return False
+            if self._reconciled_at is None:
+                return True
+            if self.clock() - self._reconciled_at > self.max_age:
+                return True
+            if uic is None:
+                return len(self._dirty) > 0
+            return int(uic) in self._dirty
+
+    def positions(self, uic:int=None, refresh:bool=True) -> dict:
+        """
+            Get positions, reconciled first if stale (see `stale()`).
+
+            Args:
+                uic (int): Only positions of `uic`
+                refresh (bool): Reconcile if stale. If False, the positions
+                    known by the ledger are returned as is.
+
+            Returns:
+                dict: Positions object, `{"__count": 1, "Data": [..]}`.
+                      Positions are copies, and can be modified.
+        """
+        if refresh and self.stale(uic):
+            # Concurrent queries wait for one reconcile
+            with self._reconcile_lock:
+                if self.stale(uic):
+                    self.reconcile()
+
+        with self._lock:
+            self.metrics["queries"] += 1
+            data = [copy.deepcopy(p) for p in self._positions.values()
+                    if uic is None or p["PositionBase"]["Uic"] == int(uic)]
+        return {"__count": len(data), "Data": data}
+
+    #### Events ####
+    def reconcile(self, positions:dict=None) -> None:
+        """
+            Replace the ledger with the positions of the broker.
+
+            Args:
+                positions (dict): Positions object (default: fetched)
+        """
+        if positions is None:
+            positions = self.fetch()
+        self.apply({"type": "reconciled", "positions": positions.get("Data", [])})
+
+    def order_placed(self, uic:int, order_ids:list=None) -> None:
+        """ An order was placed, positions of `uic` will change """
+        self.apply({"type": "order_placed", "uic": int(uic), "order_ids": order_ids or []})
+
+    def position_closed(self, position_id:str) -> None:
+        """ An order to close a position was placed """
+        self.apply({"type": "position_closed", "position_id": position_id})
+
+    def stoploss_set(self, position_id:str, price:float, order_id:str=None) -> None:
+        """ Stop loss of a position was set to `price` """
+        self.apply({"type": "stoploss_set", "position_id": position_id,
+                    "price": price, "order_id": order_id})
+
+    def position_updated(self, position:dict) -> None:
+        """
+            A position changed (streamed delta). Deltas hold the changed
+            fields only, deleted positions have `__meta_deleted`.
+        """
+        self.apply({"type": "position_updated", "position": position})
+
+    def apply(self, event:dict) -> None:
+        """
+            Apply an event to the ledger.
+
+            Args:
+                event (dict): Event, e.g. `{"type": "position_closed", "position_id": "5015207989"}`
+        """
+        handler = getattr(self, f"_on_{event['type']}", None)
+        if handler is None:
+            raise ValueError(f"Unknown ledger event: {event['type']}")
+
+        with self._lock:
+            handler(event)
+            event["at"] = datetime.now(timezone.utc)
+            self.events.append(event)
+            self.metrics["events"] += 1
+        self.logger.debug(f"Ledger event: {event['type']}")
+
+    def _on_reconciled(self, event:dict) -> None:
+        self._positions = {p["PositionId"]: copy.deepcopy(p) for p in event["positions"]}
+        self._dirty.clear()
+        self._reconciled_at = self.clock()
+        self.metrics["reconciles"] += 1
+
+    def _on_order_placed(self, event:dict) -> None:
+        self._dirty.add(event["uic"])
+
+    def _on_position_updated(self, event:dict) -> None:
+        delta = event["position"]
+        position_id = delta["PositionId"]
+        if delta.get("__meta_deleted"):
+            self._positions.pop(position_id, None)
+        elif position_id in self._positions:
+            merge(self._positions[position_id], copy.deepcopy(delta))
+        else:
+            self._positions[position_id] = copy.deepcopy(delta)
+
+    def _on_position_closed(self, event:dict) -> None:
+        position = self._positions.get(event["position_id"])
+        if position is None:
+            return
+        p_base = position["PositionBase"]
+        p_base["Status"] = "Closed"
+        p_base["ExecutionTimeClose"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        p_base["RelatedOpenOrders"] = []
+
+    def _on_stoploss_set(self, event:dict) -> None:
+        position = self._positions.get(event["position_id"])
+        if position is None:
+            return
+        orders = position["PositionBase"].setdefault("RelatedOpenOrders", [])
+        for order in orders:
+            if order.get("OpenOrderType") == "StopIfTraded":
+                order["OrderPrice"] = event["price"]
+                break
+        else:
+            orders.append({
+                "Amount": abs(position["PositionBase"]["Amount"]),
+                "Duration": {"DurationType": "GoodTillCancel"},
+                "OpenOrderType": "StopIfTraded",
+                "OrderId": event["order_id"],
+                "OrderPrice": event["price"],
+                "Status": "Working",
+            })
+
+class OrderStore:
+    """
+        Thread-safe store of open orders, kept up to date by a streaming
+        subscription (see `OrderSubscription`).
+
+        Example:
+            store = OrderStore()
+            store.apply_snapshot([{"OrderId": "5012592167", "Status": "Working"}])
+            store.orders(uic=4913)
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._orders = {}  # {OrderId: order}
+        self.live = False
+
+    def apply_snapshot(self, data:list) -> None:
+        """ Replace all orders """
+        with self._lock:
+            self._orders = {o["OrderId"]: copy.deepcopy(o) for o in data}
+
+    def apply_delta(self, data:list) -> None:
+        """ Merge changed orders, remove orders with `__meta_deleted` """
+        with self._lock:
+            for delta in data:
+                order_id = delta["OrderId"]
+                if delta.get("__meta_deleted"):
+                    self._orders.pop(order_id, None)
+                elif order_id in self._orders:
+                    merge(self._orders[order_id], copy.deepcopy(delta))
+                else:
+                    self._orders[order_id] = copy.deepcopy(delta)
+
+    def get(self, order_id:str) -> dict:
+        """ Get order by ID, `None` if unknown """
+        with self._lock:
+            order = self._orders.get(order_id)
+            return copy.deepcopy(order) if order is not None else None
+
+    def orders(self, uic:int=None) -> dict:
+        """
+            Get orders, optionally of `uic` only.
+
+            Returns:
+                dict: Orders object, `{"__count": 1, "Data": [..]}`
+        """
+        with self._lock:
+            data = [copy.deepcopy(o) for o in self._orders.values()
+                    if uic is None or o.get("Uic") == int(uic)]
+        return {"__count": len(data), "Data": data}
@@ -0,0 +1,71 @@
+import logging
+from collections import namedtuple
+
+# Step of an execution plan
+Step = namedtuple("Step", ["index", "signal", "symbol", "action", "needs_positions"])
+
+class TradePlanner:
+    """
+        Plans the execution of all signals of a tweet.
+
+        * No-op signals are dropped: FLATSTOP (observation only), LIMIT
+          (not implemented), duplicates and signals that can't be parsed.
+        * Signals of the same symbol keep their order, e.g. a CLOSED before
+          a re-entry TRADE must not close the new position.
+        * Symbols with an entry (TRADE) are planned first, as entries are
+          the most latency sensitive.
+        * `needs_positions` marks steps that look up positions, so the
+          caller can fetch positions once for the whole plan.
+
+        Example:
+            planner = TradePlanner(parse=Saxo.signal_to_tuple)
+            planner.plan(["SPX_FLATSTOP", "SPX_TRADE_LONG_IN_4500_SL_10"])
+    """
+    NOOP_ACTIONS = ("FLATSTOP", "LIMIT")
+    POSITION_ACTIONS = ("FLAT", "SCALEOUT", "CLOSED")
+
+    def __init__(self, parse) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.parse = parse
+
+    def plan(self, signals:list) -> list:
+        """
+            Plan signals.
+
+            Args:
+                signals (list): Signals of a tweet
+
+            Returns:
+                list: Steps to execute, `Step(index, signal, symbol, action, needs_positions)`.
+                      `index` is the position of the signal in `signals`.
+        """
+        steps = {}  # {symbol: [Step]}, in order of first appearance
+        seen = set()
+        for index, signal in enumerate(signals):
+            if signal in seen:
+                self.logger.info(f"Skipping {signal}, duplicate signal")
+                continue
+            seen.add(signal)
+
+            try:
+                s = self.parse(signal)
+            except Exception as e:
+                self.logger.warning(f"Skipping {signal}, invalid signal ({e})")
+                continue
+            if s is None:
+                self.logger.warning(f"Skipping {signal}, unknown action")
+                continue
+
+            if s.action in self.NOOP_ACTIONS:
+                self.logger.info(f"Skipping {signal}, nothing to execute for {s.action}")
+                continue
+
+            steps.setdefault(s.symbol, []).append(Step(
+                index=index, signal=signal, symbol=s.symbol, action=s.action,
+                needs_positions=s.action in self.POSITION_ACTIONS))
+
+        # Symbols with entries first (sort is stable)
+        symbols = sorted(steps, key=lambda symbol: not any(
+            step.action == "TRADE" for step in steps[symbol]))
+        return [step for symbol in symbols for step in steps[symbol]]
@@ -0,0 +1,468 @@
+import copy
+import json
+import uuid
+import struct
+import logging
+import itertools
+import threading
+from websockets.sync.client import connect
+from websockets.exceptions import ConnectionClosed
+
+# Message header: message id (uint64), reserved (2 bytes), reference id size (uint8)
+HEADER = struct.Struct("<QHB")
+
+# Payload header: payload format (uint8), payload size (int32)
+PAYLOAD_HEADER = struct.Struct("<Bi")
+FORMAT_JSON = 0
+
+def encode_message(message_id:int, reference_id:str, payload) -> bytes:
+    """
+        Encode a streaming message (see `decode_messages()`).
+    """
+    ref = reference_id.encode("ascii")
+    data = json.dumps(payload).encode()
+    return (HEADER.pack(message_id, 0, len(ref)) + ref +
+            PAYLOAD_HEADER.pack(FORMAT_JSON, len(data)) + data)
+
+def decode_messages(frame:bytes) -> list:
+    """
+        Decode the messages of a websocket frame.
+
+        Reference: https://www.developer.saxo/openapi/learn/plain-websocket-streaming
+
+        Returns:
+            list: [(message_id, reference_id, payload), ..]
+    """
+    messages = []
+    pos = 0
+    while pos < len(frame):
+        message_id, _, ref_size = HEADER.unpack_from(frame, pos)
+        pos += HEADER.size
+        reference_id = frame[pos:pos + ref_size].decode("ascii")
+        pos += ref_size
+        payload_format, size = PAYLOAD_HEADER.unpack_from(frame, pos)
+        pos += PAYLOAD_HEADER.size
+        payload = frame[pos:pos + size]
+        pos += size
+        if payload_format == FORMAT_JSON:
+            payload = json.loads(payload)
+        messages.append((message_id, reference_id, payload))
+    return messages
+
+def merge(target:dict, delta:dict) -> dict:
+    """
+        Merge a delta into a snapshot (in place). Nested objects are merged,
+        everything else (including lists) is replaced.
+    """
+    for key, value in delta.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+class QuoteBook:
+    """
+        Thread-safe book of streamed quotes by Uic.
+
+        Quotes are replaced (never mutated) on every update, so readers can
+        keep a quote without copying it. While the stream is not live
+        (e.g. reconnecting), the book returns no quotes.
+
+        Args:
+            on_update (callable): Called with the updated quotes after every
+                snapshot and delta, e.g. `SharedQuoteCache.put_many`
+    """
+    def __init__(self, on_update=None) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._quotes = {}  # {uic: quote}
+        self.live = False
+        self.on_update = on_update
+        self.metrics = {"snapshots": 0, "deltas": 0}
+
+    def apply_snapshot(self, data:list) -> None:
+        """ Replace quotes with snapshot, e.g. `[{"Uic": 4912, "Quote": {..}}]` """
+        with self._lock:
+            for quote in data:
+                self._quotes[int(quote["Uic"])] = quote
+            self.metrics["snapshots"] += 1
+        self._updated(data)
+
+    def apply_delta(self, data:list) -> None:
+        """ Merge deltas, e.g. `[{"Uic": 4912, "Quote": {"Bid": 15013.5}}]` """
+        updated = []
+        with self._lock:
+            for delta in data:
+                uic = int(delta["Uic"])
+                quote = self._quotes.get(uic)
+                self._quotes[uic] = delta if quote is None else merge(copy.deepcopy(quote), delta)
+                updated.append(self._quotes[uic])
+                self.metrics["deltas"] += 1
+        self._updated(updated)
+
+    def _updated(self, quotes:list) -> None:
+        if self.on_update is None or not quotes:
+            return
+        try:
+            self.on_update(quotes)
+        except Exception as e:
+            self.logger.warning(f"Failed to publish quotes: {e}")
+
+    def get(self, uic:int) -> dict:
+        """ Get quote of `uic`, `None` if not available or not live """
+        if not self.live:
+            return None
+        return self._quotes.get(int(uic))
+
+    def get_many(self, uics:list) -> tuple:
+        """
+            Get quotes of `uics`.
+
+            Returns:
+                tuple: (quotes, missing), e.g. `({4912: {..}}, [4913])`
+        """
+        quotes, missing = {}, []
+        for uic in uics:
+            quote = self.get(uic)
+            if quote is None:
+                missing.append(int(uic))
+            else:
+                quotes[int(uic)] = quote
+        return quotes, missing
+
+class Subscription:
+    """
+        Base class of streaming subscriptions.
+
+        Subclasses set `name` and `path` (subscription endpoint) and handle
+        the initial snapshot and the deltas.
+    """
+    name = "subscription"
+    path = None
+
+    def arguments(self) -> dict:
+        """ `Arguments` of the subscription request """
+        return {}
+
+    def on_snapshot(self, snapshot:dict) -> None:
+        pass
+
+    def on_delta(self, data) -> None:
+        pass
+
+    def on_live(self, live:bool) -> None:
+        """ Called when the stream goes live, or stale (e.g. while reconnecting) """
+        pass
+
+class PriceSubscription(Subscription):
+    """
+        Price subscription of Uics of one asset type, streamed into a `QuoteBook`.
+    """
+    name = "prices"
+    path = "/trade/v1/infoprices/subscriptions"
+
+    def __init__(self, book:QuoteBook, uics:list, asset_type:str) -> None:
+        self.book = book
+        self.uics = uics
+        self.asset_type = asset_type
+
+    def arguments(self) -> dict:
+        return {
+            "Uics": ",".join(str(uic) for uic in self.uics),
+            "AssetType": self.asset_type,
+            "FieldGroups": ["Quote", "PriceInfoDetails"],
+        }
+
+    def on_snapshot(self, snapshot:dict) -> None:
+        self.book.apply_snapshot(snapshot.get("Data", []))
+
+    def on_delta(self, data) -> None:
+        self.book.apply_delta(data)
+
+    def on_live(self, live:bool) -> None:
+        self.book.live = live
+
+class PositionSubscription(Subscription):
+    """
+        Position subscription, streamed into a `PositionLedger`.
+    """
+    name = "positions"
+    path = "/port/v1/positions/subscriptions"
+
+    def __init__(self, ledger, client_key:str, account_key:str=None) -> None:
+        self.ledger = ledger
+        self.client_key = client_key
+        self.account_key = account_key
+
+    def arguments(self) -> dict:
+        arguments = {
+            "ClientKey": self.client_key,
+            "FieldGroups": ["PositionBase", "PositionView"],
+        }
+        if self.account_key:
+            arguments["AccountKey"] = self.account_key
+        return arguments
+
+    def on_snapshot(self, snapshot:dict) -> None:
+        self.ledger.reconcile({"Data": snapshot.get("Data", [])})
+
+    def on_delta(self, data) -> None:
+        for position in data:
+            self.ledger.position_updated(position)
+
+    def on_live(self, live:bool) -> None:
+        self.ledger.live = live
+
+class OrderSubscription(Subscription):
+    """
+        Open order subscription, streamed into an `OrderStore`.
+    """
+    name = "orders"
+    path = "/port/v1/orders/subscriptions"
+
+    def __init__(self, store, client_key:str, account_key:str=None) -> None:
+        self.store = store
+        self.client_key = client_key
+        self.account_key = account_key
+
+    def arguments(self) -> dict:
+        arguments = {"ClientKey": self.client_key}
+        if self.account_key:
+            arguments["AccountKey"] = self.account_key
+        return arguments
+
+    def on_snapshot(self, snapshot:dict) -> None:
+        self.store.apply_snapshot(snapshot.get("Data", []))
+
+    def on_delta(self, data) -> None:
+        self.store.apply_delta(data)
+
+    def on_live(self, live:bool) -> None:
+        self.store.live = live
+
+class StreamingConnection:
+    """
+        Connection to the SaxoBank streaming API.
+
+        Runs in a background thread. Subscriptions are created once the
+        connection is open, or right away if it's open already (e.g. prices
+        and portfolio share a connection); their snapshot and deltas are
+        passed to the `Subscription` objects.
+
+        On disconnect, the connection is re-established with the id of the
+        last received message, so the server replays what was missed. If the
+        server can't, it asks for the subscriptions to be reset
+        (`_resetsubscriptions`), which re-creates them with a new snapshot.
+        The connection is also re-established when the access token changes.
+
+        Reference: https://www.developer.saxo/openapi/learn/plain-websocket-streaming
+
+        Args:
+            client: Creates and deletes subscriptions, with the signature of
+                `Saxo.post()`
+            url (str): Streaming URL (e.g. `wss://streaming.saxobank.com/sim/openapi/streamingws`)
+            token (callable): Returns the current access token
+
+        Example:
+            book = QuoteBook()
+            streaming = StreamingConnection(client=saxo, url=url, token=lambda: saxo.token)
+            streaming.add(PriceSubscription(book, [4912, 4913], "CfdOnIndex"))
+            streaming.start()
+    """
+    def __init__(self, client, url:str, token, reconnect_delay=0.5,
+                 max_reconnect_delay=30, recv_timeout=1.0) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.url = url
+        self.token = token
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.recv_timeout = recv_timeout
+
+        self.context_id = "northy" + uuid.uuid4().hex[:12]
+        self.subscriptions = {}  # {reference_id: Subscription}
+        self.last_message_id = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._reference_ids = itertools.count(1)
+        self._stop = threading.Event()
+        self._thread = None
+        self.live = threading.Event()
+
+        self.metrics = {"connects": 0, "messages": 0, "heartbeats": 0,
+                        "resets": 0, "errors": 0}
+
+    def add(self, subscription:Subscription) -> None:
+        """
+            Add subscription, created once the connection is open. If it's
+            open already, it's created by the receive loop (within
+            `recv_timeout` seconds).
+        """
+        with self._lock:
+            self._pending.append(subscription)
+
+    def start(self) -> None:
+        """ Connect in a background thread """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="saxo-streaming", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5) -> None:
+        """ Disconnect and delete all subscriptions """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for reference_id in list(self.subscriptions):
+            self.unsubscribe(reference_id)
+
+    def run(self) -> None:
+        """ Connect and consume messages, reconnect on errors """
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                if self.connect_and_consume():
+                    attempt = 0
+                    continue  # Token changed, reconnect right away
+            except Exception as e:
+                self.metrics["errors"] += 1
+                self.logger.warning(f"Streaming connection lost: {e}")
+            finally:
+                self._set_live(False)
+
+            delay = min(self.reconnect_delay * 2 ** attempt, self.max_reconnect_delay)
+            attempt += 1
+            self._stop.wait(delay)
+
+    def connect_and_consume(self) -> bool:
+        """
+            Connect and consume messages until stopped or disconnected.
+
+            Returns:
+                bool: True if the token changed and the connection should be
+                      re-established
+        """
+        token = self.token()
+        url = f"{self.url}/connect?contextId={self.context_id}"
+        if self.last_message_id is not None:
+            url += f"&messageid={self.last_message_id}"
+
+        self.logger.info(f"Connecting to {self.url} ({self.context_id})")
+        with connect(url, additional_headers={"Authorization": f"Bearer {token}"}) as ws:
+            self.metrics["connects"] += 1
+
+            self.subscribe_pending()
+            self._set_live(True)
+
+            while not self._stop.is_set():
+                if self.token() != token:
+                    self.logger.info("Access token changed, reconnecting")
+                    return True
+                # Subscriptions added while connected
+                self.subscribe_pending()
+                try:
+                    frame = ws.recv(timeout=self.recv_timeout)
+                except TimeoutError:
+                    continue
+                except ConnectionClosed as e:
+                    raise ConnectionError(f"Connection closed ({e})")
+                if not self.handle(frame):
+                    raise ConnectionError("Disconnected by server")
+        return False
+
+    def handle(self, frame:bytes) -> bool:
+        """
+            Handle a websocket frame.
+
+            Returns:
+                bool: False if the server asked to disconnect
+        """
+        for message_id, reference_id, payload in decode_messages(frame):
+            self.last_message_id = message_id
+            self.metrics["messages"] += 1
+
+            if reference_id == "_heartbeat":
+                self.metrics["heartbeats"] += 1
+            elif reference_id == "_resetsubscriptions":
+                self.metrics["resets"] += 1
+                targets = payload[0].get("TargetReferenceIds") if payload else None
+                self.reset(targets or list(self.subscriptions))
+            elif reference_id == "_disconnect":
+                return False
+            elif reference_id in self.subscriptions:
+                self.subscriptions[reference_id].on_delta(payload)
+            else:
+                self.logger.debug(f"Message for unknown subscription {reference_id}")
+        return True
+
+    def subscribe(self, subscription:Subscription) -> str:
+        """
+            Create subscription and apply its snapshot.
+
+            Returns:
+                str: Reference ID
+        """
+        reference_id = f"{subscription.name}_{next(self._reference_ids)}"
+        data = {
+            "ContextId": self.context_id,
+            "ReferenceId": reference_id,
+            "RefreshRate": 0,
+            "Arguments": subscription.arguments(),
+        }
+        rsp = self.client.post(path=subscription.path, data=data)
+        if rsp.status_code not in (200, 201):
+            raise ConnectionError(f"Failed to subscribe to {subscription.path} ({rsp.status_code})")
+
+        subscription.on_snapshot(rsp.json().get("Snapshot", {}))
+        self.subscriptions[reference_id] = subscription
+        self.logger.info(f"Subscribed to {subscription.path} ({reference_id})")
+        return reference_id
+
+    def subscribe_pending(self) -> None:
+        """
+            Create the subscriptions added with `add()`. A subscription that
+            fails stays pending, and is created again after reconnecting.
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                subscription = self._pending[0]
+            self.subscribe(subscription)
+            with self._lock:
+                self._pending.remove(subscription)
+            if self.live.is_set():
+                subscription.on_live(True)
+
+    def unsubscribe(self, reference_id:str) -> None:
+        """ Delete subscription """
+        subscription = self.subscriptions.pop(reference_id)
+        path = f"{subscription.path}/{self.context_id}/{reference_id}"
+        try:
+            self.client.post(path=path, data=None, method_override="DELETE")
+        except Exception as e:
+            self.logger.warning(f"Failed to delete subscription {reference_id}: {e}")
+
+    def reset(self, reference_ids:list) -> None:
+        """ Re-create subscriptions, with a new snapshot """
+        for reference_id in reference_ids:
+            if reference_id not in self.subscriptions:
+                continue
+            subscription = self.subscriptions[reference_id]
+            self.unsubscribe(reference_id)
+            self.subscribe(subscription)
+
+    def wait_live(self, timeout:float=None) -> bool:
+        """ Wait until the stream is live """
+        return self.live.wait(timeout)
+
+    def _set_live(self, live:bool) -> None:
+        if live:
+            self.live.set()
+        else:
+            self.live.clear()
+        for subscription in list(self.subscriptions.values()):
+            subscription.on_live(live)
@@ -0,0 +1,146 @@
+import jwt
+import time
+import logging
+import threading
+
+class TokenManager:
+    """
+        Keeps the SaxoBank access token fresh.
+
+        The expiry of a token is decoded once, when the token is set. A
+        background timer refreshes the token `margin` seconds before it
+        expires, so requests never wait for an OAuth round trip, unless the
+        background refresh failed.
+
+        Args:
+            refresh (callable): Returns a new token, either the access token
+                (str) or the token response (dict with `access_token`)
+            margin (int): Seconds before expiry to refresh the token
+            retry_delay (int): Seconds between failed background refreshes
+            background (bool): Refresh in the background
+
+        Example:
+            tokens = TokenManager(refresh=saxo.refresh_token, margin=60)
+            tokens.set_token("eyJhbGciOiJFUzI1NiIsI...")
+            tokens.get_token()
+    """
+    def __init__(self, refresh, margin=60, retry_delay=10, background=True,
+                 clock=time.time) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.refresh_func = refresh
+        self.margin = margin
+        self.retry_delay = retry_delay
+        self.background = background
+        self.clock = clock
+
+        self._token = None
+        self.expires_at = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._timer = None
+
+        self.metrics = {
+            "requests": 0,              # Tokens handed out
+            "blocking_refreshes": 0,    # Requests that waited for a refresh
+            "background_refreshes": 0,
+            "failed_refreshes": 0,
+        }
+
+    @property
+    def token(self) -> str:
+        return self._token
+
+    def set_token(self, token:str) -> None:
+        """
+            Set a new access token and schedule its refresh.
+        """
+        try:
+            expires_at = jwt.decode(token, options={"verify_signature": False})["exp"]
+        except Exception as e:
+            # Unknown expiry, refreshed on first use
+            self.logger.warning(f"Unable to decode token expiry: {e}")
+            expires_at = 0
+
+        with self._lock:
+            self._token = token
+            self.expires_at = expires_at
+        self.logger.debug(f"Token expires in {self.expires_in():.0f}s")
+        self._schedule(self.expires_at - self.margin - self.clock())
+
+    def expires_in(self) -> float:
+        """ Seconds until the token expires """
+        return self.expires_at - self.clock()
+
+    def expired(self) -> bool:
+        return self.expires_in() <= 0
+
+    def get_token(self) -> str:
+        """
+            Get a valid access token. Only refreshes the token (blocking) if it
+            has expired.
+        """
+        self.record("requests")
+        if self.expired():
+            self.record("blocking_refreshes")
+            self.logger.warning("Token has expired, refreshing before request")
+            self.refresh()
+        return self._token
+
+    def refresh(self) -> bool:
+        """
+            Refresh the token now. Concurrent callers wait for the running
+            refresh instead of refreshing again.
+
+            Returns:
+                bool: True if the token was refreshed
+        """
+        token = self._token
+        with self._refresh_lock:
+            # Refreshed while waiting for the lock
+            if self._token != token:
+                return True
+
+            try:
+                rsp = self.refresh_func()
+            except Exception as e:
+                self.logger.error(f"Failed to refresh token: {e}")
+                rsp = None
+
+            if not rsp:
+                self.record("failed_refreshes")
+                return False
+
+            self.set_token(rsp["access_token"] if isinstance(rsp, dict) else rsp)
+            return True
+
+    def record(self, metric:str) -> None:
+        """ Increment metric """
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def stop(self) -> None:
+        """ Cancel the scheduled refresh """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _schedule(self, delay:float) -> None:
+        if not self.background or self.expires_at == 0:
+            return
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(max(delay, 0), self._background_refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _background_refresh(self) -> None:
+        self.record("background_refreshes")
+        if self.refresh():
+            self.logger.info(f"Token refreshed in background {self.metrics}")
+            return
+
+        # Retry, while the token is still valid
+        if not self.expired():
+            self._schedule(min(self.retry_delay, self.expires_in()))
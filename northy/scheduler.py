@@ -0,0 +1,70 @@
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+class KeyedScheduler:
+    """
+        Runs tasks in a thread pool. Tasks with different keys run in
+        parallel, tasks with the same key run one at a time, in the order
+        they were submitted. Tasks run in a copy of the submitter's context
+        (`contextvars`).
+
+        Used to execute the signals of a tweet: signals for different
+        symbols are sent to the broker at the same time, while e.g. a TRADE
+        and a FLAT for the same symbol are never reordered.
+
+        Example:
+            scheduler = KeyedScheduler(max_workers=4)
+            futures = [scheduler.submit("SPX", saxo.trade, "SPX_FLAT"),
+                       scheduler.submit("NDX", saxo.trade, "NDX_FLAT")]
+            [f.result() for f in futures]
+    """
+    def __init__(self, max_workers:int=8, name:str="scheduler") -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queues = {}  # {key: deque([(future, fn, args, kwargs)])}
+
+    def submit(self, key, fn, *args, **kwargs) -> Future:
+        """
+            Run `fn(*args, **kwargs)` after all tasks submitted before with
+            the same `key`.
+
+            Returns:
+                Future: Result of `fn`
+        """
+        future = Future()
+        context = contextvars.copy_context()
+        with self._lock:
+            queue = self._queues.get(key)
+            running = queue is not None
+            if not running:
+                queue = self._queues[key] = deque()
+            queue.append((future, context.run, (fn,) + args, kwargs))
+
+        # Queues are drained by one worker at a time
+        if not running:
+            self._executor.submit(self._drain, key)
+        return future
+
+    def _drain(self, key) -> None:
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                future, fn, args, kwargs = queue.popleft()
+
+            if not future.set_running_or_notify_cancel():
+                continue  # Cancelled
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait:bool=True) -> None:
+        self._executor.shutdown(wait=wait)
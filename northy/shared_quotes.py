@@ -0,0 +1,263 @@
+import os
+import math
+import mmap
+import time
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, writes are only serialized within the process
+    fcntl = None
+
+MAGIC = b"NRTHQ001"
+HEADER = struct.Struct("<8sI")  # magic, slots
+SEQ = struct.Struct("<Q")
+# uic, stored_at (epoch), bid, ask, mid, AssetType, MarketState, PriceTypeBid, PriceTypeAsk, LastUpdated
+RECORD = struct.Struct("<qdddd24s16s16s16s32s")
+SLOT_SIZE = 160  # Sequence number + record, padded
+HEADER_SIZE = 64
+
+QUOTE_FIELDS = ("Bid", "Ask", "Mid")
+TEXT_QUOTE_FIELDS = ("MarketState", "PriceTypeBid", "PriceTypeAsk")
+
+def encode(quote:dict) -> tuple:
+    """ Record fields of a price response (see `Saxo.price()`) """
+    q = quote.get("Quote", {})
+    numbers = [q.get(f) for f in QUOTE_FIELDS]
+    numbers = [math.nan if n is None else float(n) for n in numbers]
+    text = [str(q.get(f) or "").encode()[:16] for f in TEXT_QUOTE_FIELDS]
+    return (*numbers, str(quote.get("AssetType") or "").encode()[:24], *text,
+            str(quote.get("LastUpdated") or "").encode()[:32])
+
+def decode(uic:int, fields:tuple) -> dict:
+    """ Price response of record fields, with the fields kept in the record only """
+    bid, ask, mid, asset_type, market_state, type_bid, type_ask, last_updated = fields
+    quote = {}
+    for name, value in zip(QUOTE_FIELDS, (bid, ask, mid)):
+        if not math.isnan(value):
+            quote[name] = value
+    for name, value in zip(TEXT_QUOTE_FIELDS, (market_state, type_bid, type_ask)):
+        if value.rstrip(b"\0"):
+            quote[name] = value.rstrip(b"\0").decode()
+    price = {"Uic": uic, "Quote": quote}
+    if asset_type.rstrip(b"\0"):
+        price["AssetType"] = asset_type.rstrip(b"\0").decode()
+    if last_updated.rstrip(b"\0"):
+        price["LastUpdated"] = last_updated.rstrip(b"\0").decode()
+    return price
+
+class SharedQuoteCache:
+    """
+        Cache of the latest quote of each Uic, shared by all processes on a
+        host through a memory-mapped file.
+
+        The file holds a fixed number of fixed-size slots, keyed by Uic
+        (open addressing). Each slot has a sequence number (seqlock): a
+        writer makes it odd, writes the record and makes it even again.
+        Readers copy the record and retry if the sequence number was odd or
+        changed in the meantime, so reads take no lock and make no system
+        calls. Writers are serialized with `flock()`. A quote is decoded
+        once per write, and the same dict is returned until the slot
+        changes (like `QuoteCache`, quotes must not be modified).
+
+        Only the fields used by the trader are kept: Bid, Ask, Mid,
+        MarketState, PriceTypeBid, PriceTypeAsk, AssetType and LastUpdated.
+
+        Use `SharedQuoteCache.instance()` to get the cache of an
+        environment (e.g. the OpenAPI base URL). Its file is kept in the
+        temp directory by default, so all processes on the host share it.
+
+        Example:
+            cache = SharedQuoteCache(".quotes")
+            cache.put(4912, {"Uic": 4912, "Quote": {"Bid": 15013.92, "Ask": 15014.92}})
+            cache.get(4912)
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, filename:str, slots:int=256, ttl:float=2.0, clock=time.time) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.filename = filename
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._offsets = {}  # {uic: offset of its slot}
+        self._decoded = {}  # {offset: (seq, stored_at, quote)}
+        self.metrics = {"hits": 0, "misses": 0, "retries": 0, "full": 0}
+
+        self._fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._write_lock():
+            self.slots = self._init_file(slots)
+        self._mm = mmap.mmap(self._fd, HEADER_SIZE + self.slots * SLOT_SIZE)
+
+    @classmethod
+    def instance(cls, name="default", directory:str=None) -> "SharedQuoteCache":
+        """
+            Get the shared cache for `name` (e.g. the OpenAPI base URL).
+
+            Args:
+                name (str): Cache name, the file is `.quotes-<sha1 of name>`
+                directory (str): Directory of the file (default: temp directory)
+        """
+        digest = hashlib.sha1(name.encode()).hexdigest()[:8]
+        filename = os.path.join(directory or tempfile.gettempdir(), f".quotes-{digest}")
+        cache = cls._instances.get(filename)
+        if cache is None:
+            with cls._instances_lock:
+                cache = cls._instances.get(filename)
+                if cache is None:
+                    cache = cls._instances[filename] = cls(filename)
+        return cache
+
+    def _init_file(self, slots:int) -> int:
+        """ Write the header of a new file, returns the number of slots """
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        header = os.read(self._fd, HEADER.size)
+        if len(header) == HEADER.size:
+            magic, existing = HEADER.unpack(header)
+            if magic == MAGIC:
+                return existing
+
+        os.ftruncate(self._fd, HEADER_SIZE + slots * SLOT_SIZE)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, HEADER.pack(MAGIC, slots))
+        return slots
+
+    @contextmanager
+    def _write_lock(self):
+        """ Serialize writers, of this and other processes """
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _slot_uic(self, offset:int) -> int:
+        return struct.unpack_from("<q", self._mm, offset + SEQ.size)[0]
+
+    def _find(self, uic:int, claim:bool=False) -> int:
+        """ Offset of the slot of `uic`, `None` if not found (or the table is full) """
+        offset = self._offsets.get(uic)
+        if offset is not None:
+            return offset
+        start = uic % self.slots
+        for i in range(self.slots):
+            offset = HEADER_SIZE + ((start + i) % self.slots) * SLOT_SIZE
+            slot_uic = self._slot_uic(offset)
+            if slot_uic == uic:
+                self._offsets[uic] = offset  # Slots never move
+                return offset
+            if slot_uic == 0:
+                if claim:
+                    return offset
+                return None
+        return None
+
+    def _read(self, offset:int, timeout:float=0.1) -> tuple:
+        """
+            Consistent copy of a slot, `(seq, uic, stored_at, fields)`. `None` if
+            the slot is still being written after `timeout` seconds (e.g.
+            the writer died).
+        """
+        mm = self._mm
+        deadline = None
+        while True:
+            seq = SEQ.unpack_from(mm, offset)[0]
+            if seq & 1 == 0:
+                record = RECORD.unpack_from(mm, offset + SEQ.size)
+                if SEQ.unpack_from(mm, offset)[0] == seq:
+                    return seq, record[0], record[1], record[2:]
+
+            # The writer may have been preempted mid-write, let it run
+            self.metrics["retries"] += 1
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                self.logger.warning(f"Slot at {offset} of {self.filename} is being written for too long")
+                return None
+            time.sleep(0)
+
+    def get(self, uic:int, max_age:float=None) -> dict:
+        """
+            Get quote of `uic` if it's not older than `max_age` (default: `ttl`)
+            seconds, otherwise `None`.
+        """
+        uic = int(uic)
+        max_age = self.ttl if max_age is None else max_age
+        offset = self._find(uic)
+        if offset is not None:
+            # Decoded again only if the slot was written since
+            decoded = self._decoded.get(offset)
+            if decoded is None or decoded[0] != SEQ.unpack_from(self._mm, offset)[0]:
+                record = self._read(offset)
+                decoded = None
+                if record is not None and record[1] == uic:
+                    seq, _, stored_at, fields = record
+                    decoded = self._decoded[offset] = (seq, stored_at, decode(uic, fields))
+            if decoded is not None and self.clock() - decoded[1] <= max_age:
+                self.metrics["hits"] += 1
+                return decoded[2]
+        self.metrics["misses"] += 1
+        return None
+
+    def get_many(self, uics:list, max_age:float=None) -> tuple:
+        """
+            Get fresh quotes of `uics`.
+
+            Returns:
+                tuple: (quotes, missing), e.g. `({4912: {..}}, [4913])`
+        """
+        quotes, missing = {}, []
+        for uic in uics:
+            quote = self.get(uic, max_age=max_age)
+            if quote is None:
+                missing.append(int(uic))
+            else:
+                quotes[int(uic)] = quote
+        return quotes, missing
+
+    def put(self, uic:int, quote:dict) -> None:
+        """ Store quote of `uic` """
+        self.put_many([dict(quote, Uic=int(uic))])
+
+    def put_many(self, quotes:list) -> None:
+        """ Store quotes, e.g. `[{"Uic": 4912, "Quote": {..}}]` """
+        stored_at = self.clock()
+        records = [(int(q["Uic"]), encode(q)) for q in quotes]
+        mm = self._mm
+        with self._write_lock():
+            for uic, fields in records:
+                offset = self._find(uic, claim=True)
+                if offset is None:
+                    self.metrics["full"] += 1
+                    self.logger.warning(f"Shared quote cache {self.filename} is full, not storing {uic}")
+                    continue
+                seq = SEQ.unpack_from(mm, offset)[0]
+                SEQ.pack_into(mm, offset, seq + 1)
+                RECORD.pack_into(mm, offset + SEQ.size, uic, stored_at, *fields)
+                SEQ.pack_into(mm, offset, seq + 2)
+
+    def invalidate(self, uic:int=None) -> None:
+        """ Mark quote of `uic`, or all quotes, as expired """
+        with self._write_lock():
+            for offset in range(HEADER_SIZE, HEADER_SIZE + self.slots * SLOT_SIZE, SLOT_SIZE):
+                slot_uic = self._slot_uic(offset)
+                if slot_uic == 0 or (uic is not None and slot_uic != int(uic)):
+                    continue
+                seq = SEQ.unpack_from(self._mm, offset)[0]
+                SEQ.pack_into(self._mm, offset, seq + 1)
+                struct.pack_into("<d", self._mm, offset + SEQ.size + 8, -math.inf)
+                SEQ.pack_into(self._mm, offset, seq + 2)
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
@@ -2,11 +2,16 @@ import re
 import sys
 import json
 import time
+import hashlib
 import logging
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from northy.prowl import Prowl
 from northy.db import Database
 from northy.saxo import SaxoHelper
+from northy.signal_grammar import SignalGrammar, PARSER_VERSION
 from northy.utils import Utils
 from northy.color import colored
 from northy.config import Config
@@ -42,19 +47,25 @@ class Signal:
 
         See documentation for more info: [signal.md](docs/signal.md)
     """
-    def __init__(self, production=None):
+    def __init__(self, production=None, connect=True):
         # Create a logger instance for the class
         self.logger = logging.getLogger(__name__)
         self.prowl = Prowl()
 
         # MongoDB
-        self.db = Database(production=production)
-        self.production = self.db.production
-        self.db_tweets = self.db.tweets
+        if connect:
+            self.db = Database(production=production)
+            self.production = self.db.production
+            self.db_tweets = self.db.tweets
+        else:
+            # Parsing only, e.g. in parse_many() worker processes
+            self.db = self.db_tweets = None
+            self.production = config["PRODUCTION"] if production is None else production
 
         # SaxoConfig
         self.signal_helper = SignalHelper()
         self.saxo_helper = SaxoHelper()
+        self.grammar = SignalGrammar()
 
     def __unique(self, sequence):
         """
@@ -63,12 +74,13 @@ class Signal:
         seen = set()
         return [x for x in sequence if not (x in seen or seen.add(x))]
 
-    def __pretty_print_signal(self, tweet):
+    def __pretty_print_signal(self, tweet, signals=None):
         """
             Print signal in color.
         """
         text = self.signal_helper.normalize_text(tweet["text"])
-        signals = self.text_to_signal(tweet)
+        if signals is None:
+            signals = self.text_to_signal(tweet)
         signal_text = ", ".join(signals)
 
         tid = tweet["tid"]
@@ -93,25 +105,197 @@ class Signal:
         """
             Updates auto-generated trading signal by tweet ID.
         """
-        signals = self.get(tid)
-        if signals is None:
+        tweet = self.db_tweets.find_one({"tid": tid, "alert": True})
+        if tweet is None:
+            self.logger.error(f"Failed getting Tweet by ID '{tid}'.")
             return None
-        else:
-            newvalues = { "$set": { "signals": signals } }
-            self.db_tweets.update_one({"tid": tid, "alert": True}, newvalues)
-            return signals
 
-    def updateall(self, limit=0):
+        signals = self.text_to_signal(tweet)
+        self.__pretty_print_signal(tweet, signals=signals)
+
+        newvalues = { "$set": {
+            "signals": signals,
+            "signals_fingerprint": self.fingerprint(tweet)
+        } }
+        self.db_tweets.update_one({"tid": tid, "alert": True}, newvalues)
+        return signals
+
+    def updateall(self, limit=0, force=False):
         """
             Update trading signal for all tweets.
+
+            Tweets with a current `signals_fingerprint` are skipped, unless
+            `force` is set. See `parse_many()`.
         """
-        results = self.db_tweets.aggregate([
-            { '$match': { 'alert': True } },  # Filter out alerts
-            { '$sort': { 'created_at': 1 } },  # Sort, oldest first
-            { '$limit': limit }  # Used for unit testing
-        ])
-        for tweet in results:
-            self.update(tweet["tid"])
+        self.parse_many(limit=limit, force=force)
+
+    def parse_many(self, limit=0, force=False, batch_size=500, workers=0, progress=None) -> dict:
+        """
+            Bulk re-parse trading signals of all alert tweets.
+
+            Streams the alert tweets in chunks of `batch_size`, parses each
+            chunk and writes the results back with a single unordered bulk
+            update per chunk.
+
+            Args:
+                limit (int): Max number of tweets to read (0 = all)
+                force (bool): Also parse tweets with a current `signals_fingerprint`
+                batch_size (int): Tweets per chunk
+                workers (int): Parse chunks in a pool of worker processes (0 = inline)
+                progress (callable): Called with the counters after each chunk
+
+            Returns:
+                dict: Counters
+                    {
+                        "total": 2461,      # Alert tweets to read
+                        "read": 2461,
+                        "skipped": 2400,    # Fingerprint is current
+                        "parsed": 59,
+                        "failed": 2,
+                        "modified": 59,     # Documents modified in the DB
+                        "elapsed": 1.2,     # Seconds
+                        "rate": 2050.8      # Tweets read/sec
+                    }
+        """
+        query = {"alert": True}
+        projection = {"_id": 0, "tid": 1, "text": 1, "signals_fingerprint": 1}
+        cursor = self.db_tweets.find(query, projection, batch_size=batch_size)
+        cursor = cursor.sort("created_at", 1)  # Oldest first
+        total = self.db_tweets.count_documents(query)
+        if limit:
+            cursor = cursor.limit(limit)  # Used for unit testing
+            total = min(total, limit)
+
+        counters = {"total": total, "read": 0, "skipped": 0, "parsed": 0,
+                    "failed": 0, "modified": 0, "elapsed": 0.0, "rate": 0.0}
+        start = time.perf_counter()
+
+        def stale(chunk):
+            # Drop tweets with a current fingerprint
+            counters["read"] += len(chunk)
+            if force:
+                return chunk
+            tweets = [t for t in chunk if not self.fingerprint_is_current(t)]
+            counters["skipped"] += len(chunk) - len(tweets)
+            return tweets
+
+        def write(results):
+            updates = []
+            for res in results:
+                if "error" in res:
+                    counters["failed"] += 1
+                    continue
+                updates.append(({"tid": res["tid"], "alert": True}, {"$set": {
+                    "signals": res["signals"],
+                    "signals_fingerprint": res["signals_fingerprint"]
+                }}))
+            counters["parsed"] += len(updates)
+            counters["modified"] += self.db.bulk_update(updates)
+
+            counters["elapsed"] = time.perf_counter() - start
+            counters["rate"] = counters["read"] / counters["elapsed"] if counters["elapsed"] else 0.0
+            if progress:
+                progress(dict(counters))
+
+        chunks = iter(lambda: list(islice(cursor, batch_size)), [])
+        if workers:
+            # Keep a bounded number of chunks in flight
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker,
+                                     initargs=(self.production,)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_parse_chunk, stale(chunk)))
+                    if len(pending) >= workers * 2:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+        else:
+            for chunk in chunks:
+                write(self.parse_chunk(stale(chunk)))
+
+        self.logger.info(f"Parsed {counters['parsed']} tweets, {counters['skipped']} were up-to-date, "
+                         f"{counters['failed']} failed ({counters['rate']:.0f} tweets/sec)")
+        return counters
+
+    def parse_chunk(self, tweets:list) -> list:
+        """
+            Parse a list of tweets, without touching the DB.
+
+            Output:
+                [
+                    {"tid": "1550479656805081088", "signals": ["SPX_TRADE_LONG_IN_3609_SL_10"], "signals_fingerprint": {...}},
+                    {"tid": "1830969558456565859", "error": "list index out of range"}
+                ]
+        """
+        results = []
+        for tweet in tweets:
+            try:
+                signals = self.text_to_signal(tweet)
+            except Exception as e:
+                self.logger.error(f"Failed parsing signal to text for {tweet['tid']}: {e}")
+                results.append({"tid": tweet["tid"], "error": str(e)})
+                continue
+            results.append({
+                "tid": tweet["tid"],
+                "signals": signals,
+                "signals_fingerprint": self.fingerprint(tweet)
+            })
+        return results
+
+    def fingerprint(self, tweet:dict) -> dict:
+        """
+            Fingerprint of everything the signals of a tweet are generated from.
+
+            Stored as `signals_fingerprint` next to `signals`.
+
+            Output:
+                {
+                    "parser": 1,                    # PARSER_VERSION
+                    "text": "a94a8fe5ccb19ba6",     # Hash of normalized text
+                    "tickers": "61ee8b5601a84d5b",  # Ticker config version
+                    "200ma": {"NDX": 11946, "SPX": 3946, "RUT": 1750, "DJIA": 35215}
+                }
+        """
+        text = self.signal_helper.normalize_text(tweet["text"])
+        registry = self.saxo_helper.registry
+        return {
+            "parser": PARSER_VERSION,
+            "text": hashlib.sha1(text.encode()).hexdigest()[:16],
+            "tickers": registry.version,
+            "200ma": registry.moving_averages,
+        }
+
+    def fingerprint_is_current(self, tweet:dict) -> bool:
+        """
+            Returns true if parsing the tweet again would generate the same
+            signals as the ones stored with `signals_fingerprint`.
+
+            When only the 200ma values moved, signals change only for tweets
+            with multiple prices, where a price is now closer to another
+            symbol (see `SignalHelper.get_closest_symbols()`).
+        """
+        stored = tweet.get("signals_fingerprint")
+        if not stored:
+            return False
+
+        current = self.fingerprint(tweet)
+        if stored == current:
+            return True
+
+        # Parser, text or ticker config changed
+        if any(stored.get(k) != current[k] for k in ("parser", "text", "tickers")):
+            return False
+
+        # Only the 200ma values moved
+        try:
+            tokens = self.grammar.tokenize(tweet["text"])
+            changed = self.signal_helper.assignment_changed
+            old_ma, new_ma = stored["200ma"], current["200ma"]
+            return not (changed(tokens.IN, old_ma, new_ma) or
+                        changed(tokens.OUT, old_ma, new_ma))
+        except (KeyError, TypeError):
+            # 200ma missing from stored fingerprint or ticker config
+            return False
 
     def parse(self, tid:str, update_db=True) -> dict:
         """
@@ -175,7 +359,7 @@ class Signal:
         # Update DB if enabled
         if update_db:
             self.logger.info(f"Updating {tid} with signals and alert flag")
-            newvalues = { "$set": data }
+            newvalues = { "$set": dict(data, signals_fingerprint=self.fingerprint(tweet)) }
             self.db_tweets.update_one(query, newvalues)
 
         return data
@@ -184,13 +368,136 @@ class Signal:
         """
             Parse raw tweet to an array of trading signal.
 
+            The tweet is normalized and tokenized once by `SignalGrammar`.
+            Output is identical to `text_to_signal_legacy()`.
+
             Input:
                 Tweet JSON object
 
             Output:
                 `["SPX_TRADE_LONG_IN_3609_SL_10"]`
         """
-        signal_helper = SignalHelper()
+        #### INPUT VALIDATION ####
+        if not isinstance(tweet, dict):
+            self.logger.error("Tweet input is not dict")
+            return []
+        
+        if "tid" not in tweet:
+            self.logger.error("Tweet input is missing 'tid'")
+            return []
+        
+        # Filter out non-alerts
+        if not self.is_trading_signal(tweet["text"]):
+            self.logger.debug("No trading signal found")
+            return []
+        
+        # Filter out ignored tweets
+        if tweet["tid"] in ignore_tweets:
+            self.logger.debug(f"Skipping. Tweet '{tweet['tid']}' is on ignore list.")
+            return []
+        #############################
+
+        tokens = self.grammar.tokenize(tweet["text"])
+        text, symbols, keywords = tokens.text, tokens.symbols, tokens.keywords
+        get_closest_symbols = self.signal_helper.get_closest_symbols
+        get_stoploss = self.saxo_helper.get_stoploss
+
+        # Symbol guesses are the same for every symbol in the tweet, so
+        # they are resolved on first use only.
+        closest = {}
+        def closest_price(inout, symbol):
+            if inout not in closest:
+                closest[inout] = get_closest_symbols(getattr(tokens, inout), symbols)
+            return closest[inout][symbol]
+
+        def find_trade(symbol):
+            # Find trade direction
+            direction = "LONG" if "LONG" in keywords else "SHORT"
+
+            # Find entry
+            IN = closest_price("IN", symbol)
+
+            # Find stop loss (see text_to_signal_legacy() for TODOs)
+            POINTS = get_stoploss(symbol)
+            self.logger.warning("Setting SL based on SaxoConfig and not the signal")
+
+            return f"{symbol}_TRADE_{direction}_IN_{IN}_SL_{POINTS}"
+
+        # Action is decided by the text, not by the symbol
+        if "TO FLAT" in keywords or "TO FLT" in keywords:
+            action = "FLAT"
+        elif "FLAT STOP" in keywords or "STOPPED" in keywords:
+            action = "FLATSTOP"
+        elif text.startswith("LIMIT"):
+            action = "LIMIT"
+        elif "CLOSED" in keywords:
+            action = "SCALEOUT" if "OUT" in keywords else "CLOSED"
+        elif text.startswith("SHORT") or text.startswith("LONG"):
+            action = "TRADE"
+        else:
+            action = None
+
+        ACTIONS = []
+        for symbol in symbols:
+            if action == "FLAT":
+                ACTIONS.append(f"{symbol}_FLAT")
+
+            elif action == "FLATSTOP":
+                ACTIONS.append(f"{symbol}_FLATSTOP")
+                if "RE-ENTRY" in keywords:
+                    ACTIONS.append(find_trade(symbol))
+
+            elif action == "LIMIT":
+                # Set order direction
+                if "BUY" in keywords or "LONG" in keywords:
+                    direction = "LONG"
+                elif "SELL" in keywords or "SHORT" in keywords:
+                    direction = "SHORT"
+                else:
+                    raise Exception("Unknown action")
+
+                IN = closest_price("IN", symbol)
+                POINTS = get_stoploss(symbol)
+                CALC_OUT = int(IN) - int(POINTS)
+                ACTIONS.append(f"{symbol}_LIMIT_{direction}_IN_{IN}_OUT_{CALC_OUT}_SL_{POINTS}")
+
+            elif action == "SCALEOUT":
+                IN = closest_price("IN", symbol)
+                OUT = closest_price("OUT", symbol)
+                POINTS = tokens.POINTS[0]
+                ACTIONS.append(f"{symbol}_SCALEOUT_IN_{IN}_OUT_{OUT}_POINTS_{POINTS}")
+
+            elif action == "CLOSED":
+                ACTIONS.append(f"{symbol}_CLOSED")
+
+            elif action == "TRADE":
+                ACTIONS.append(find_trade(symbol))
+
+            # Unknown Action
+            else:
+                tid = tweet["tid"]
+                msg = f"Unknown action when parsing tweet {tid}"
+                self.logger.error(msg)
+                if self.production:
+                    # TODO: Move prowl notifications to logger logic
+                    self.prowl.send(message=msg, priority=1)
+
+        return ACTIONS
+
+    def text_to_signal_legacy(self, tweet:dict) -> list:
+        """
+            Parse raw tweet to an array of trading signal.
+
+            Original implementation of `text_to_signal()`. Kept as reference for
+            the parity test and `scripts/bench_signal_parser.py`.
+
+            Input:
+                Tweet JSON object
+
+            Output:
+                `["SPX_TRADE_LONG_IN_3609_SL_10"]`
+        """
+        signal_helper = self.signal_helper
 
         #### INPUT VALIDATION ####
         if not isinstance(tweet, dict):
@@ -474,6 +781,22 @@ class Signal:
             for i in count_failed:
                 self.manual(i)
 
+    def signal_history(self, limit=0) -> list:
+        """
+            Signals of all alert tweets, oldest first. Used to replay the
+            signals in a P&L backtest (see `Backtester`).
+
+            Returns:
+                list: `[(created_at, ["SPX_TRADE_LONG_IN_3609_SL_10"]), ..]`
+        """
+        cursor = self.db_tweets.find({"alert": True, "signals": {"$exists": True}},
+                                     {"_id": 0, "tid": 1, "created_at": 1, "signals": 1})
+        cursor = cursor.sort("created_at", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return [(t["created_at"], t["signals"]) for t in cursor
+                if t["tid"] not in ignore_tweets]
+
     def compare_lists(self, list1, list2):
         if len(list1) != len(list2):
             return False
@@ -601,61 +924,109 @@ class Signal:
         else:
             self.logger.debug(f"No trading signal found in {tid} - {text}")
 
-    def refresh_backlog(self, limit=1000):
+    def refresh_backlog(self, limit=1000, batch_size=100) -> int:
         """
-            Parse old tweets and make sure alert flag is set.
+            Parse new tweets and make sure alert flag is set.
             Refresh backlog to ensure we're up-to-date before starting change stream.
+
+            Tweets are read in insertion order through the `_id` index,
+            starting after the high-water mark of the last run (see
+            `Database.get_checkpoint()`). The checkpoint is saved after each
+            batch, so an interrupted or limited run continues where it stopped.
+
+            Args:
+                limit (int): Max number of tweets to read (0 = all)
+                batch_size (int): Tweets per batch
+
+            Returns:
+                int: Number of tweets parsed
         """
         self.logger.info("Refreshing backlog...")
-        query = [
-            { '$sort': { 'created_at': -1 }},
-            { '$match': { 'alert': { '$exists': False } } },
-            { '$match': { 'text': { '$not': re.compile(r"live alerts", re.IGNORECASE) } } },
-            { '$match': { 'text': re.compile(r"alert", re.IGNORECASE) } },
-            { '$project': { 'tid': 1,  'text': 1 }}
-        ]
-        cursor = self.db.tweets.aggregate(query)
-        documents = [doc for doc in cursor]
+        checkpoint = self.db.get_checkpoint("signal_backlog")
+
+        # Upper bound, so tweets inserted meanwhile are left to the change stream
+        newest = self.db_tweets.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        if newest is None:
+            return 0
+        id_range = {"$lte": newest["_id"]}
+        if checkpoint:
+            id_range["$gt"] = checkpoint["last_id"]
+
+        query = { "_id": id_range, "alert": { "$exists": False } }
+        projection = { "tid": 1, "text": 1 }
+        cursor = self.db_tweets.find(query, projection, sort=[("_id", 1)], batch_size=batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
 
         # Preload the signal helper function for better performance
         parse = self.parse
         watch_log = self.watch_log
 
-        for doc in documents:
-            data = parse(tid=doc["tid"], update_db=True)
-            watch_log(doc, data, prowl_notification=False)
-
-    def watch_stream(self) -> None: # pragma: no cover
+        read, parsed = 0, 0
+        for batch in iter(lambda: list(islice(cursor, batch_size)), []):
+            for doc in batch:
+                # Skip tweets that can't be alerts
+                text = doc["text"].lower()
+                if "alert" not in text or "live alerts" in text:
+                    continue
+                data = parse(tid=doc["tid"], update_db=True)
+                watch_log(doc, data, prowl_notification=False)
+                parsed += 1
+            read += len(batch)
+            self.db.save_checkpoint("signal_backlog", last_id=batch[-1]["_id"])
+
+        # Nothing left up to the upper bound
+        if not limit or read < limit:
+            self.db.save_checkpoint("signal_backlog", last_id=newest["_id"])
+
+        self.logger.info(f"Backlog refreshed, read {read} tweets, parsed {parsed}")
+        return parsed
+
+    def watch_stream(self, catchup=None) -> None: # pragma: no cover
+        """
+            Watch for new tweets, resuming after the last handled change.
+            See `Database.watch()`.
+        """
         # Watch for new documents (tweets) where "alert" is not set
         pipeline = [
             { "$match": { "operationType": { "$in": ["insert"] } } }, # 'insert', 'update', 'replace', 'delete'
             { "$match": { "alert": { "$exists": False } } }, # Get tweets where "alerts" it not set (yet)
         ]
-        change_stream = self.db_tweets.watch(pipeline=pipeline, 
-                                             max_await_time_ms=5000)
 
         # Iterate over the change stream
-        for change in change_stream:
+        for change in self.db.watch("signal", pipeline, catchup=catchup):
             doc = change["fullDocument"]
             data = self.parse(doc["tid"], update_db=True)
             self.watch_log(doc, data)
 
-    def watch(self, refresh_backlog=True, loops=lambda: True) -> None: # pragma: no cover
+    def watch(self, refresh_backlog=True, loops=lambda: True, retry_delay=5) -> None: # pragma: no cover
         """
             Watch for new tweets and parse them.
 
             If a trading signal is found, we add it to the DB.
+
+            The change stream resumes where it stopped, so the backlog is only
+            refreshed on the first start, or when the resume token has expired.
         """
-        if refresh_backlog:
-            self.refresh_backlog()
+        catchup = (lambda since: self.refresh_backlog(limit=0)) if refresh_backlog else None
         while loops():
             try:
                 self.logger.info("Starting change stream...")
-                self.watch_stream()
+                self.watch_stream(catchup=catchup)
             except Exception as e:
                 self.logger.critical(f"An error occurred: {e}")
-                # Pause for 60 seconds before resuming
-                time.sleep(60)
+                # Pause before resuming, no changes are missed meanwhile
+                time.sleep(retry_delay)
+
+# Parser of the current parse_many() worker process
+_parse_worker = None
+
+def _init_parse_worker(production):
+    global _parse_worker
+    _parse_worker = Signal(production=production, connect=False)
+
+def _parse_chunk(tweets:list) -> list:
+    return _parse_worker.parse_chunk(tweets)
 
 class SignalHelper:
     def __init__(self) -> None:
@@ -663,7 +1034,12 @@ class SignalHelper:
         self.saxo_helper = SaxoHelper()
         self.logger = logging.getLogger(__name__)
         self.utils = Utils()
-        self.tickers = self.utils.read_json(".tickers")
+        self.grammar = SignalGrammar()
+
+    @property
+    def tickers(self) -> dict:
+        """ Ticker configuration (shared, reloaded when `.tickers` changes) """
+        return self.saxo_helper.tickers
 
     def normalize_text(self, tweet_text:str) -> str:
         """
@@ -675,26 +1051,7 @@ class SignalHelper:
             Output:
                 Closed 2nd scale $NDX add-on | IN 11818 OUT 12360 +542
         """
-        # print(repr(tweet_text))
-
-        # Clean up string
-        text = tweet_text
-        text = text.replace("\n", " | ") # Replace newlines with |
-        text = text.replace("ALERT: ", "") # Remove ALERT: with empty string
-        text = re.sub(r'\s+', ' ', text) # Remove double spaces
-        text = text.upper()
-
-        # Fix bug with 1576847187740266496 `| LONG $SPX $NDX | IN 3580 - 10 PT STOP |IN 10900 - 25 PT STOP`
-        if text.startswith("| "):
-            text = text[2:]
-
-        # Fix bug with 1567150181933617152 `FLAT STOPPED $RUT | RE-ENTRY LONG | IN: 1795 - 10 PT STOP` where "IN:" contains a colon, all other tweets doesn't
-        text = text.replace("IN:", "IN")
-
-        # Prettify
-        text = text.replace("|IN", "| IN")
-
-        return text
+        return self.grammar.normalize_text(tweet_text)
 
     def find_INOUT(self, text, inout="IN"):
         """
@@ -767,26 +1124,17 @@ class SignalHelper:
             return {symbols[0]: numbers[0]}
         
         # 200ma for each symbol
-        ndx = self.tickers["NDX"]["200ma"]
-        spx = self.tickers["SPX"]["200ma"]
-        rut = self.tickers["RUT"]["200ma"]
-        djia = self.tickers["DJIA"]["200ma"]
+        tickers = self.tickers
+        ma = {symbol: tickers[symbol]["200ma"] for symbol in ("NDX", "SPX", "RUT", "DJIA")}
 
-        avg_price = (ndx + spx + rut) / 3
-        symbols = [key for key in self.tickers]
+        avg_price = (ma["NDX"] + ma["SPX"] + ma["RUT"]) / 3
+        symbols = [key for key in tickers]
 
         # Handle a list of multiple numbers
         if len(numbers) > 1:
             closest_numbers = {symbol: 0 for symbol in symbols}  # initialize with default value
             for num in numbers:
-                if abs(num - djia) <= abs(num - ndx) and abs(num - djia) <= abs(num - rut):
-                    closest_numbers["DJIA"] = num
-                elif abs(num - ndx) <= abs(num - spx) and abs(num - ndx) <= abs(num - rut):
-                    closest_numbers["NDX"] = num
-                elif abs(num - spx) <= abs(num - ndx) and abs(num - spx) <= abs(num - rut):
-                    closest_numbers["SPX"] = num
-                else:
-                    closest_numbers["RUT"] = num
+                closest_numbers[self.closest_symbol(num, ma)] = num
             
             sorted_symbols = sorted(symbols, key=lambda x: abs(closest_numbers[x] - avg_price))
             return {symbol: closest_numbers[symbol] for symbol in sorted_symbols}
@@ -794,11 +1142,35 @@ class SignalHelper:
         # Handle a single number
         else:
             num = numbers[0]
-            if abs(num - djia) <= abs(num - ndx) and abs(num - djia) <= abs(num - rut):
-                return {"DJIA": num}
-            elif abs(num - ndx) <= abs(num - spx) and abs(num - ndx) <= abs(num - rut):
-                return {"NDX": num}
-            elif abs(num - spx) <= abs(num - ndx) and abs(num - spx) <= abs(num - rut):
-                return {"SPX": num}
-            else:
-                return {"RUT": num}
+            return {self.closest_symbol(num, ma): num}
+
+    def closest_symbol(self, num:int, ma:dict) -> str:
+        """
+            Guess the symbol of a price, based on the 200ma of each symbol.
+
+            Example:
+                ma = {"NDX": 11946, "SPX": 3946, "RUT": 1750, "DJIA": 35215}
+                closest_symbol(3713, ma) -> "SPX"
+        """
+        ndx, spx, rut, djia = ma["NDX"], ma["SPX"], ma["RUT"], ma["DJIA"]
+        if abs(num - djia) <= abs(num - ndx) and abs(num - djia) <= abs(num - rut):
+            return "DJIA"
+        elif abs(num - ndx) <= abs(num - spx) and abs(num - ndx) <= abs(num - rut):
+            return "NDX"
+        elif abs(num - spx) <= abs(num - ndx) and abs(num - spx) <= abs(num - rut):
+            return "SPX"
+        else:
+            return "RUT"
+
+    def assignment_changed(self, numbers:list, old_ma:dict, new_ma:dict) -> bool:
+        """
+            Returns true if moving the 200ma values from `old_ma` to `new_ma`
+            changes the symbol guessed for any of the numbers.
+
+            A single number is never guessed (see `get_closest_symbols()`), so
+            it can't be affected by the 200ma values.
+        """
+        if len(numbers) <= 1:
+            return False
+        closest_symbol = self.closest_symbol
+        return any(closest_symbol(n, old_ma) != closest_symbol(n, new_ma) for n in numbers)
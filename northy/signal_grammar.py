@@ -0,0 +1,134 @@
+import re
+import logging
+from collections import namedtuple
+
+# Bump whenever a change to the grammar (or to Signal.text_to_signal) can
+# change the signals generated for an already stored tweet.
+PARSER_VERSION = 1
+
+# Single compiled scanner. Each alternative consumes one character only and
+# matches the rest in a lookahead, so overlapping tokens (e.g. `$JOIN 4000` is
+# both a symbol and an `IN 4000`) are all reported, exactly like running one
+# `re.findall()` per token type.
+#
+# IN/OUT numbers are matched on the normalized text, but behave as if colons
+# were replaced by spaces first (`IN: 4000`, `IN :4000` and `IN|4000` are all
+# entries, `IN:|4000` is not).
+TOKEN_RE = re.compile(r"""
+      \$(?=(?P<SYMBOL>\w*))
+    | I(?=N(?:[\s:]+|\|)(?P<IN>\d+))
+    | O(?=UT(?:[\s:]+|\|)(?P<OUT>\d+))
+    | \+(?=\s?(?P<POINTS>\d+))
+""", re.VERBOSE)
+
+# Keywords that decide the action of a signal
+KEYWORDS = ("TO FLAT", "TO FLT", "FLAT STOP", "STOPPED", "RE-ENTRY", "CLOSED",
+            "OUT", "LONG", "SHORT", "BUY", "SELL")
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+"""
+    Tokenized tweet.
+
+    text (str): Normalized text (see `SignalGrammar.normalize_text`)
+    symbols (list): Unique symbols, sorted alphabetically (e.g. `["NDX", "SPX"]`)
+    keywords (frozenset): Keywords found in text (e.g. `{"CLOSED", "OUT"}`)
+    IN (list): Entry prices (e.g. `[11818]`)
+    OUT (list): Exit prices (e.g. `[12760]`)
+    POINTS (list): Points (e.g. `[942]`)
+"""
+TweetTokens = namedtuple("TweetTokens", ["text", "symbols", "keywords", "IN", "OUT", "POINTS"])
+
+class SignalGrammar:
+    """
+        Tokenizer for alert tweets.
+
+        Normalizes a tweet once and extracts symbols, IN, OUT and points
+        values in a single scan of the text.
+    """
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
+
+    def normalize_text(self, tweet_text:str) -> str:
+        """
+            Takes twitter text and cleans it up and normalize the format.
+
+            Input:
+                ALERT: Closed 2nd scale $NDX add-on\\n\\nIN 11818 OUT 12360 +542
+
+            Output:
+                Closed 2nd scale $NDX add-on | IN 11818 OUT 12360 +542
+        """
+        text = tweet_text.replace("\n", " | ") # Replace newlines with |
+        text = text.replace("ALERT: ", "") # Remove ALERT: with empty string
+        text = WHITESPACE_RE.sub(" ", text) # Remove double spaces
+        text = text.upper()
+
+        # Fix bug with 1576847187740266496 `| LONG $SPX $NDX | IN 3580 - 10 PT STOP |IN 10900 - 25 PT STOP`
+        if text.startswith("| "):
+            text = text[2:]
+
+        # Fix bug with 1567150181933617152 `FLAT STOPPED $RUT | RE-ENTRY LONG | IN: 1795 - 10 PT STOP` where "IN:" contains a colon, all other tweets doesn't
+        text = text.replace("IN:", "IN")
+
+        # Prettify
+        text = text.replace("|IN", "| IN")
+
+        return text
+
+    def is_normalized(self, text:str) -> bool:
+        """
+            Returns true if normalizing `text` again would not change it.
+
+            Normalization is not idempotent for a few tweets, e.g.
+            `ALErt: $SPX stop adj to flat.` is normalized to
+            `ALERT: $SPX STOP ADJ TO FLAT.` on the first run.
+        """
+        return not ("ALERT: " in text or "IN:" in text or "|IN" in text
+                    or text.startswith("| "))
+
+    def scan(self, text:str) -> tuple:
+        """
+            Scan normalized text once and return all tokens.
+
+            Returns:
+                tuple: (symbols, IN, OUT, POINTS)
+        """
+        symbols, IN, OUT, POINTS = [], [], [], []
+        for m in TOKEN_RE.finditer(text):
+            kind = m.lastgroup
+            if kind == "SYMBOL":
+                symbols.append(m.group(kind))
+            elif kind == "IN":
+                IN.append(int(m.group(kind)))
+            elif kind == "OUT":
+                OUT.append(int(m.group(kind)))
+            else:
+                POINTS.append(int(m.group(kind)))
+        return symbols, IN, OUT, POINTS
+
+    def tokenize(self, tweet_text:str) -> TweetTokens:
+        """
+            Normalize tweet text and tokenize it.
+
+            Input:
+                `ALERT: Closed 3rd scale $NDX add-on\\nIN 11818 OUT 12760 + 942`
+
+            Output:
+                TweetTokens(text='CLOSED 3RD SCALE $NDX ADD-ON | IN 11818 OUT 12760 + 942',
+                            symbols=['NDX'], keywords=frozenset({'CLOSED', 'OUT'}),
+                            IN=[11818], OUT=[12760], POINTS=[942])
+        """
+        text = self.normalize_text(tweet_text)
+        symbols, IN, OUT, POINTS = self.scan(text)
+        keywords = frozenset([k for k in KEYWORDS if k in text])
+
+        # Prices and points have always been read from the text normalized
+        # twice. Only re-scan in the rare case where that makes a difference.
+        if not self.is_normalized(text):
+            _, IN, OUT, POINTS = self.scan(self.normalize_text(text))
+
+        # Unique symbols, sorted alphabetically
+        symbols = sorted(set(symbols))
+
+        return TweetTokens(text, symbols, keywords, IN, OUT, POINTS)
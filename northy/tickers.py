@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from northy.utils import Utils
+
+utils = Utils()
+
+class TickerRegistry:
+    """
+        Process-wide, load-once view of the ticker configuration (`.tickers`).
+
+        The file is only parsed again when its modification time changes, which
+        is checked at most once every `check_interval` seconds. All lookups are
+        served from precomputed dictionaries.
+
+        Use `TickerRegistry.instance()` to get the shared registry, instead of
+        creating new instances.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, filename=".tickers", check_interval=1.0) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.filename = filename
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._mtime = None
+        self._next_check = 0
+
+        # Lookup tables, populated by reload()
+        self._tickers = {}
+        self._symbol_to_uic = {}
+        self._uic_to_symbol = {}
+        self._uic_to_asset_type = {}
+        self._version = None
+        self._moving_averages = {}
+
+    @classmethod
+    def instance(cls, filename=".tickers") -> "TickerRegistry":
+        """
+            Get the shared registry for `filename`.
+        """
+        registry = cls._instances.get(filename)
+        if registry is None:
+            with cls._instances_lock:
+                registry = cls._instances.setdefault(filename, cls(filename))
+        return registry
+
+    def refresh(self) -> None:
+        """
+            Reload the ticker file if it changed since it was last read.
+        """
+        now = time.monotonic()
+        if self._loaded and now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+
+        try:
+            mtime = os.stat(self.filename).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if self._loaded and mtime == self._mtime:
+            return
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self._loaded and mtime == self._mtime:
+                return
+            self.reload(mtime=mtime)
+
+    def reload(self, mtime=None) -> None:
+        """
+            Read the ticker file and rebuild the lookup tables.
+        """
+        self.logger.debug(f"Loading ticker config from {self.filename}")
+        tickers = utils.read_json(self.filename) or {}
+
+        # Reversed, so the first symbol wins if two symbols share a Uic
+        items = list(reversed(tickers.items()))
+        self._symbol_to_uic = {s: v["Uic"] for s, v in tickers.items()}
+        self._uic_to_symbol = {v["Uic"]: s for s, v in items}
+        self._uic_to_asset_type = {v["Uic"]: v["AssetType"] for s, v in items}
+        # The 200ma values move daily, so they're versioned separately
+        config = {s: {k: v for k, v in t.items() if k != "200ma"} for s, t in tickers.items()}
+        config = json.dumps(config, sort_keys=True).encode()
+        self._version = hashlib.sha1(config).hexdigest()[:16]
+        self._moving_averages = {s: t.get("200ma") for s, t in tickers.items()}
+
+        self._tickers = tickers
+        self._mtime = mtime
+        self._loaded = True
+
+    @property
+    def tickers(self) -> dict:
+        """ Ticker configuration, as stored in the ticker file """
+        self.refresh()
+        return self._tickers
+
+    @property
+    def version(self) -> str:
+        """ Hash of the ticker configuration, excluding the 200ma values """
+        self.refresh()
+        return self._version
+
+    @property
+    def moving_averages(self) -> dict:
+        """ 200ma for each symbol (e.g. `{"NDX": 11946, "SPX": 3946}`) """
+        self.refresh()
+        return self._moving_averages
+
+    def symbol_to_uic(self, symbol:str) -> int:
+        """ Lookup Uic by symbol, returns None if unknown """
+        self.refresh()
+        return self._symbol_to_uic.get(symbol)
+
+    def uic_to_symbol(self, uic:int) -> str:
+        """ Lookup symbol by Uic, returns None if unknown """
+        self.refresh()
+        return self._uic_to_symbol.get(uic)
+
+    def uic_to_asset_type(self, uic:int) -> str:
+        """ Lookup AssetType by Uic, returns None if unknown """
+        self.refresh()
+        return self._uic_to_asset_type.get(uic)
+
+
+class FileLock:
+    """
+        Lock shared by processes, held while `filename` exists. A lock older
+        than `expire` seconds is from a crashed process, and is broken.
+
+        Example:
+            lock = FileLock(".tickers.lock")
+            if lock.acquire():
+                try:
+                    ...
+                finally:
+                    lock.release()
+    """
+    def __init__(self, filename:str, expire:float=300) -> None:
+        self.filename = filename
+        self.expire = expire
+
+    def acquire(self) -> bool:
+        """ Take the lock, returns False if another process holds it """
+        for _ in range(2):
+            try:
+                fd = os.open(self.filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(self.filename)
+                except FileNotFoundError:
+                    continue  # Released in the meantime
+                if age <= self.expire:
+                    return False
+                logging.getLogger(__name__).warning(f"Breaking expired lock {self.filename}")
+                self.release()
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def held(self) -> bool:
+        """ True if a process holds the lock (and it hasn't expired) """
+        try:
+            return time.time() - os.path.getmtime(self.filename) <= self.expire
+        except FileNotFoundError:
+            return False
+
+    def release(self) -> None:
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+
+class TickerRefresher:
+    """
+        Keeps the ticker file (`.tickers`) up to date.
+
+        When the file is older than `max_age` seconds, it's rebuilt before it
+        is returned. Long-running processes (e.g. `Saxo.watch()`) refresh it
+        in a background thread instead (`get(background=True)`), and keep
+        serving the current snapshot meanwhile; one-shot commands must not,
+        as the thread dies with the process. Only one process refreshes at a
+        time (`FileLock`), and the new file is published with an atomic
+        rename, so readers (see `TickerRegistry`) never see a partial file.
+        A missing file is always built in the foreground.
+
+        Args:
+            build (callable): `build(previous)` returns the new ticker
+                configuration, `previous` is the current one (or `None`)
+            filename (str): Ticker file
+            max_age (float): Seconds before the file is refreshed
+
+        Example:
+            refresher = TickerRefresher(build=saxo.build_tickers)
+            refresher.get()
+    """
+    def __init__(self, build, filename=".tickers", max_age=86400, lock_expire=300) -> None:
+        # Create a logger instance for the class
+        self.logger = logging.getLogger(__name__)
+        self.build = build
+        self.filename = filename
+        self.max_age = max_age
+        self.lock = FileLock(f"{filename}.lock", expire=lock_expire)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.metrics = {"refreshes": 0, "skipped": 0, "errors": 0}
+
+    def age(self) -> float:
+        """ Seconds since the ticker file was written, `None` if missing """
+        try:
+            return time.time() - os.path.getmtime(self.filename)
+        except FileNotFoundError:
+            return None
+
+    def stale(self) -> bool:
+        age = self.age()
+        return age is None or age > self.max_age
+
+    def get(self, background=False) -> dict:
+        """
+            Get the ticker configuration. Refreshes it if it's stale, and
+            builds it if it's missing.
+
+            Args:
+                background (bool): Refresh a stale file in a background thread,
+                    and return the current one (long-running processes only)
+        """
+        if self.age() is None:
+            self.logger.info(f"Building ticker config ({self.filename})..")
+            self.refresh()
+            # Built by another process, wait until it's published (or the
+            # other process gave up). Not if our own build failed.
+            deadline = time.monotonic() + self.lock.expire
+            while self.age() is None and self.lock.held() and time.monotonic() < deadline:
+                time.sleep(0.1)
+        elif self.stale():
+            if background:
+                self.refresh_in_background()
+            else:
+                self.refresh()
+        return utils.read_json(filename=self.filename)
+
+    def refresh_in_background(self) -> threading.Thread:
+        """ Start a refresh, unless one is already running in this process """
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self.logger.info(f"Refreshing ticker config ({self.filename}) in the background")
+                self._thread = threading.Thread(target=self.refresh, name="ticker-refresh", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def refresh(self) -> bool:
+        """
+            Build and publish a new ticker file, if it's stale and no other
+            process is refreshing it.
+
+            Returns:
+                bool: True if a new file was published
+        """
+        if not self.lock.acquire():
+            self.logger.info("Ticker config is refreshed by another process")
+            self.metrics["skipped"] += 1
+            return False
+        try:
+            # Another process may have published while we took the lock
+            if not self.stale():
+                self.metrics["skipped"] += 1
+                return False
+            previous = utils.read_json(filename=self.filename) if self.age() is not None else None
+            self.publish(self.build(previous))
+            self.metrics["refreshes"] += 1
+            return True
+        except Exception as e:
+            self.metrics["errors"] += 1
+            self.logger.error(f"Failed to refresh ticker config: {e}")
+            return False
+        finally:
+            self.lock.release()
+
+    def publish(self, tickers:dict) -> None:
+        """ Write the ticker file (atomic, see `Utils.write_atomic()`) """
+        utils.write_atomic(self.filename, lambda f: json.dump(tickers, f, indent=4))
@@ -3,6 +3,7 @@ import sys
 import ctypes
 import json
 import logging
+import tempfile
 from jsmin import jsmin
 
 class Utils:
@@ -14,6 +15,36 @@ class Utils:
         with open(filename,'w') as f:
             json.dump(data, f, indent=4)
 
+    def write_atomic(self, filename, write, binary=False, prefix=None, suffix=""):
+        """
+            Write a file with `write(f)` to a temp file, and rename it
+            (atomic), so readers never see a partial file. The temp file is
+            removed if writing fails.
+
+            Args:
+                filename (str): File to replace
+                write (callable): Writes the content to the file object `f`
+                binary (bool): Open the temp file in binary mode
+                prefix (str): Prefix of the temp file (default: `<filename>-`)
+                suffix (str): Suffix of the temp file
+
+            Example:
+                utils.write_atomic(".tickers", lambda f: json.dump(tickers, f))
+        """
+        directory = os.path.dirname(os.path.abspath(filename))
+        prefix = prefix or f"{os.path.basename(filename)}-"
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb" if binary else "w") as f:
+                write(f)
+            os.replace(tmp, filename)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
     def read_json(self, filename):
         """
             Read JSON or JS file and return data.
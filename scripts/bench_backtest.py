@@ -0,0 +1,83 @@
+"""
+    Benchmark the P&L backtester on synthetic data.
+
+    Generates years of intraday bars (random walk) for a set of symbols,
+    and signals at the rate of the real feed (TRADE, FLAT, SCALEOUT,
+    CLOSED, FLATSTOP), then runs a parameter sweep inline and in a process
+    pool.
+
+    Usage (from the repo root):
+        python scripts/bench_backtest.py --years 5 --minutes 5 --workers 4
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from northy.backtest import Backtester
+
+SYMBOLS = {"SPX": 4000.0, "NDX": 13000.0, "RUT": 1800.0, "DJIA": 33000.0}
+
+def make_bars(start, count, minutes, price, rng):
+    times = pd.date_range(start, periods=count, freq=f"{minutes}min").values
+    close = price + np.cumsum(rng.normal(0, price * 0.0008, count))
+    open_ = np.concatenate([[price], close[:-1]])
+    spread = np.abs(rng.normal(0, price * 0.0005, count))
+    bars = np.zeros(count, dtype=[("time", "datetime64[ns]"), ("open", "f8"), ("high", "f8"),
+                                  ("low", "f8"), ("close", "f8")])
+    bars["time"], bars["open"], bars["close"] = times, open_, close
+    bars["high"] = np.maximum(open_, close) + spread
+    bars["low"] = np.minimum(open_, close) - spread
+    return bars
+
+def make_events(bars, signals_per_day, rng):
+    events = []
+    days = (bars[next(iter(bars))]["time"][-1] - bars[next(iter(bars))]["time"][0]) / np.timedelta64(1, "D")
+    for symbol, b in bars.items():
+        for i in sorted(rng.integers(0, len(b) - 1, int(days * signals_per_day))):
+            price = b["close"][i]
+            action = rng.choice(["TRADE", "TRADE", "FLAT", "SCALEOUT", "CLOSED", "FLATSTOP"])
+            if action == "TRADE":
+                direction = rng.choice(["LONG", "SHORT"])
+                signal = f"{symbol}_TRADE_{direction}_IN_{price:.0f}_SL_{price * 0.0025:.0f}"
+            elif action == "SCALEOUT":
+                signal = f"{symbol}_SCALEOUT_IN_{price:.0f}_OUT_{price:.0f}_POINTS_0"
+            else:
+                signal = f"{symbol}_{action}"
+            events.append((pd.Timestamp(b["time"][i]).to_pydatetime(), [signal]))
+    return events
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--minutes", type=int, default=5, help="Bar size")
+    parser.add_argument("--signals", type=float, default=0.5, help="Signals per symbol per day")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    rng = np.random.default_rng(1)
+    count = int(args.years * 365 * 24 * 60 / args.minutes)
+    bars = {s: make_bars("2019-01-01", count, args.minutes, p, rng) for s, p in SYMBOLS.items()}
+    events = make_events(bars, args.signals, rng)
+
+    start = time.perf_counter()
+    backtester = Backtester(events, bars)
+    print(f"{len(SYMBOLS)} x {count} bars, {len(events)} signals, setup {time.perf_counter() - start:.2f}s")
+
+    grid = {
+        "stop_points": [{s: p * f for s, p in SYMBOLS.items()} for f in (0.0015, 0.0025, 0.004, 0.006)],
+        "scale_out": [0.25, 0.5, 0.75],
+        "order_preference": ["Market", "Limit"],
+    }
+    runs = 4 * 3 * 2
+    for workers in (0, args.workers):
+        start = time.perf_counter()
+        results = backtester.sweep(grid, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"workers={workers}: {runs} runs in {elapsed:.2f}s ({elapsed / runs * 1000:.0f} ms/run), "
+              f"best P&L {results.pnl.iloc[0]:.0f}, {results.trades.iloc[0]} trades")
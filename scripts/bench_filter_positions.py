@@ -0,0 +1,88 @@
+"""
+    Benchmark SaxoHelper.filter_positions() against the legacy implementation.
+
+    Generates synthetic positions (open, closed and hidden "opposite" legs
+    across all symbols), verifies that both implementations return the same
+    positions for a set of filter combinations and prints calls/sec.
+
+    Usage (from the repo root):
+        python scripts/bench_filter_positions.py --positions 100,1000,5000
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from northy.saxo import SaxoHelper
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+FILTERS = [
+    {},
+    {"cfd_only": False, "profit_only": False},
+    {"symbol": "SPX", "profit_only": False},
+    {"status": ["Closed"], "profit_only": False},
+    {"cfd_only": False, "profit_only": True, "status": ["Open"]},
+]
+
+def make_positions(n, uics, seed=0) -> dict:
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    data = []
+    for i in range(n):
+        opened = start + timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+        status = rnd.choice(["Open", "Closed", "Closed", "Closed", "Working"])
+        p_base = {
+            "Uic": rnd.choice(uics),
+            "AssetType": rnd.choice(["CfdOnIndex", "CfdOnIndex", "CfdOnEtf"]),
+            "Amount": rnd.choice([-2, -1, 1, 2]),
+            "OpenPrice": 4000 + rnd.random() * 100,
+            "Status": status,
+            "ExecutionTimeOpen": opened.strftime(TIME_FORMAT),
+            "RelatedOpenOrders": [],
+        }
+        if status == "Closed":
+            # Some are "opposite" legs, opened after they were closed
+            closed = opened + timedelta(minutes=rnd.randint(-30, 600))
+            p_base["ExecutionTimeClose"] = closed.strftime(TIME_FORMAT)
+        data.append({
+            "PositionId": str(i),
+            "PositionBase": p_base,
+            "PositionView": {"ProfitLossOnTrade": rnd.uniform(-50, 50)},
+        })
+    return {"__count": n, "Data": data}
+
+def bench(func, positions, seconds=1.0) -> float:
+    """ Returns calls/sec (all FILTERS) """
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for filters in FILTERS:
+            func(positions, **filters)
+        calls += len(FILTERS)
+    return calls / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=str, default="100,1000,5000")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    helper = SaxoHelper()
+    uics = [t["Uic"] for t in helper.tickers.values()] or [4913]
+
+    for n in [int(n) for n in args.positions.split(",")]:
+        positions = make_positions(n, uics)
+        mismatches = [f for f in FILTERS if helper.filter_positions(positions, **f)
+                      != helper.filter_positions_legacy(positions, **f)]
+
+        before = bench(helper.filter_positions_legacy, positions)
+        after = bench(helper.filter_positions, positions)
+        print(f"Positions:  {n} ({len(mismatches)} mismatches)")
+        print(f"  Before:   {before:,.0f} calls/sec (filter_positions_legacy)")
+        print(f"  After:    {after:,.0f} calls/sec (filter_positions)")
+        print(f"  Speedup:  {after / before:.1f}x")
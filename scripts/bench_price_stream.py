@@ -0,0 +1,72 @@
+"""
+    Benchmark streamed prices against the local fake streaming server.
+
+    Streams quote deltas for a set of Uics into a QuoteBook and prints
+    deltas/sec, the delay until the last delta is applied, and the latency
+    of reading a quote from the book.
+
+    Usage (from the repo root):
+        python scripts/bench_price_stream.py --uics 20 --deltas 20000
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from northy.saxo_streaming import QuoteBook, PriceSubscription, StreamingConnection
+from northy.saxo_fake_streaming import FakeStreamingServer
+
+PRICES = "/trade/v1/infoprices/subscriptions"
+
+def snapshot(arguments):
+    return [{"Uic": int(uic), "Quote": {"Bid": 100.0, "Ask": 101.0}}
+            for uic in arguments["Uics"].split(",")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uics", type=int, default=20)
+    parser.add_argument("--deltas", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=10, help="Deltas per message")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    uics = list(range(1, args.uics + 1))
+
+    server = FakeStreamingServer(snapshots={PRICES: snapshot})
+    server.start()
+    book = QuoteBook()
+    streaming = StreamingConnection(client=server, url=server.url, token=lambda: "token")
+    streaming.add(PriceSubscription(book, uics, "CfdOnIndex"))
+    streaming.start()
+    streaming.wait_live(timeout=10)
+
+    # Stream deltas, the last one marks the end
+    start = time.perf_counter()
+    for _ in range(0, args.deltas, args.batch):
+        server.push(PRICES, [{"Uic": random.choice(uics), "Quote": {"Bid": 100.0 + j}}
+                             for j in range(args.batch)])
+    sent = time.perf_counter()
+    server.push(PRICES, [{"Uic": uics[0], "Quote": {"Bid": -1.0}}])
+    while book.get(uics[0])["Quote"]["Bid"] != -1.0:
+        time.sleep(0.0001)
+    drained = time.perf_counter()
+    elapsed = drained - start
+
+    # Read latency
+    reads = 100_000
+    read_start = time.perf_counter()
+    for i in range(reads):
+        book.get(uics[i % len(uics)])
+    read_latency = (time.perf_counter() - read_start) / reads
+
+    streaming.stop()
+    server.stop()
+
+    print(f"Uics:         {len(uics)}")
+    print(f"Deltas:       {book.metrics['deltas']:,} ({args.batch} per message)")
+    print(f"Throughput:   {book.metrics['deltas'] / elapsed:,.0f} deltas/sec")
+    print(f"Drain delay:  {(drained - sent) * 1000:,.1f} ms after last send")
+    print(f"Book read:    {read_latency * 1e6:.2f} us/quote")
@@ -0,0 +1,72 @@
+"""
+    Benchmark quote lookups in the cache shared by all processes
+    (SharedQuoteCache) against the in-process QuoteCache.
+
+    Prints the time per lookup, the time to read one raw record (seqlock
+    read, no dict), and the time to store a quote. A second process can
+    write while reading, to include retries of the seqlock.
+
+    Usage (from the repo root):
+        python scripts/bench_shared_quotes.py --lookups 200000 --writer
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from northy.quotes import QuoteCache
+from northy.shared_quotes import SharedQuoteCache
+
+QUOTE = {"Uic": 4912, "AssetType": "CfdOnIndex", "LastUpdated": "2023-08-28T18:55:40.454000Z",
+         "Quote": {"Bid": 15013.92, "Ask": 15014.92, "Mid": 15014.42, "MarketState": "Open",
+                   "PriceTypeBid": "Tradable", "PriceTypeAsk": "Tradable"}}
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+def write(filename, stop):
+    cache = SharedQuoteCache(filename)
+    while not stop.is_set():
+        cache.put(4912, QUOTE)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--writer", action="store_true", help="Write from another process while reading")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    filename = os.path.join(tempfile.mkdtemp(), ".quotes")
+    shared = SharedQuoteCache(filename, ttl=3600)
+    shared.put(4912, QUOTE)
+    local = QuoteCache(ttl=3600)
+    local.put(4912, QUOTE)
+
+    stop = multiprocessing.Event()
+    if args.writer:
+        writer = multiprocessing.Process(target=write, args=(filename, stop))
+        writer.start()
+        time.sleep(0.2)
+
+    offset = shared._find(4912)
+    results = {
+        "QuoteCache.get": timed(lambda: local.get(4912), args.lookups),
+        "SharedQuoteCache.get": timed(lambda: shared.get(4912), args.lookups),
+        "SharedQuoteCache record read": timed(lambda: shared._read(offset), args.lookups),
+        "SharedQuoteCache.put": timed(lambda: shared.put(4912, QUOTE), args.lookups // 10),
+    }
+
+    if args.writer:
+        stop.set()
+        writer.join()
+
+    for name, us in results.items():
+        print(f"{name:<30} {us:8.3f} us")
+    print(f"Seqlock retries: {shared.metrics['retries']}")
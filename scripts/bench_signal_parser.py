@@ -0,0 +1,54 @@
+"""
+    Benchmark Signal.text_to_signal() against the legacy parser.
+
+    Parses every alert tweet in the mock DB (backups/tweets.bson), verifies
+    that both parsers produce the same output and prints tweets/sec.
+
+    Usage (from the repo root):
+        python scripts/bench_signal_parser.py --rounds 5
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from northy.signal2 import Signal
+
+def run(func, tweet):
+    try:
+        return func(tweet=tweet)
+    except Exception as e:
+        return type(e)
+
+def bench(func, tweets, rounds) -> float:
+    """ Returns tweets/sec """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for tweet in tweets:
+            run(func, tweet)
+    return len(tweets) * rounds / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    signal = Signal(production=False)
+    tweets = list(signal.db_tweets.find({"alert": True}))
+
+    # Measure parsing, not log handlers
+    logging.disable(logging.CRITICAL)
+
+    mismatches = [t["tid"] for t in tweets
+        if run(signal.text_to_signal, t) != run(signal.text_to_signal_legacy, t)]
+
+    before = bench(signal.text_to_signal_legacy, tweets, args.rounds)
+    after = bench(signal.text_to_signal, tweets, args.rounds)
+
+    print(f"Tweets:     {len(tweets)} x {args.rounds} rounds")
+    print(f"Mismatches: {len(mismatches)} {mismatches[:10]}")
+    print(f"Before:     {before:,.0f} tweets/sec (text_to_signal_legacy)")
+    print(f"After:      {after:,.0f} tweets/sec (text_to_signal)")
+    print(f"Speedup:    {after / before:.1f}x")
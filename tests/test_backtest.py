@@ -0,0 +1,107 @@
+import numpy as np
+from datetime import datetime
+from northy.bars import BAR_DTYPE
+from northy.backtest import Backtester, Params, parse_signal
+
+# date, open, high, low, close
+BARS = [
+    ("2024-01-01", 100, 101,  99, 100),
+    ("2024-01-02", 100, 106,  99, 105),
+    ("2024-01-03", 105, 111, 104, 110),
+    ("2024-01-04", 110, 112, 100, 101),
+    ("2024-01-05", 101, 102,  95,  96),
+    ("2024-01-08",  99, 100,  97,  98),
+]
+
+def make_bars():
+    bars = np.zeros(len(BARS), dtype=BAR_DTYPE)
+    for i, (date, o, h, l, c) in enumerate(BARS):
+        bars[i] = (np.datetime64(date), o, h, l, c, 0)
+    return bars
+
+def backtest(events, **kwargs):
+    return Backtester(events, {"SPX": make_bars()}, **kwargs)
+
+def test_parse_signal():
+    assert parse_signal("SPX_TRADE_SHORT_IN_4162_SL_10") == {
+        "symbol": "SPX", "action": "TRADE", "direction": -1, "entry": 4162, "stoploss": 10}
+    assert parse_signal("SPX_FLATSTOP")["action"] == "FLATSTOP"
+    assert parse_signal("SPX_LIMIT_LONG_IN_3749_OUT_3739_SL_10") is None
+
+def test_flat_stop():
+    events = [
+        (datetime(2024, 1, 1, 12), ["SPX_TRADE_LONG_IN_100_SL_10"]),
+        (datetime(2024, 1, 3, 12), ["SPX_FLAT"]),
+    ]
+    result = backtest(events).run()
+    # Filled at the next open, stopped at entry after FLAT
+    trade = result.trades.iloc[0]
+    assert (trade.entry, trade.exit, trade.reason, trade.pnl) == (100, 100, "stop", 0)
+    assert str(trade.exit_time.date()) == "2024-01-04"
+
+def test_stop_points_and_scaleout():
+    events = [
+        (datetime(2024, 1, 1, 12), ["SPX_TRADE_LONG_IN_100_SL_10"]),
+        (datetime(2024, 1, 2, 12), ["SPX_SCALEOUT_IN_100_OUT_105_POINTS_5"]),
+    ]
+    b = backtest(events, sizes={"SPX": 4})
+    trades = b.run(Params(stop_points={"SPX": 3})).trades
+    assert list(trades.reason) == ["scaleout", "stop"]
+    assert list(trades.amount) == [1, 3]
+    assert list(trades.pnl) == [5, -9]
+
+    # Stop of the signal, held until the end
+    result = b.run(Params(scale_out=0.5))
+    assert list(result.trades.reason) == ["scaleout", "end"]
+    assert list(result.trades.pnl) == [10, -4]
+    assert list(result.equity) == [10, 6]
+    assert result.stats["trades"] == 2 and result.stats["win_rate"] == 0.5
+    assert result.stats["max_drawdown"] == 4
+
+def test_limit_and_gap():
+    events = [(datetime(2024, 1, 1, 12), ["SPX_TRADE_LONG_IN_96_SL_10"])]
+    trade = backtest(events).run(Params(order_preference="Limit")).trades.iloc[0]
+    assert str(trade.entry_time.date()) == "2024-01-05" and trade.entry == 96
+
+    # Short, the next bar opens above the stop
+    events = [(datetime(2024, 1, 3, 12), ["SPX_TRADE_SHORT_IN_108_SL_1"])]
+    trade = backtest(events).run().trades.iloc[0]
+    assert (trade.entry, trade.exit, trade.reason) == (110, 110, "stop")
+
+def test_closed():
+    events = [
+        (datetime(2024, 1, 1, 23, 30), ["SPX_TRADE_LONG_IN_100_SL_10"]),
+        (datetime(2024, 1, 2, 0, 20), ["SPX_CLOSED", "NDX_CLOSED"]),
+    ]
+    trade = backtest(events).run().trades.iloc[0]
+    assert (trade.exit, trade.reason) == (105, "closed")
+
+def test_sweep():
+    events = [
+        (datetime(2024, 1, 1, 12), ["SPX_TRADE_LONG_IN_100_SL_10"]),
+        (datetime(2024, 1, 2, 12), ["SPX_SCALEOUT_IN_100_OUT_105_POINTS_5"]),
+        (datetime(2024, 1, 3, 12), ["SPX_FLAT"]),
+    ]
+    b = backtest(events, sizes={"SPX": 4})
+    grid = {"stop_points": [{"SPX": 3}, {"SPX": 10}], "scale_out": [0.25, 0.5],
+            "order_preference": ["Market", "Limit"]}
+    inline = b.sweep(grid)
+    assert len(inline) == 8
+    assert list(inline.columns[:3]) == ["stop_SPX", "scale_out", "order_preference"]
+    assert inline.pnl.is_monotonic_decreasing
+    assert b.sweep(grid, workers=2).equals(inline)
+
+def test_intraday_bars():
+    # Hourly bars, the signal before the first bar is skipped
+    bars = np.zeros(4, dtype=BAR_DTYPE)
+    bars["time"] = np.arange("2024-01-02T14", "2024-01-02T18", dtype="datetime64[h]")
+    bars["open"], bars["high"], bars["low"], bars["close"] = [100, 101, 103, 104], 106, 99, 105
+    events = [
+        (datetime(2024, 1, 1, 14), ["SPX_TRADE_SHORT_IN_100_SL_10"]),
+        (datetime(2024, 1, 2, 14, 30), ["SPX_TRADE_LONG_IN_100_SL_10"]),
+    ]
+    trades = Backtester(events, {"SPX": bars}).run().trades
+    assert len(trades) == 1
+    trade = trades.iloc[0]
+    assert (trade.direction, trade.entry, trade.exit, trade.reason) == (1, 101, 105, "end")
+    assert str(trade.entry_time) == "2024-01-02 15:00:00"
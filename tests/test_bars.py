@@ -0,0 +1,131 @@
+import os
+import numpy as np
+import pandas as pd
+from unittest import mock
+from datetime import date
+from northy.bars import BarStore, RollingMean, to_bars
+
+def make_frame(start, periods, first_close=100.0):
+    dates = pd.bdate_range(start, periods=periods)
+    closes = first_close + np.arange(periods, dtype="f8")
+    return pd.DataFrame({"Open": closes, "High": closes + 1, "Low": closes - 1,
+                         "Close": closes, "Volume": 1000.0},
+                        index=pd.Index(dates, name="Date"))
+
+def yahoo_frame(df, ticker="^GSPC"):
+    """ Frame with (column, ticker) columns, as returned by yfinance """
+    df = df.copy()
+    df.columns = pd.MultiIndex.from_product([df.columns, [ticker]])
+    return df
+
+def seeded_store(tmp_path, today=date(2024, 1, 1), **kwargs):
+    csv = os.path.join(tmp_path, "SPX.csv")
+    make_frame("2023-01-02", 250).to_csv(csv)
+    store = BarStore(directory=os.path.join(tmp_path, ".bars"), today=lambda: today, **kwargs)
+    assert store.seed_csv("SPX", csv) == 250
+    return store
+
+def test_seed_csv(tmp_path):
+    store = seeded_store(tmp_path)
+    bars = store.bars("SPX")
+    assert len(bars) == 250
+    assert isinstance(bars, np.memmap)
+    assert store.last_date("SPX") == date(2023, 12, 15)
+    assert store.moving_average("SPX", 200) == np.mean(100.0 + np.arange(50, 250))
+    assert store.moving_average("SPX", 300) is None
+    assert store.bars("NDX").size == 0
+
+def test_update_fetches_missing_days(tmp_path):
+    fetch = mock.Mock(return_value=yahoo_frame(make_frame("2023-12-15", 5, first_close=349.0)))
+    store = seeded_store(tmp_path, fetch=fetch)
+    store.moving_average("SPX", 200)
+
+    # Last stored bar is downloaded again, in case its session was open
+    assert store.update("SPX", "^GSPC") == 4
+    fetch.assert_called_once_with("^GSPC", date(2023, 12, 15))
+    assert len(store.bars("SPX")) == 254
+    assert store.metrics == {"fetches": 1, "bars_fetched": 5}
+
+    expected = pd.Series(store.bars("SPX")["close"]).rolling(200).mean().iloc[-1]
+    assert abs(store.moving_average("SPX", 200) - expected) < 1e-9
+
+def test_update_keeps_average(tmp_path):
+    store = seeded_store(tmp_path)
+    store.moving_average("SPX", 200)
+
+    # Every update replaces the last stored bar, the mean is updated in place
+    for day, today in [("2023-12-15", date(2023, 12, 19)), ("2023-12-18", date(2023, 12, 20))]:
+        store.fetch = mock.Mock(return_value=make_frame(day, 2, first_close=600.0))
+        store.today = lambda: today
+        store.update("SPX", "^GSPC")
+        assert ("SPX", 200) in store._averages
+        expected = pd.Series(store.bars("SPX")["close"]).rolling(200).mean().iloc[-1]
+        assert abs(store.moving_average("SPX", 200) - expected) < 1e-9
+
+    # Fewer bars than replaced, rebuilt from the file
+    store.append("SPX", to_bars(make_frame("2023-12-15", 1, first_close=700.0)))
+    assert ("SPX", 200) not in store._averages
+    expected = pd.Series(store.bars("SPX")["close"]).rolling(200).mean().iloc[-1]
+    assert abs(store.moving_average("SPX", 200) - expected) < 1e-9
+
+def test_update_empty(tmp_path):
+    fetch = mock.Mock(return_value=yahoo_frame(make_frame("2023-01-02", 250)))
+    store = BarStore(directory=os.path.join(tmp_path, ".bars"), fetch=fetch,
+                     today=lambda: date(2024, 1, 1))
+    assert store.update("SPX", "^GSPC") == 250
+    fetch.assert_called_once_with("^GSPC", date(2023, 1, 1))
+
+def test_update_up_to_date(tmp_path):
+    fetch = mock.Mock()
+    store = seeded_store(tmp_path, today=date(2023, 12, 15), fetch=fetch)
+    assert store.update("SPX", "^GSPC") == 0
+    fetch.assert_not_called()
+
+def test_incremental_average(tmp_path):
+    store = seeded_store(tmp_path)
+    before = store.moving_average("SPX", 200)
+    store.append("SPX", to_bars(make_frame("2023-12-18", 1, first_close=550.0)))
+    assert store.moving_average("SPX", 200) == before + (550.0 - 150.0) / 200
+
+def test_intraday(tmp_path):
+    # 5 minute bars with exchange times, as exported from Yahoo Finance
+    times = pd.date_range("2024-01-02 09:30", periods=3, freq="5min", tz="America/New_York")
+    csv = os.path.join(tmp_path, "SPX-5m.csv")
+    pd.DataFrame({"Open": [1.0, 2, 3], "High": [1.0, 2, 3], "Low": [1.0, 2, 3], "Close": [1.0, 2, 3],
+                  "Volume": 0.0}, index=pd.Index(times, name="Datetime")).to_csv(csv)
+
+    fetch = mock.Mock(return_value=make_frame("2024-01-02", 0))
+    store = BarStore(directory=os.path.join(tmp_path, ".bars", "5m"), interval="5m", fetch=fetch,
+                     today=lambda: date(2024, 1, 3))
+    assert store.seed_csv("SPX", csv) == 3
+    bars = store.bars("SPX")
+    assert str(bars["time"][0]) == "2024-01-02T14:30:00.000000000"  # UTC
+    assert np.all(np.diff(bars["time"]) == np.timedelta64(5, "m"))
+    assert store.last_date("SPX") == date(2024, 1, 2)
+
+    # The last day is downloaded again
+    store.update("SPX", "^GSPC")
+    fetch.assert_called_once_with("^GSPC", date(2024, 1, 2))
+
+def test_first_format(tmp_path):
+    # Daily bars stored with a `date` field
+    store = BarStore(directory=str(tmp_path))
+    old = np.zeros(2, dtype=[("date", "datetime64[D]"), ("open", "f8"), ("high", "f8"),
+                             ("low", "f8"), ("close", "f8"), ("volume", "f8")])
+    old["date"], old["close"] = ["2024-01-02", "2024-01-03"], [1.0, 2.0]
+    np.save(store.filename("SPX"), old)
+    assert store.last_date("SPX") == date(2024, 1, 3)
+    store.append("SPX", to_bars(make_frame("2024-01-04", 1, first_close=3.0)))
+    assert list(store.bars("SPX")["close"]) == [1.0, 2.0, 3.0]
+
+def test_rolling_mean():
+    ma = RollingMean(3, [1, 2, 3, 4])
+    assert ma.value == 3
+    ma.push(8)
+    assert ma.value == 5
+    assert RollingMean(3, [1]).value is None
+
+    # Replace the last value
+    assert ma.pop() == 8
+    ma.push(2)
+    assert ma.value == 3
@@ -94,3 +94,89 @@ def test_aggregate():
     assert isinstance(data, list)
     assert len(data) == 1
     assert data[0]["tid"] == "1547926636393218051"
+
+def test_bulk_update():
+    db = Database(production=False)
+    assert db.bulk_update([]) == 0
+
+    updates = [
+        ({"tid": "1547926636393218051"}, {"$set": {"bulk": 1}}),
+        ({"tid": "1234567891"}, {"$set": {"bulk": 2}}),  # Does not exist
+    ]
+    assert db.bulk_update(updates) == 1
+    assert db.get_tweet(tid="1547926636393218051")["bulk"] == 1
+
+def test_resume_token():
+    db = Database(production=False)
+    assert db.get_resume_token("test") == None
+
+    db.save_resume_token("test", {"_data": "1"})
+    db.save_resume_token("test", {"_data": "2"})
+    state = db.get_resume_token("test")
+    assert state["token"] == {"_data": "2"}
+    assert isinstance(state["updated_at"], datetime)
+
+class FakeChangeStream:
+    """ Minimal stand-in for pymongo's ChangeStream """
+    def __init__(self, changes):
+        self.changes = list(changes)
+        self.resume_token = None
+        self.alive = True
+
+    def try_next(self):
+        if not self.changes:
+            self.alive = False
+            return None
+        change = self.changes.pop(0)
+        self.resume_token = change["_id"]
+        return change
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.alive = False
+
+def test_watch_resume():
+    from unittest import mock
+    from pymongo.errors import OperationFailure
+    db = Database(production=False)
+    catchup = mock.Mock()
+    changes = [{"_id": {"_data": str(i)}, "fullDocument": {"tid": str(i)}} for i in range(3)]
+
+    # First start: catch up, then persist token after each handled change
+    with mock.patch.object(db.tweets, "watch", return_value=FakeChangeStream(changes)) as watch:
+        assert [c["fullDocument"]["tid"] for c in db.watch("test", [], catchup=catchup)] == ["0", "1", "2"]
+        assert watch.call_args.kwargs["resume_after"] == None
+    catchup.assert_called_once_with(None)
+    assert db.get_resume_token("test")["token"] == {"_data": "2"}
+
+    # Restart: resume after last token, no catch up
+    catchup.reset_mock()
+    with mock.patch.object(db.tweets, "watch", return_value=FakeChangeStream([])) as watch:
+        assert list(db.watch("test", [], catchup=catchup)) == []
+        assert watch.call_args.kwargs["resume_after"] == {"_data": "2"}
+    catchup.assert_not_called()
+
+    # Expired token: new stream, catch up since token was saved
+    updated_at = db.get_resume_token("test")["updated_at"]
+    expired = OperationFailure("Resume token not found", code=286)
+    with mock.patch.object(db.tweets, "watch", side_effect=[expired, FakeChangeStream([])]) as watch:
+        assert list(db.watch("test", [], catchup=catchup)) == []
+        assert "resume_after" not in watch.call_args.kwargs
+    catchup.assert_called_once_with(updated_at)
+
+    # Other errors are raised
+    with mock.patch.object(db.tweets, "watch", side_effect=OperationFailure("Boom", code=1)):
+        with pytest.raises(OperationFailure):
+            list(db.watch("test", [], catchup=catchup))
+
+def test_checkpoint():
+    db = Database(production=False)
+    assert db.get_checkpoint("test") == None
+
+    db.save_checkpoint("test", last_id=1)
+    db.save_checkpoint("test", last_id=2)
+    checkpoint = db.get_checkpoint("test")
+    assert checkpoint["last_id"] == 2
+    assert isinstance(checkpoint["updated_at"], datetime)
@@ -0,0 +1,98 @@
+import os
+from unittest import mock
+from datetime import datetime, timezone
+from northy.instruments import InstrumentCache
+
+DETAILS = {
+    "Uic": 4913,
+    "AssetType": "CfdOnIndex",
+    "TickSize": 0.25,
+    "MinimumTradeSize": 1,
+    "TradingSessions": {"Sessions": [
+        {"StartTime": "2024-05-01T00:00:00.000000Z", "EndTime": "2024-05-01T13:30:00.000000Z", "State": "Closed"},
+        {"StartTime": "2024-05-01T13:30:00.000000Z", "EndTime": "2024-05-01T20:00:00.000000Z", "State": "AutomatedTrading"},
+    ]},
+}
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def make_cache(tmp_path, **kwargs):
+    fetch = mock.Mock(return_value=DETAILS)
+    filename = os.path.join(tmp_path, ".instruments")
+    return InstrumentCache(fetch=fetch, filename=filename, **kwargs), fetch
+
+def test_persisted(tmp_path):
+    cache, fetch = make_cache(tmp_path)
+    assert cache.get(4913, "CfdOnIndex")["TickSize"] == 0.25
+    assert cache.get(4913, "CfdOnIndex")["TickSize"] == 0.25
+    assert fetch.call_count == 1
+
+    # Loaded from disk
+    cache, fetch = make_cache(tmp_path)
+    assert cache.get(4913, "CfdOnIndex")["MinimumTradeSize"] == 1
+    assert fetch.call_count == 0
+
+def test_save_fails(tmp_path):
+    cache, fetch = make_cache(tmp_path)
+    cache.get(4913, "CfdOnIndex")
+
+    # Not JSON serializable, returned but not cached
+    fetch.return_value = mock.Mock()
+    assert cache.get(4912, "CfdOnIndex") is fetch.return_value
+    assert os.listdir(tmp_path) == [".instruments"]
+
+    # Other details are still cached
+    fetch.return_value = DETAILS
+    cache.get(4914, "CfdOnIndex")
+    cache, fetch = make_cache(tmp_path)
+    cache.get(4913, "CfdOnIndex")
+    cache.get(4914, "CfdOnIndex")
+    assert fetch.call_count == 0
+
+def test_ttl(tmp_path):
+    clock = FakeClock()
+    cache, fetch = make_cache(tmp_path, ttl=60, clock=clock)
+    cache.get(4913, "CfdOnIndex")
+    clock.now += 61
+    cache.get(4913, "CfdOnIndex")
+    assert fetch.call_count == 2
+
+def test_is_market_open(tmp_path):
+    cache, fetch = make_cache(tmp_path)
+    at = lambda hour, minute=0: datetime(2024, 5, 1, hour, minute, tzinfo=timezone.utc)
+    assert cache.is_market_open(4913, "CfdOnIndex", now=at(14))
+    assert not cache.is_market_open(4913, "CfdOnIndex", now=at(13, 29))
+    assert fetch.call_count == 1
+
+    # Sessions are fetched again when they don't cover now
+    assert cache.is_market_open(4913, "CfdOnIndex", now=at(21))
+    assert fetch.call_count == 2
+
+def test_round_price(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    assert cache.round_price(DETAILS, 4148.49) == 4148.5
+    assert cache.round_price(DETAILS, 4148.1) == 4148.0
+    scheme = {"TickSizeScheme": {"DefaultTickSize": 1, "Elements": [{"HighPrice": 100, "TickSize": 0.01}]}}
+    assert cache.round_price(scheme, 50.123) == 50.12
+    assert cache.round_price(scheme, 150.6) == 151
+
+def test_prepare_order(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    order = {"Uic": 4913, "AssetType": "CfdOnIndex", "OrderType": "Limit", "BuySell": "Buy",
+             "Amount": 2, "OrderPrice": 4500.1, "Orders": [
+                {"Uic": 4913, "AssetType": "CfdOnIndex", "OrderType": "StopIfTraded",
+                 "BuySell": "Sell", "Amount": 2, "OrderPrice": 4490.13}]}
+    assert cache.prepare_order(order, quote={"Bid": 4500, "Ask": 4501}) == []
+    assert order["OrderPrice"] == 4500.0
+    assert order["Orders"][0]["OrderPrice"] == 4490.25
+
+    # OnWrongSideOfMarket, InvalidModelState
+    order["Orders"][0]["OrderPrice"] = 4500
+    order["Amount"] = 0
+    problems = cache.prepare_order(order, quote={"Bid": 4500, "Ask": 4501})
+    assert len(problems) == 2
@@ -0,0 +1,38 @@
+import os
+import itertools
+from northy import utils
+from northy.saxo import SaxoHelper
+from northy.position_index import PositionIndex
+
+saxo_helper = SaxoHelper()
+
+def get_mock_data(filename):
+    u = utils.Utils()
+    dir = os.path.dirname(__file__)
+    return u.read_json(os.path.join(dir, f"mock_data/saxo_helper/{filename}"))
+
+def test_same_as_legacy():
+    positions = get_mock_data("filter_pos.json")
+    options = itertools.product([True, False], [True, False], [None, "SPX", "NDX"],
+                                [None, ["Open"], ["Closed"], ["Open", "Closed"]])
+    for cfd_only, profit_only, symbol, status in options:
+        kwargs = dict(cfd_only=cfd_only, profit_only=profit_only, symbol=symbol, status=status)
+        assert saxo_helper.filter_positions(positions, **kwargs) == \
+            saxo_helper.filter_positions_legacy(positions, **kwargs), kwargs
+
+def test_index():
+    positions = get_mock_data("filter_pos.json")["Data"]
+    lookups = []
+    def uic_to_symbol(uic):
+        lookups.append(uic)
+        return saxo_helper.uic_to_symbol(uic)
+
+    index = PositionIndex(positions, uic_to_symbol)
+    assert sum(len(i) for i in index.by_status.values()) == len(positions)
+    index.select(symbol="SPX")
+    index.select(symbol="NDX")
+    assert len(lookups) == len(set(lookups))  # Once per Uic
+
+def test_later():
+    assert PositionIndex.later("2023-04-14T14:08:03.072923Z", "2023-04-14T14:08:02.999999Z")
+    assert not PositionIndex.later("2023-04-14T14:08:03.5Z", "2023-04-14T14:08:03.600000Z")
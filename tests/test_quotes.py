@@ -0,0 +1,40 @@
+from northy.quotes import QuoteCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_instance_is_shared():
+    assert QuoteCache.instance() is QuoteCache.instance()
+    assert QuoteCache.instance() is not QuoteCache.instance("other")
+
+def test_ttl():
+    clock = FakeClock()
+    cache = QuoteCache(ttl=2, clock=clock)
+    assert cache.get(4912) == None
+
+    cache.put(4912, {"Uic": 4912})
+    assert cache.get("4912") == {"Uic": 4912}
+
+    clock.now = 2.5
+    assert cache.get(4912) == None
+    assert cache.get(4912, max_age=5) == {"Uic": 4912}
+    assert cache.metrics == {"hits": 2, "misses": 2}
+
+def test_get_many():
+    cache = QuoteCache(ttl=2, clock=FakeClock())
+    cache.put(4912, {"Uic": 4912})
+    assert cache.get_many([4912, 4913]) == ({4912: {"Uic": 4912}}, [4913])
+
+def test_invalidate():
+    cache = QuoteCache(clock=FakeClock())
+    cache.put(4912, {"Uic": 4912})
+    cache.put(4913, {"Uic": 4913})
+    cache.invalidate(4912)
+    assert cache.get(4912) == None
+    assert cache.get(4913) == {"Uic": 4913}
+    cache.invalidate()
+    assert cache.get(4913) == None
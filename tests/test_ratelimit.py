@@ -0,0 +1,96 @@
+from requests.structures import CaseInsensitiveDict
+from northy.ratelimit import RateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+
+def limiter():
+    clock = FakeClock()
+    return RateLimiter(clock=clock, sleep=clock.sleep), clock
+
+def test_group():
+    rl, _ = limiter()
+    assert rl.group("/trade/v2/orders") == "trade"
+    assert rl.group("/port/v1/positions/me") == "port"
+
+def test_parse_headers():
+    rl, _ = limiter()
+    headers = {
+        "X-RateLimit-SessionOrders-Limit": "1",
+        "x-ratelimit-SessionOrders-remaining": "0",
+        "X-RateLimit-SessionOrders-Reset": "1",
+        "X-RateLimit-Session-Remaining": "invalid",
+        "Content-Type": "application/json",
+    }
+    assert rl.parse_headers(headers) == {
+        "SessionOrders": {"limit": 1, "remaining": 0, "reset": 1},
+    }
+
+def test_no_wait_without_headers():
+    rl, clock = limiter()
+    for _ in range(100):
+        assert rl.acquire("/trade/v2/orders") == 0
+    assert clock.sleeps == []
+
+def test_wait_when_exhausted():
+    rl, clock = limiter()
+    rl.update("/trade/v2/orders", {
+        "X-RateLimit-SessionOrders-Limit": "2",
+        "X-RateLimit-SessionOrders-Remaining": "1",
+        "X-RateLimit-SessionOrders-Reset": "5",
+    })
+
+    # One token left
+    assert rl.acquire("/trade/v2/orders") == 0
+
+    # Other service groups are not limited
+    assert rl.acquire("/port/v1/positions/me") == 0
+
+    # Wait for reset, then the bucket is refilled
+    assert rl.acquire("/trade/v2/orders") == 5
+    assert rl.acquire("/trade/v2/orders") == 0
+    assert rl.acquire("/trade/v2/orders") > 0
+
+def test_backoff():
+    rl, _ = limiter()
+
+    # 429 waits for the exhausted limit to reset
+    rsp = FakeResponse(429, {
+        "X-RateLimit-Session-Remaining": "0",
+        "X-RateLimit-Session-Reset": "7",
+        "X-RateLimit-AppDay-Remaining": "1000",
+        "X-RateLimit-AppDay-Reset": "80000",
+    })
+    assert rl.backoff(rsp, attempt=0) == 7
+    assert rl.backoff(FakeResponse(429, {"Retry-After": "3"}), attempt=0) == 3
+
+    # Exponential backoff otherwise, capped
+    assert 0.4 <= rl.backoff(FakeResponse(409), attempt=0) <= 0.6
+    assert 3.2 <= rl.backoff(FakeResponse(503), attempt=3) <= 4.8
+    assert rl.backoff(FakeResponse(503), attempt=20) <= rl.max_backoff * 1.2
+
+def test_is_rate_limited():
+    rl, _ = limiter()
+    exhausted = {"X-RateLimit-SessionOrders-Remaining": "0", "X-RateLimit-SessionOrders-Reset": "1"}
+    assert rl.is_rate_limited(FakeResponse(429))
+    assert rl.is_rate_limited(FakeResponse(409, exhausted))
+    assert rl.backoff(FakeResponse(409, exhausted), attempt=0) == 1
+
+    # Duplicate order operation
+    assert not rl.is_rate_limited(FakeResponse(409))
+    assert not rl.is_rate_limited(FakeResponse(409, {"X-RateLimit-SessionOrders-Remaining": "3"}))
+    assert not rl.is_rate_limited(FakeResponse(503, exhausted))
@@ -1,6 +1,7 @@
 import os
 import time
 import pytest
+import threading
 import logging
 import requests
 from northy import utils
@@ -229,5 +230,483 @@ def test_scaleout_no_positions(mock_positions):
     # Mock the data returned by Saxo.positions()
     mock_positions.return_value = {'__count': 0, 'Data': []}
     signal = "SPX_SCALEOUT_IN_4153_OUT_3809_POINTS_344"
-    rsp = saxo.trade(signal)
+    with patch.object(saxo.ledger, "fetch", return_value=mock_positions.return_value):
+        rsp = saxo.trade(signal)
     assert rsp == None
+
+def test_missed_alerts():
+    from datetime import datetime, timedelta
+    from northy.db import Database
+    db = Database(production=False)
+    now = datetime.utcnow()
+    for tid, age in [("m1", 5), ("m2", 30), ("m3", 1)]:
+        db.tweets.insert_one({"tid": tid, "alert": True, "signals": [f"{tid}_FLAT"],
+                              "created_at": now - timedelta(minutes=age)})
+
+    # Bounded by max_age
+    missed = saxo.missed_alerts(db, since=now - timedelta(hours=1), max_age=15)
+    assert [d["tid"] for d in missed] == ["m1", "m3"]
+
+    # Bounded by since
+    missed = saxo.missed_alerts(db, since=now - timedelta(minutes=2), max_age=15)
+    assert [d["tid"] for d in missed] == ["m3"]
+
+    # Dispatched alerts are not missed
+    db.tweets.update_one({"tid": "m1"}, {"$set": {"dispatched.UT": now}})
+    missed = saxo.missed_alerts(db, since=now - timedelta(hours=1), max_age=15)
+    assert [d["tid"] for d in missed] == ["m3"]
+
+    # ... to all profiles
+    missed = saxo.missed_alerts(db, since=now - timedelta(hours=1), max_age=15, profiles=["UT", "other"])
+    assert [d["tid"] for d in missed] == ["m1", "m3"]
+
+def test_dispatch():
+    from northy.db import Database
+    db = Database(production=False)
+    db.tweets.insert_one({"tid": "d1", "alert": True, "signals": ["SPX_FLAT", "NDX_FLAT"]})
+    doc = db.tweets.find_one({"tid": "d1"}, {"tid": 1, "signals": 1})
+
+    no_positions = {"__count": 0, "Data": []}
+    with patch.object(saxo, "trade") as trade, \
+         patch.object(saxo.ledger, "reconcile"), \
+         patch.object(saxo.ledger, "positions", return_value=no_positions):
+        assert saxo.dispatch(db, doc) == True
+        assert trade.call_count == 2
+
+        # Signals are executed once only
+        assert saxo.dispatch(db, doc) == False
+        assert trade.call_count == 2
+
+    assert "UT" in db.tweets.find_one({"tid": "d1"})["dispatched"]
+    assert db.tweets.find_one({"tid": "d1"})["signals"] == ["SPX_FLAT", "NDX_FLAT"]
+
+def test_dispatch_profiles():
+    from northy.db import Database
+    db = Database(production=False)
+    db.tweets.insert_one({"tid": "d2", "alert": True, "signals": ["SPX_FLAT"]})
+    doc = db.tweets.find_one({"tid": "d2"}, {"tid": 1, "signals": 1})
+
+    # Traders of different profiles (e.g. market and limit) both claim the alert
+    market, limit = Saxo(profile_name="UT"), Saxo(profile_name="UT")
+    market.profile_name, limit.profile_name = "market", "limit"
+    traded = []
+    assert market.dispatch(db, doc, trade=lambda signals: traded.append("market")) == True
+    assert limit.dispatch(db, doc, trade=lambda signals: traded.append("limit")) == True
+    assert traded == ["market", "limit"]
+
+    # ... once each
+    assert market.dispatch(db, doc, trade=lambda signals: traded.append("market")) == False
+    assert limit.dispatch(db, doc, trade=lambda signals: traded.append("limit")) == False
+    assert traded == ["market", "limit"]
+    assert set(db.tweets.find_one({"tid": "d2"})["dispatched"]) == {"market", "limit"}
+
+def test_watch_max_age():
+    import contextvars
+    from datetime import datetime, timedelta
+    now = datetime.utcnow()
+    fresh = {"_id": 1, "tid": "w1", "signals": ["SPX_FLAT"], "created_at": now - timedelta(minutes=1)}
+    old = {"_id": 2, "tid": "w2", "signals": ["SPX_FLAT"], "created_at": now - timedelta(hours=3)}
+
+    # Changes replayed from the resume token after an outage
+    with patch("northy.saxo.Database") as db, \
+         patch.object(saxo, "ticker_refresher") as refresher:
+        db.return_value.watch.return_value = [{"fullDocument": old}, {"fullDocument": fresh}]
+        refresher.stale.return_value = True
+        dispatched = []
+        # watch() sets the event time of the alerts
+        contextvars.copy_context().run(saxo.watch, max_age=15,
+                                       dispatch=lambda db, doc: dispatched.append(doc["tid"]))
+
+    # Old alerts are not traded, the resume token is kept per profile
+    assert dispatched == ["w1"]
+    assert db.return_value.watch.call_args.args[0] == "saxo-UT"
+
+    # Ticker config is refreshed in the background while watching
+    refresher.get.assert_called_once_with(background=True)
+    refresher.refresh_in_background.assert_called_once()
+
+def test_token_refresh_margin():
+    from northy.secrets_manager import SecretsManager
+    sm = SecretsManager()
+    sm.read(file="conf/saxo_config.encrypted")
+    config = sm.get_dict()
+    # Config values are strings
+    config[config["UT"]["environment"]]["TokenRefreshMargin"] = "90"
+
+    with patch.object(SecretsManager, "get_dict", return_value=config):
+        __saxo = Saxo(profile_name="UT")
+    assert __saxo.tokens.margin == 90
+    __saxo.tokens.stop()
+
+def test_send_retry():
+    from requests.structures import CaseInsensitiveDict
+    class FakeResponse:
+        def __init__(self, status_code, headers=None):
+            self.status_code = status_code
+            self.headers = CaseInsensitiveDict(headers or {})
+
+    __saxo = Saxo(profile_name="UT")
+    sleeps = []
+    __saxo.rate_limiter.sleep = sleeps.append
+
+    # 429 and 503 are retried, waiting for the rate limit to reset
+    limited = {"X-RateLimit-Session-Remaining": "0", "X-RateLimit-Session-Reset": "2"}
+    responses = [FakeResponse(429, limited), FakeResponse(503), FakeResponse(200)]
+    with patch.object(__saxo.s, "request", side_effect=responses) as request:
+        assert __saxo.get("/port/v1/positions/me").status_code == 200
+        assert request.call_count == 3
+    assert sleeps[0] == 2
+
+    # Orders are not retried on 500
+    with patch.object(__saxo.s, "request", side_effect=[FakeResponse(500)]) as request:
+        assert __saxo.post("/trade/v2/orders", data={}).status_code == 500
+        assert request.call_count == 1
+
+    # ... nor on other ambiguous responses, the order might have been placed
+    with patch.object(__saxo.s, "request", side_effect=[FakeResponse(503), FakeResponse(200)]) as request:
+        assert __saxo.post("/trade/v2/orders", data={}).status_code == 503
+        assert request.call_count == 1
+
+    # ... nor on duplicate order operations
+    with patch.object(__saxo.s, "request", side_effect=[FakeResponse(409), FakeResponse(200)]) as request:
+        assert __saxo.post("/trade/v2/orders", data={}).status_code == 409
+        assert request.call_count == 1
+
+    # Orders are retried when rate limited
+    limited = {"X-RateLimit-SessionOrders-Remaining": "0", "X-RateLimit-SessionOrders-Reset": "1"}
+    responses = [FakeResponse(409, limited), FakeResponse(429), FakeResponse(200)]
+    with patch.object(__saxo.s, "request", side_effect=responses) as request:
+        assert __saxo.post("/trade/v2/orders", data={}).status_code == 200
+        assert request.call_count == 3
+
+    # Give up after max_retries
+    with patch.object(__saxo.s, "request", return_value=FakeResponse(429)) as request:
+        assert __saxo.post("/trade/v2/orders", data={}).status_code == 429
+        assert request.call_count == __saxo.max_retries + 1
+
+def test_prices_cached():
+    from northy.quotes import QuoteCache
+    class FakeResponse:
+        status_code = 200
+        def __init__(self, data):
+            self.data = data
+        def json(self):
+            return {"Data": self.data}
+
+    __saxo = Saxo(profile_name="UT")
+    __saxo.quotes = QuoteCache(ttl=60)
+    __saxo.shared_quotes = None
+    quote = lambda uic, bid, ask: {"Uic": uic, "Quote": {"Bid": bid, "Ask": ask, "Mid": (bid + ask) / 2}}
+
+    # One request for all Uics, then served from cache
+    data = [quote(4912, 15000, 15001), quote(4913, 4800, 4801)]
+    with patch.object(__saxo, "get", return_value=FakeResponse(data)) as get:
+        prices = __saxo.prices([4912, 4913])
+        assert sorted(prices) == [4912, 4913]
+        assert get.call_count == 1
+        assert "Uics=4912,4913" in get.call_args.kwargs["path"]
+
+        assert __saxo.price(4912)["Quote"]["Bid"] == 15000
+        assert get.call_count == 1
+
+    # P&L of positions, from cached quotes
+    positions = {"Data": [
+        {"PositionId": "1", "PositionBase": {"Uic": 4912, "Amount": 1, "OpenPrice": 14990}},
+        {"PositionId": "2", "PositionBase": {"Uic": 4913, "Amount": -1, "OpenPrice": 4790}},
+    ]}
+    with patch.object(__saxo, "get") as get:
+        assert __saxo.position_profit(positions) == {"1": 10, "2": -11}
+        assert get.call_count == 0
+
+def test_prices_streamed():
+    from northy.quotes import QuoteCache
+    __saxo = Saxo(profile_name="UT")
+    __saxo.quotes = QuoteCache(ttl=60)
+    __saxo.shared_quotes = None
+    __saxo.quote_book.apply_snapshot([{"Uic": 4912, "Quote": {"Bid": 15000, "Ask": 15001}}])
+
+    # Not live, quotes are fetched
+    with patch.object(__saxo, "get", side_effect=Exception("No network")):
+        with pytest.raises(Exception):
+            __saxo.prices([4912])
+
+    # Live, quotes are read from the book
+    __saxo.quote_book.live = True
+    with patch.object(__saxo, "get") as get:
+        assert __saxo.price(4912)["Quote"]["Bid"] == 15000
+        assert get.call_count == 0
+
+def test_positions_cached():
+    __saxo = Saxo(profile_name="UT")
+    __saxo._client_key = "client"
+    rsp = get_mock_data("positions.json")
+    with patch.object(__saxo, "get") as get:
+        get.return_value.json.return_value = rsp
+        # Fetched once, then read from the ledger
+        for _ in range(3):
+            pos = __saxo.positions(cfd_only=True, profit_only=False, cached=True)
+            assert pos["__count"] == 3
+        assert get.call_count == 1
+
+        # Fetching positions reconciles the ledger
+        __saxo.positions(profit_only=False)
+        assert get.call_count == 2
+        assert __saxo.ledger.metrics["reconciles"] == 2
+
+def test_trade_many():
+    __saxo = Saxo(profile_name="UT")
+    started = {}
+    def trade(signal, show=True, synced=False):
+        assert synced
+        started[signal] = time.monotonic()
+        time.sleep(0.2)
+        if signal == "RUT_FLAT":
+            raise ValueError("failed")
+        return signal
+
+    # Symbols run in parallel, and a failure doesn't stop the others
+    with patch.object(__saxo, "trade", side_effect=trade), \
+         patch.object(__saxo.ledger, "reconcile") as reconcile, \
+         patch.object(__saxo.ledger, "positions", return_value={"__count": 0, "Data": []}) as positions:
+        signals = ["SPX_FLAT", "NDX_FLAT", "RUT_FLAT", "SPX_CLOSED", "SPX_FLATSTOP"]
+        results = __saxo.trade_many(signals)
+    assert results[:2] == ["SPX_FLAT", "NDX_FLAT"]
+    assert isinstance(results[2], ValueError)
+    assert results[4] is None  # Dropped
+    assert reconcile.call_count == 1  # Once before
+    assert positions.call_count == 1  # Printed after
+    assert max(started["NDX_FLAT"], started["RUT_FLAT"]) - started["SPX_FLAT"] < 0.1
+
+    # Same symbol in order
+    assert started["SPX_CLOSED"] - started["SPX_FLAT"] >= 0.2
+
+def test_sync_positions():
+    __saxo = Saxo(profile_name="UT")
+    rsp = get_mock_data("positions.json")
+    with patch.object(__saxo.ledger, "fetch", return_value=rsp) as fetch, \
+         patch.object(__saxo, "action_flat"):
+        # Positions are reconciled before every action on positions, even
+        # if the ledger isn't stale (e.g. a stop-out by the broker)
+        __saxo.ledger.reconcile()
+        __saxo.trade("SPX_FLAT", show=False)
+        __saxo.trade("SPX_FLAT", show=False)
+        assert fetch.call_count == 3
+
+        # ..unless reconciled for the whole plan
+        __saxo.trade("SPX_FLAT", show=False, synced=True)
+        assert fetch.call_count == 3
+
+        # ..or positions are streamed
+        __saxo.ledger.live = True
+        __saxo.trade("SPX_FLAT", show=False)
+        assert fetch.call_count == 3
+
+def test_show_positions():
+    __saxo = Saxo(profile_name="UT")
+    rsp = get_mock_data("positions.json")
+    with patch.object(__saxo.ledger, "fetch", return_value=rsp) as fetch:
+        __saxo.ledger.reconcile({"__count": 0, "Data": []})
+
+        # The position just opened is fetched before printing
+        __saxo.ledger.order_placed(4913)
+        __saxo.show_positions("Positions after trades:")
+        assert fetch.call_count == 1
+
+def test_record_latency():
+    import contextvars
+    from northy.saxo import EVENT_TIME
+    __saxo = Saxo(profile_name="UT")
+    assert __saxo.record_latency("order") is None  # Not executing an alert
+
+    def trade(signal, show=True, synced=False):
+        return __saxo.record_latency("order")
+
+    # Event time is passed on to the threads executing the signals
+    def dispatch():
+        EVENT_TIME.set(time.perf_counter() - 0.05)
+        return __saxo.trade_many(["SPX_TRADE_LONG_IN_4500_SL_10", "NDX_TRADE_LONG_IN_15000_SL_20"])
+
+    with patch.object(__saxo, "trade", side_effect=trade):
+        results = contextvars.copy_context().run(dispatch)
+    assert all(50 <= latency < 1000 for latency in results)
+    assert len(__saxo.latency) == 2
+
+def test_fast_path_defer():
+    import threading
+    __saxo = Saxo(profile_name="UT")
+    caller = threading.current_thread()
+    ran = []
+    __saxo.fast_path = False
+    __saxo.defer(lambda: ran.append(threading.current_thread() is caller))
+
+    # Fast path runs diagnostics in the background, errors are logged
+    __saxo.fast_path = True
+    __saxo.defer(lambda: 1 / 0)
+    __saxo.defer(lambda: ran.append(threading.current_thread() is caller))
+    __saxo._diagnostics.shutdown(wait=True)
+    assert ran == [True, False]
+
+def test_warm_up():
+    __saxo = Saxo(profile_name="UT")
+    with patch.object(__saxo, "get") as get, patch.object(__saxo, "start_keep_alive") as keep_alive:
+        get.return_value.status_code = 200
+        __saxo.warm_up(symbols=["SPX", "NDX"])
+        assert get.call_args.args[0] == "/root/v1/diagnostics/get"
+        assert keep_alive.call_count == 1
+
+    template = __saxo.order_templates["SPX"]
+    assert template.order["Uic"] == __saxo.saxo_helper.symbol_to_uic("SPX")
+    assert template.order["AccountKey"] == __saxo.AccountKey
+    assert template.amount == __saxo.tradesize("SPX")
+
+    # Templates are reused, orders don't modify them
+    with patch.object(__saxo.saxo_helper, "symbol_to_uic") as symbol_to_uic, \
+         patch.object(__saxo, "post") as post:
+        post.return_value.status_code = 400
+        __saxo.market("SPX", amount=1, stoploss_price=4000)
+        assert symbol_to_uic.call_count == 0
+        order = post.call_args.kwargs["data"]
+        assert order["Amount"] == 1 and order["Orders"][0]["AssetType"] == template.order["AssetType"]
+    assert "Amount" not in __saxo.order_templates["SPX"].order
+
+def test_trade_template_defaults():
+    __saxo = Saxo(profile_name="UT")
+    __saxo.profile = dict(__saxo.profile, OrderPreference="Market")
+    template = __saxo.order_template("SPX")
+
+    # Amount of the template, stop from the signal
+    with patch.object(__saxo, "base_order") as base_order:
+        __saxo.trade("SPX_TRADE_LONG_IN_4500_SL_10", show=False)
+        assert base_order.call_args.kwargs["amount"] == template.amount
+        assert base_order.call_args.kwargs["stoploss_price"] == 4490
+
+        # ..or from the template, if the signal has none
+        __saxo.trade("SPX_TRADE_SHORT_IN_4500_SL_0", show=False)
+        assert base_order.call_args.kwargs["stoploss_price"] == 4500 + template.stoploss_points
+
+    # base_order() defaults to the amount of the template
+    with patch.object(__saxo, "post") as post:
+        post.return_value.status_code = 400
+        __saxo.base_order("SPX", stoploss_price=4000)
+        assert post.call_args.kwargs["data"]["Amount"] == template.amount
+
+def test_keep_alive():
+    __saxo = Saxo(profile_name="UT")
+    with patch.object(__saxo, "ping") as ping:
+        __saxo.start_keep_alive(interval=0.05)
+        time.sleep(0.3)
+        __saxo.stop_keep_alive()
+    assert ping.call_count >= 2
+
+def test_pre_validate(tmp_path):
+    from northy.instruments import InstrumentCache
+    __saxo = Saxo(profile_name="UT")
+    details = {"TickSize": 0.25, "MinimumTradeSize": 1, "TradingSessions": {"Sessions": [
+        {"StartTime": "2000-01-01T00:00:00Z", "EndTime": "2100-01-01T00:00:00Z", "State": "Closed"}]}}
+    __saxo.instrument_cache = InstrumentCache(fetch=lambda uic, asset_type: details,
+                                              filename=os.path.join(tmp_path, ".instruments"))
+
+    # Market closed, or invalid orders aren't sent
+    with patch.object(__saxo, "post") as post:
+        assert __saxo.market("SPX", amount=1) is None
+        details["TradingSessions"]["Sessions"][0]["State"] = "AutomatedTrading"
+        assert __saxo.market("SPX", amount=0) is None
+        assert post.call_count == 0
+
+        __saxo.limit("SPX", amount=1, limit=4500.1)
+        assert post.call_args.kwargs["data"]["OrderPrice"] == 4500.0
+
+def test_get_pages():
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+            self.content = str(data).encode()
+        def json(self):
+            return self.data
+
+    __saxo = Saxo(profile_name="UT")
+    __saxo._client_key = "client"
+    next_url = __saxo.base_url + "/port/v1/positions?$skip=2&$top=2"
+    pages = [FakeResponse({"Data": [{"PositionId": "1"}, {"PositionId": "2"}], "__next": next_url}),
+             FakeResponse({"Data": [{"PositionId": "3"}]})]
+
+    with patch.object(__saxo, "get", side_effect=pages) as get:
+        # Pages are requested lazily
+        items = __saxo.get_pages("/port/v1/positions?$top=2")
+        assert next(items)["PositionId"] == "1"
+        assert get.call_count == 1
+        assert [p["PositionId"] for p in items] == ["2", "3"]
+        assert get.call_args.args[0] == "/port/v1/positions?$skip=2&$top=2"
+
+    # Slim, filtered by account
+    with patch.object(__saxo, "get", return_value=FakeResponse({"Data": []})) as get:
+        assert __saxo.fetch_positions() == {"__count": 0, "Data": []}
+        path = get.call_args.args[0]
+        assert f"AccountKey={__saxo.AccountKey}" in path
+        assert "FieldGroups=PositionBase,PositionView" in path
+
+def test_build_tickers():
+    __saxo = Saxo(profile_name="UT")
+    averages = {"RUT": 2000.4, "NDX": 15000.6, "SPX": None, "DJIA": 35000}
+    previous = {"SPX": {"200ma": 4400}, "RUT": {"Uic": 123}}
+    with patch.object(__saxo.bar_store, "update") as update, \
+         patch.object(__saxo.bar_store, "moving_average", side_effect=lambda t, w: averages[t]), \
+         patch.object(__saxo.instrument_cache, "cached", side_effect=ConnectionError):
+        tickers = __saxo.build_tickers(previous=previous)
+        assert update.call_count == 4
+
+    assert tickers["RUT"]["200ma"] == 2000 and tickers["NDX"]["200ma"] == 15001
+    # Values that can't be fetched are taken from the previous config
+    assert tickers["SPX"]["200ma"] == 4400
+    assert tickers["RUT"]["Uic"] == 123
+
+    # Fetches that time out too
+    previous = {symbol: {"200ma": 100 + i} for i, symbol in enumerate(["RUT", "NDX", "SPX", "DJIA"])}
+    release = threading.Event()
+    with patch.object(__saxo.bar_store, "update", side_effect=lambda t, s: release.wait(5)), \
+         patch.object(__saxo.bar_store, "moving_average", return_value=100), \
+         patch.object(__saxo.instrument_cache, "cached", return_value={"Data": [{"Identifier": 456}]}):
+        start = time.monotonic()
+        tickers = __saxo.build_tickers(previous=previous, timeout=0.2)
+        assert time.monotonic() - start < 2
+
+        # Values without a previous value fail the build, instead of
+        # returning an incomplete config
+        del previous["NDX"]
+        with pytest.raises(ValueError, match="NDX 200ma"):
+            __saxo.build_tickers(previous=previous, timeout=0.2)
+        release.set()
+    assert tickers["SPX"]["200ma"] == 102 and tickers["NDX"]["200ma"] == 101
+    assert tickers["RUT"]["Uic"] == 456
+
+def test_prices_shared(tmp_path):
+    from northy.quotes import QuoteCache
+    from northy.shared_quotes import SharedQuoteCache
+    class FakeResponse:
+        status_code = 200
+        def __init__(self, data):
+            self.data = data
+        def json(self):
+            return {"Data": self.data}
+
+    filename = os.path.join(tmp_path, ".quotes")
+    trader, reporter = Saxo(profile_name="UT"), Saxo(profile_name="UT")
+    for s in (trader, reporter):
+        s.quotes = QuoteCache(ttl=60)
+        s.shared_quotes = SharedQuoteCache(filename)
+
+    # Streamed by one process, read by the others without a request
+    trader.quote_book.apply_snapshot([{"Uic": 4912, "AssetType": "CfdOnIndex",
+                                       "Quote": {"Bid": 15000, "Ask": 15001}}])
+    with patch.object(reporter, "get") as get:
+        assert reporter.price(4912, shared=True)["Quote"] == {"Bid": 15000, "Ask": 15001}
+        positions = {"Data": [{"PositionId": "1", "PositionBase": {"Uic": 4912, "Amount": 1, "OpenPrice": 14990}}]}
+        assert reporter.position_profit(positions) == {"1": 10}
+        assert get.call_count == 0
+
+    # Full price response, fetched
+    data = [{"Uic": 4912, "AssetType": "CfdOnIndex",
+             "Quote": {"Bid": 15000, "Ask": 15001, "Amount": 0, "DelayedByMinutes": 0}}]
+    with patch.object(reporter, "get", return_value=FakeResponse(data)) as get:
+        assert reporter.price(4912)["Quote"]["DelayedByMinutes"] == 0
+        assert get.call_count == 1
@@ -0,0 +1,71 @@
+import time
+import pytest
+from unittest.mock import patch
+from northy.saxo import Saxo
+from northy.saxo_fanout import SaxoFanout
+
+def make_account(name):
+    saxo = Saxo(profile_name="UT")
+    saxo.profile_name = name
+    return saxo
+
+def test_profiles():
+    assert "UT" in SaxoFanout.profiles()
+    assert not [p for p in SaxoFanout.profiles() if p.startswith("env")]
+
+def test_trade_many():
+    accounts = [make_account("a"), make_account("b"), make_account("c")]
+    fanout = SaxoFanout(accounts)
+    started = {}
+    def trade_many(name):
+        def _trade_many(signals):
+            started[name] = time.monotonic()
+            time.sleep(0.2)
+            if name == "b":
+                raise ValueError("failed")
+            return signals
+        return _trade_many
+
+    with patch.object(accounts[0], "trade_many", side_effect=trade_many("a")), \
+         patch.object(accounts[1], "trade_many", side_effect=trade_many("b")), \
+         patch.object(accounts[2], "trade_many", side_effect=trade_many("c")):
+        results = fanout.trade_many(["SPX_FLAT"])
+
+    # Accounts trade concurrently, a failing account doesn't affect the others
+    assert results["a"] == results["c"] == ["SPX_FLAT"]
+    assert isinstance(results["b"], ValueError)
+    assert max(started.values()) - min(started.values()) < 0.1
+    fanout.shutdown()
+
+def test_watch():
+    accounts = [make_account("a"), make_account("b")]
+    fanout = SaxoFanout(accounts)
+
+    # One stream, signals are dispatched to all accounts
+    with patch.object(accounts[0], "watch") as watch_a, patch.object(accounts[1], "watch") as watch_b:
+        fanout.watch()
+    assert watch_a.call_args.kwargs["dispatch"] == fanout.dispatch
+    assert watch_a.call_args.kwargs["profiles"] == ["a", "b"]
+    assert watch_b.call_count == 0
+
+def test_dispatch():
+    from northy.db import Database
+    db = Database(production=False)
+    db.tweets.insert_one({"tid": "f1", "alert": True, "signals": ["SPX_FLAT"]})
+    doc = db.tweets.find_one({"tid": "f1"}, {"tid": 1, "signals": 1})
+    accounts = [make_account("a"), make_account("b")]
+    fanout = SaxoFanout(accounts)
+
+    # Account "b" is traded by another process, which claimed the alert already
+    assert accounts[1].claim(db, doc) == True
+    with patch.object(accounts[0], "trade_many", return_value=["a"]) as trade_a, \
+         patch.object(accounts[1], "trade_many", return_value=["b"]) as trade_b:
+        assert fanout.dispatch(db, doc) == {"a": ["a"]}
+        assert fanout.dispatch(db, doc) == {}
+    assert trade_a.call_count == 1
+    assert trade_b.call_count == 0
+    fanout.shutdown()
+
+def test_no_accounts():
+    with pytest.raises(ValueError):
+        SaxoFanout([])
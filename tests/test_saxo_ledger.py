@@ -0,0 +1,92 @@
+import os
+from unittest import mock
+from northy import utils
+from northy.saxo_ledger import PositionLedger
+
+def get_mock_data(filename):
+    u = utils.Utils()
+    dir = os.path.dirname(__file__)
+    return u.read_json(os.path.join(dir, f"mock_data/saxo/{filename}"))
+
+class FakeClock:
+    def __init__(self, now=1000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def make_ledger(**kwargs):
+    fetch = mock.Mock(side_effect=lambda: get_mock_data("positions.json"))
+    return PositionLedger(fetch=fetch, **kwargs), fetch
+
+def test_positions_from_memory():
+    ledger, fetch = make_ledger()
+    assert ledger.stale()
+    assert ledger.positions()["__count"] == 3
+    assert ledger.positions(uic=4913)["__count"] == 3
+    assert ledger.positions(uic=4912)["__count"] == 0
+    assert fetch.call_count == 1
+    assert ledger.metrics["reconciles"] == 1
+
+    # Returned positions are copies
+    ledger.positions()["Data"][0]["PositionBase"]["Amount"] = 0
+    assert ledger.positions()["Data"][0]["PositionBase"]["Amount"] == -17.5
+
+def test_reconcile_when_expired():
+    clock = FakeClock()
+    ledger, fetch = make_ledger(max_age=60, clock=clock)
+    ledger.positions()
+    clock.now += 59
+    ledger.positions()
+    assert fetch.call_count == 1
+    clock.now += 2
+    ledger.positions()
+    assert fetch.call_count == 2
+
+def test_order_placed():
+    ledger, fetch = make_ledger()
+    ledger.positions()
+    ledger.order_placed(4912, order_ids=["1", "2"])
+    assert not ledger.stale(4913)
+    assert ledger.stale(4912)
+
+    # Other Uics are answered without a fetch
+    ledger.positions(uic=4913)
+    assert fetch.call_count == 1
+    ledger.positions(uic=4912, refresh=False)
+    assert fetch.call_count == 1
+
+    ledger.positions(uic=4912)
+    assert fetch.call_count == 2
+    assert not ledger.stale()
+
+def test_position_closed():
+    ledger, fetch = make_ledger()
+    ledger.positions()
+    ledger.position_closed("5015207989")
+    position = [p for p in ledger.positions()["Data"] if p["PositionId"] == "5015207989"][0]
+    assert position["PositionBase"]["Status"] == "Closed"
+    assert position["PositionBase"]["RelatedOpenOrders"] == []
+
+    # Unknown positions are ignored
+    ledger.position_closed("unknown")
+    assert fetch.call_count == 1
+    assert [e["type"] for e in ledger.events] == ["reconciled", "position_closed", "position_closed"]
+
+def test_stoploss_set():
+    ledger, _ = make_ledger()
+    ledger.positions()
+    ledger.stoploss_set("5015207989", 4100)
+    position = ledger.positions()["Data"][0]
+    stops = [o for o in position["PositionBase"]["RelatedOpenOrders"]
+             if o["OpenOrderType"] == "StopIfTraded"]
+    assert [o["OrderPrice"] for o in stops] == [4100]
+
+    # New stop loss order
+    pos_id = position["PositionId"]
+    ledger.reconcile({"Data": [{"PositionId": pos_id,
+                                "PositionBase": {"Uic": 4913, "Amount": -2}}]})
+    ledger.stoploss_set(pos_id, 4100, order_id="42")
+    order = ledger.positions()["Data"][0]["PositionBase"]["RelatedOpenOrders"][0]
+    assert order["OrderId"] == "42"
+    assert order["Amount"] == 2
@@ -0,0 +1,22 @@
+from northy.saxo import Saxo
+from northy.saxo_planner import TradePlanner
+
+planner = TradePlanner(parse=Saxo.signal_to_tuple)
+
+def test_noop_signals():
+    steps = planner.plan(["SPX_FLATSTOP", "SPX_LIMIT_LONG_IN_3749_OUT_3739_SL_10",
+                          "SPX_UNKNOWN", "SPX_TRADE_LONG", "NDX_FLAT", "NDX_FLAT"])
+    assert [(s.index, s.signal) for s in steps] == [(4, "NDX_FLAT")]
+
+def test_reentry():
+    # FLATSTOP is dropped, the re-entry doesn't need positions
+    steps = planner.plan(["SPX_FLATSTOP", "SPX_TRADE_LONG_IN_4500_SL_10"])
+    assert [(s.index, s.action, s.needs_positions) for s in steps] == [(1, "TRADE", False)]
+
+def test_order():
+    signals = ["NDX_FLAT", "SPX_CLOSED", "SPX_TRADE_SHORT_IN_4500_SL_10", "RUT_SCALEOUT_IN_1800_OUT_1850_POINTS_50"]
+    steps = planner.plan(signals)
+
+    # Symbols with entries first, order within a symbol is kept
+    assert [s.signal for s in steps] == [signals[1], signals[2], signals[0], signals[3]]
+    assert [s.needs_positions for s in steps] == [True, False, True, True]
@@ -0,0 +1,193 @@
+import os
+import time
+import pytest
+from unittest import mock
+from northy import utils
+from northy.saxo import SaxoHelper
+from northy.saxo_streaming import (encode_message, decode_messages, merge,
+    QuoteBook, PriceSubscription, PositionSubscription, OrderSubscription,
+    StreamingConnection)
+from northy.saxo_ledger import PositionLedger, OrderStore
+from northy.saxo_fake_streaming import FakeStreamingServer
+
+PRICES = "/trade/v1/infoprices/subscriptions"
+POSITIONS = "/port/v1/positions/subscriptions"
+ORDERS = "/port/v1/orders/subscriptions"
+
+def get_mock_data(filename):
+    u = utils.Utils()
+    dir = os.path.dirname(__file__)
+    return u.read_json(os.path.join(dir, f"mock_data/saxo/{filename}"))
+
+def orders_snapshot(arguments):
+    return [{"OrderId": "1", "Uic": 4913, "Status": "Working", "Price": 3999.0},
+            {"OrderId": "2", "Uic": 4912, "Status": "Working", "Price": 12000.0}]
+
+def quote(uic, bid, ask):
+    return {"Uic": uic, "AssetType": "CfdOnIndex", "Quote": {"Bid": bid, "Ask": ask}}
+
+def snapshot(arguments):
+    uics = [int(uic) for uic in arguments["Uics"].split(",")]
+    return [quote(uic, 100 * uic, 100 * uic + 1) for uic in uics]
+
+def wait_until(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+@pytest.fixture
+def server():
+    server = FakeStreamingServer(snapshots={
+        PRICES: snapshot,
+        POSITIONS: lambda arguments: get_mock_data("positions.json")["Data"],
+        ORDERS: orders_snapshot,
+    }, token="token")
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def stream(server):
+    book = QuoteBook()
+    token = {"value": "token"}
+    streaming = StreamingConnection(client=server, url=server.url,
+                                    token=lambda: token["value"],
+                                    reconnect_delay=0.01, recv_timeout=0.05)
+    streaming.add(PriceSubscription(book, [4912, 4913], "CfdOnIndex"))
+    streaming.start()
+    assert streaming.wait_live(timeout=5)
+    # The client is live before the server registers the connection
+    assert wait_until(lambda: streaming.context_id in server.connections)
+    yield streaming, book, token
+    streaming.stop()
+
+def test_encode_decode():
+    frame = encode_message(1, "prices_1", [{"Uic": 4912}]) + encode_message(2, "_heartbeat", [])
+    assert decode_messages(frame) == [(1, "prices_1", [{"Uic": 4912}]), (2, "_heartbeat", [])]
+
+def test_merge():
+    snapshot = {"Uic": 4912, "Quote": {"Bid": 1, "Ask": 2}, "Tags": [1]}
+    assert merge(snapshot, {"Quote": {"Bid": 3}, "Tags": [2]}) == \
+        {"Uic": 4912, "Quote": {"Bid": 3, "Ask": 2}, "Tags": [2]}
+
+def test_quote_book():
+    book = QuoteBook()
+    book.apply_snapshot([quote(4912, 1, 2)])
+    assert book.get(4912) == None  # Not live
+
+    book.live = True
+    before = book.get(4912)
+    book.apply_delta([{"Uic": 4912, "Quote": {"Bid": 1.5}}])
+    assert book.get(4912)["Quote"] == {"Bid": 1.5, "Ask": 2}
+    assert before["Quote"]["Bid"] == 1  # Quotes are not mutated
+    assert book.get_many([4912, 4913]) == ({4912: book.get(4912)}, [4913])
+
+def test_snapshot_and_deltas(server, stream):
+    streaming, book, _ = stream
+    assert book.get(4912)["Quote"]["Bid"] == 491200
+    assert book.get(4913)["Quote"]["Bid"] == 491300
+
+    server.push(PRICES, [{"Uic": 4912, "Quote": {"Bid": 1}}])
+    assert wait_until(lambda: book.get(4912)["Quote"]["Bid"] == 1)
+    assert book.get(4912)["Quote"]["Ask"] == 491201
+
+    server.heartbeat(streaming.context_id)
+    assert wait_until(lambda: streaming.metrics["heartbeats"] == 1)
+
+def test_reconnect_resume(server, stream):
+    streaming, book, _ = stream
+    server.disconnect(streaming.context_id)
+
+    # Sent while disconnected (or reconnecting), replayed on reconnect
+    server.push(PRICES, [{"Uic": 4912, "Quote": {"Bid": 2}}])
+    assert wait_until(lambda: book.live and book.get(4912) and book.get(4912)["Quote"]["Bid"] == 2)
+    assert wait_until(lambda: streaming.metrics["connects"] == 2)
+
+    # Graceful disconnect
+    server.disconnect(streaming.context_id, graceful=True)
+    server.push(PRICES, [{"Uic": 4913, "Quote": {"Bid": 3}}])
+    assert wait_until(lambda: book.live and book.get(4913) and book.get(4913)["Quote"]["Bid"] == 3)
+
+def test_reset_subscriptions(server, stream):
+    streaming, book, _ = stream
+    reference_id = list(streaming.subscriptions)[0]
+    server.reset_subscriptions(streaming.context_id, [reference_id])
+    assert wait_until(lambda: streaming.metrics["resets"] == 1)
+    # Removed, then re-created with a new reference ID
+    assert wait_until(lambda: reference_id not in streaming.subscriptions
+                      and len(streaming.subscriptions) == 1)
+
+    # New subscription receives deltas
+    server.push(PRICES, [{"Uic": 4912, "Quote": {"Bid": 4}}])
+    assert wait_until(lambda: book.get(4912)["Quote"]["Bid"] == 4)
+
+def test_token_change(server, stream):
+    streaming, book, token = stream
+    server.token = token["value"] = "new token"
+    assert wait_until(lambda: streaming.metrics["connects"] == 2)
+    server.push(PRICES, [{"Uic": 4912, "Quote": {"Bid": 5}}])
+    assert wait_until(lambda: book.get(4912) and book.get(4912)["Quote"]["Bid"] == 5)
+
+def test_stop_deletes_subscriptions(server, stream):
+    streaming, _, _ = stream
+    streaming.stop()
+    assert server.subscriptions == {}
+    assert not streaming.live.is_set()
+
+def test_add_while_connected(server, stream):
+    # e.g. `cli_saxo.py watch --stream_prices --stream_portfolio`
+    streaming, _, _ = stream
+    ledger = PositionLedger(fetch=mock.Mock())
+    streaming.add(PositionSubscription(ledger, "client", "account"))
+    assert wait_until(lambda: ledger.live)
+    assert streaming.metrics["connects"] == 1
+    assert sorted(ref for _, ref in server.subscriptions) == ["positions_2", "prices_1"]
+    assert ledger.positions(uic=4913)["__count"] == 3
+
+    server.push(POSITIONS, [{"PositionId": "5015207989", "__meta_deleted": True}])
+    assert wait_until(lambda: ledger.positions(uic=4913)["__count"] == 2)
+
+def test_portfolio(server):
+    fetch = mock.Mock()
+    ledger = PositionLedger(fetch=fetch)
+    store = OrderStore()
+    streaming = StreamingConnection(client=server, url=server.url, token=lambda: "token",
+                                    reconnect_delay=0.01, recv_timeout=0.05)
+    streaming.add(PositionSubscription(ledger, "client", "account"))
+    streaming.add(OrderSubscription(store, "client", "account"))
+    streaming.start()
+    assert streaming.wait_live(timeout=5)
+
+    # Snapshot, no fetch while live
+    assert not ledger.stale()
+    assert ledger.positions(uic=4913)["__count"] == 3
+    assert store.orders(uic=4913)["__count"] == 1
+    ledger.order_placed(4913)
+    ledger.positions(uic=4913)
+    assert fetch.call_count == 0
+
+    # Same filters as fetched positions
+    helper = SaxoHelper()
+    assert helper.filter_positions(ledger.positions(), profit_only=True)["__count"] == 3
+    server.push(POSITIONS, [{"PositionId": "5015207989",
+                             "PositionView": {"ProfitLossOnTrade": -5.0}}])
+    assert wait_until(lambda: helper.filter_positions(
+        ledger.positions(), profit_only=True)["__count"] == 2)
+    position = ledger.positions()["Data"][0]
+    assert position["PositionBase"]["OpenPrice"] == 4148.49  # Merged
+
+    # Closed and filled
+    server.push(POSITIONS, [{"PositionId": "5015207989", "__meta_deleted": True}])
+    server.push(ORDERS, [{"OrderId": "1", "__meta_deleted": True},
+                         {"OrderId": "2", "Price": 12001.0}])
+    assert wait_until(lambda: ledger.positions()["__count"] == 2)
+    assert wait_until(lambda: store.orders()["__count"] == 1)
+    assert store.get("2")["Price"] == 12001.0
+
+    # Back to fetching when the stream is down
+    streaming.stop()
+    assert not ledger.live and not store.live
+    assert ledger.stale(4913)
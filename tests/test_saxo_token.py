@@ -0,0 +1,84 @@
+import jwt
+import time
+import threading
+from unittest import mock
+from northy.saxo_token import TokenManager
+
+def make_token(expires_in, now=None):
+    now = time.time() if now is None else now
+    return jwt.encode({"exp": int(now + expires_in)}, "secret", algorithm="HS256")
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_expiry_is_decoded_once():
+    clock = FakeClock()
+    tokens = TokenManager(refresh=mock.Mock(), background=False, clock=clock)
+    token = make_token(600, now=clock.now)
+    tokens.set_token(token)
+    assert tokens.expires_in() == 600
+
+    with mock.patch("northy.saxo_token.jwt.decode") as decode:
+        for _ in range(10):
+            assert tokens.get_token() == token
+        assert decode.call_count == 0
+    assert tokens.metrics["requests"] == 10
+    assert tokens.metrics["blocking_refreshes"] == 0
+
+def test_blocking_refresh_when_expired():
+    clock = FakeClock()
+    new_token = make_token(1200, now=clock.now)
+    refresh = mock.Mock(return_value={"access_token": new_token})
+    tokens = TokenManager(refresh=refresh, background=False, clock=clock)
+    tokens.set_token(make_token(-1, now=clock.now))
+
+    assert tokens.expired()
+    assert tokens.get_token() == new_token
+    assert refresh.call_count == 1
+    assert tokens.metrics["blocking_refreshes"] == 1
+
+def test_invalid_token():
+    refresh = mock.Mock(return_value=None)
+    tokens = TokenManager(refresh=refresh, background=False)
+    tokens.set_token("invalid")
+    assert tokens.expired()
+
+    # Refresh failed, token is returned as is
+    assert tokens.get_token() == "invalid"
+    assert tokens.metrics["failed_refreshes"] == 1
+
+def test_background_refresh():
+    refreshed = threading.Event()
+    new_token = make_token(1200)
+    def refresh():
+        refreshed.set()
+        return new_token
+
+    tokens = TokenManager(refresh=refresh, margin=60)
+    tokens.set_token(make_token(60.2))
+    assert tokens.get_token() != new_token
+
+    # Refreshed in the background, before the token expired
+    assert refreshed.wait(timeout=5)
+    for _ in range(50):
+        if tokens.token == new_token:
+            break
+        time.sleep(0.01)
+    assert tokens.get_token() == new_token
+    assert tokens.metrics["background_refreshes"] == 1
+    assert tokens.metrics["blocking_refreshes"] == 0
+    tokens.stop()
+
+def test_concurrent_refresh():
+    refresh = mock.Mock(side_effect=lambda: make_token(1200))
+    tokens = TokenManager(refresh=refresh, background=False)
+    tokens.set_token(make_token(-1))
+
+    threads = [threading.Thread(target=tokens.get_token) for _ in range(5)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert refresh.call_count == 1
@@ -0,0 +1,35 @@
+import time
+import threading
+from northy.scheduler import KeyedScheduler
+
+def test_same_key_in_order():
+    scheduler = KeyedScheduler(max_workers=4)
+    done = []
+    def task(i):
+        time.sleep(0.01 * (5 - i))  # Later tasks are faster
+        done.append(i)
+        return i
+
+    futures = [scheduler.submit("SPX", task, i) for i in range(5)]
+    assert [f.result() for f in futures] == [0, 1, 2, 3, 4]
+    assert done == [0, 1, 2, 3, 4]
+    scheduler.shutdown()
+
+def test_different_keys_in_parallel():
+    scheduler = KeyedScheduler(max_workers=4)
+    barrier = threading.Barrier(3, timeout=5)
+    # Only completes if all three run at the same time
+    futures = [scheduler.submit(key, barrier.wait) for key in ("SPX", "NDX", "RUT")]
+    [f.result() for f in futures]
+    scheduler.shutdown()
+
+def test_exceptions():
+    scheduler = KeyedScheduler(max_workers=2)
+    def fail():
+        raise ValueError("failed")
+
+    failed = scheduler.submit("SPX", fail)
+    ok = scheduler.submit("SPX", lambda: "ok")
+    assert isinstance(failed.exception(), ValueError)
+    assert ok.result() == "ok"
+    scheduler.shutdown()
@@ -0,0 +1,86 @@
+import os
+import multiprocessing
+from northy.shared_quotes import SharedQuoteCache
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def quote(uic, bid, **kwargs):
+    return {"Uic": uic, "AssetType": "CfdOnIndex", "LastUpdated": "2023-08-28T18:55:40.454000Z",
+            "Quote": dict({"Bid": bid, "Ask": bid + 1, "Mid": bid + 0.5, "MarketState": "Open",
+                           "PriceTypeBid": "Tradable", "PriceTypeAsk": "Tradable"}, **kwargs)}
+
+def test_put_get(tmp_path):
+    clock = FakeClock()
+    cache = SharedQuoteCache(os.path.join(tmp_path, ".quotes"), ttl=2, clock=clock)
+    assert cache.get(4912) is None
+
+    cache.put(4912, quote(4912, 15000))
+    assert cache.get(4912) == quote(4912, 15000)
+    assert cache.get_many([4912, 4913]) == ({4912: quote(4912, 15000)}, [4913])
+
+    # Expired
+    clock.now += 3
+    assert cache.get(4912) is None
+    assert cache.get(4912, max_age=5) is not None
+
+    # Missing fields stay missing
+    cache.put(4913, {"Uic": 4913, "Quote": {"Bid": 4800}})
+    assert cache.get(4913) == {"Uic": 4913, "Quote": {"Bid": 4800}}
+
+    cache.invalidate(4913)
+    assert cache.get(4913) is None
+    assert cache.get(4912, max_age=5) is not None
+    assert cache.metrics["hits"] == 5
+
+def test_shared_by_instances(tmp_path):
+    filename = os.path.join(tmp_path, ".quotes")
+    writer = SharedQuoteCache(filename, slots=4)
+    reader = SharedQuoteCache(filename, slots=128)
+    assert reader.slots == 4  # Layout of the existing file
+
+    # 4912 and 4916 share a slot, the second one is probed
+    writer.put_many([quote(4912, 1), quote(4916, 2)])
+    assert reader.get(4912)["Quote"]["Bid"] == 1
+    assert reader.get(4916)["Quote"]["Bid"] == 2
+    writer.put(4912, quote(4912, 3))
+    assert reader.get(4912)["Quote"]["Bid"] == 3
+
+    # Full
+    writer.put_many([quote(4913, 4), quote(4914, 5), quote(4915, 6)])
+    assert writer.metrics["full"] == 1
+    assert reader.get(4915) is None
+
+def test_instance(tmp_path):
+    cache = SharedQuoteCache.instance("https://gateway.saxobank.com/sim/openapi", directory=str(tmp_path))
+    assert cache is SharedQuoteCache.instance("https://gateway.saxobank.com/sim/openapi", directory=str(tmp_path))
+    assert os.path.dirname(cache.filename) == str(tmp_path)
+    assert os.path.basename(cache.filename).startswith(".quotes-")
+    assert cache is not SharedQuoteCache.instance("https://gateway.saxobank.com/openapi", directory=str(tmp_path))
+
+def write_quotes(filename, count):
+    cache = SharedQuoteCache(filename)
+    for i in range(count):
+        cache.put(4912, quote(4912, float(i), Mid=float(i) + 0.5))
+
+def test_consistent_across_processes(tmp_path):
+    filename = os.path.join(tmp_path, ".quotes")
+    reader = SharedQuoteCache(filename, ttl=60)
+    reader.put(4912, quote(4912, 0.0))
+
+    writer = multiprocessing.Process(target=write_quotes, args=(filename, 20000))
+    writer.start()
+    last = 0.0
+    while writer.is_alive():
+        q = reader.get(4912)["Quote"]
+        # Never a mix of two writes, and never older than what was read before
+        assert q["Ask"] == q["Bid"] + 1 and q["Mid"] == q["Bid"] + 0.5
+        assert q["Bid"] >= last
+        last = q["Bid"]
+    writer.join()
+    assert writer.exitcode == 0
+    assert reader.get(4912)["Quote"]["Bid"] == 19999
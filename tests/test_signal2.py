@@ -45,6 +45,85 @@ def test_signal2_updateall():
     # generate test cases for Signal.updateall()
     assert signal.updateall(limit=10) == None
 
+def test_signal2_updateall_fingerprint():
+    # Create new instance of Signal class (and copy of DB)
+    __signal = Signal(production=False)
+
+    # First run parses everything and stores fingerprints
+    __signal.updateall(limit=20, force=True)
+    tweet = __signal.db_tweets.find_one({"alert": True, "signals_fingerprint": {"$exists": True}})
+    assert __signal.fingerprint_is_current(tweet) == True
+
+    # Second run skips all tweets
+    counters = __signal.parse_many(limit=20)
+    assert counters["skipped"] == 20
+    assert counters["parsed"] == 0
+
+    counters = __signal.parse_many(limit=20, force=True)
+    assert counters["skipped"] == 0
+    assert counters["parsed"] + counters["failed"] == 20
+
+def test_signal2_parse_many():
+    # Create new instance of Signal class (and copy of DB)
+    __signal = Signal(production=False)
+
+    progress = []
+    counters = __signal.parse_many(limit=50, batch_size=20, force=True, progress=progress.append)
+    assert counters["total"] == 50
+    assert counters["read"] == 50
+    assert counters["parsed"] + counters["failed"] == 50
+    assert counters["modified"] == counters["parsed"]
+    assert [p["read"] for p in progress] == [20, 40, 50]
+
+    # Same output as Signal.update()
+    tweet = __signal.db_tweets.find_one({"alert": True, "signals_fingerprint": {"$exists": True}})
+    assert __signal.update(tweet["tid"]) == tweet["signals"]
+
+    # Worker processes
+    counters = __signal.parse_many(limit=50, batch_size=20, force=True, workers=2)
+    assert counters["parsed"] + counters["failed"] == 50
+    assert counters["modified"] == 0  # Signals were up-to-date already
+
+def test_signal2_parse_chunk():
+    tweets = [
+        {"tid": "1", "text": "ALERT: Long $SPX | IN 3609 - 10 pt stop"},
+        {"tid": "2", "text": "ALERT: Limit buy long $SPX 5572 - 10 pt stop"},  # No IN price
+    ]
+    results = Signal(production=False, connect=False).parse_chunk(tweets)
+    assert results[0]["signals"] == ["SPX_TRADE_LONG_IN_3609_SL_10"]
+    assert "signals_fingerprint" in results[0]
+    assert results[1] == {"tid": "2", "error": "list index out of range"}
+
+def test_fingerprint_is_current():
+    tweet = {
+        "tid": "123456",
+        "text": "ALERT: Long $NDX $SPX\nIN 4000 - 10 pt stop\nIN 12000 - 25 pt stop",
+        "alert": True,
+    }
+    fingerprint = signal.fingerprint(tweet)
+    assert fingerprint["parser"] > 0
+
+    # No fingerprint
+    assert signal.fingerprint_is_current(tweet) == False
+
+    # Current fingerprint
+    tweet["signals_fingerprint"] = fingerprint
+    assert signal.fingerprint_is_current(tweet) == True
+
+    # Text changed
+    tweet["signals_fingerprint"] = dict(fingerprint, text="0000000000000000")
+    assert signal.fingerprint_is_current(tweet) == False
+
+    # 200ma moved, prices are still closest to the same symbols
+    ma = {k: v + 1 for k, v in fingerprint["200ma"].items()}
+    tweet["signals_fingerprint"] = dict(fingerprint, **{"200ma": ma})
+    assert signal.fingerprint_is_current(tweet) == True
+
+    # 200ma moved, prices are now closest to other symbols
+    ma = dict(fingerprint["200ma"], NDX=4000, SPX=12000)
+    tweet["signals_fingerprint"] = dict(fingerprint, **{"200ma": ma})
+    assert signal.fingerprint_is_current(tweet) == False
+
 def test_signal2_parse():
     # generate test cases for Signal.parse()
     # Invalid Twitter IDs
@@ -112,6 +191,34 @@ def test_text_to_signal_everything():
         assert isinstance(signal.text_to_signal(tweet=i), list) == True
     logger.info(f"Total tweets tested: {len(tweets)}")
 
+def test_text_to_signal_parity():
+    """
+        text_to_signal() must match text_to_signal_legacy() on every alert
+        in the DB, including the exceptions raised on unparsable tweets.
+    """
+    def run(func, tweet):
+        try:
+            return func(tweet=tweet)
+        except Exception as e:
+            return type(e)
+
+    tweets = list(db.tweets.find({"alert": True}))
+    for tweet in tweets:
+        expected = run(signal.text_to_signal_legacy, tweet)
+        assert run(signal.text_to_signal, tweet) == expected, tweet["tid"]
+
+    # Tweets with text that is not normalized in one pass
+    cases = [
+        "ALERT:\n\nClosed 1 scale $SPX short\nIN 4094 OUT 4030 +64",
+        "ALErt: $SPX stop adj to flat.",
+        "ALERT: Short $SPX $JOIN 4000",
+        "ALERT: Closed final $NDX IN :12000 OUT: 12100 + 100",
+    ]
+    for text in cases:
+        tweet = {"tid": "123", "text": text, "alert": True}
+        expected = run(signal.text_to_signal_legacy, tweet)
+        assert run(signal.text_to_signal, tweet) == expected, text
+
 def test_is_trading_signal():
     # generate test cases for Signal.is_trading_signal()
     assert signal.is_trading_signal("ALERT: Closed 3rd scale $SPX long\nIN: 3809 OUT 4153+344") == True
@@ -143,6 +250,13 @@ def test_signal2_backtest():
     # Clean up
     __signal.db.tweets.delete_one({"tid": "123456"})
 
+def test_signal_history():
+    history = signal.signal_history(limit=50)
+    assert 0 < len(history) <= 50
+    times = [created_at for created_at, _ in history]
+    assert times == sorted(times)
+    assert all(isinstance(signals, list) for _, signals in history)
+
 def test_find_INOUT():
     # Get all alerts, where text contains "IN" more than 2 times
     pipeline = [
@@ -248,6 +362,20 @@ def test_get_closest_symbols():
         print(out)
         assert isinstance(out, dict) == True
 
+def test_assignment_changed():
+    old_ma = {"NDX": 12000, "SPX": 4000, "RUT": 1800, "DJIA": 34000}
+    new_ma = {"NDX": 12500, "SPX": 4200, "RUT": 1900, "DJIA": 35000}
+    assert signal_helper.closest_symbol(4100, old_ma) == "SPX"
+
+    # Single numbers are never guessed
+    assert signal_helper.assignment_changed([8000], old_ma, new_ma) == False
+
+    # Same guess before and after
+    assert signal_helper.assignment_changed([4100, 12100], old_ma, new_ma) == False
+
+    # 8100 is closer to NDX before and closer to SPX after
+    assert signal_helper.assignment_changed([4100, 8100], old_ma, new_ma) == True
+
 def test_watch_log():
     # Get a sample of tweets without alerts
     pipeline = [
@@ -267,6 +395,31 @@ def test_watch_log_error():
 def test_refresh_backlog():
     signal.refresh_backlog(limit=100)
 
+def test_refresh_backlog_checkpoint():
+    # Create new instance of Signal class (and copy of DB)
+    __signal = Signal(production=False)
+    backlog = {"alert": {"$exists": False}}
+    total = __signal.db_tweets.count_documents(backlog)
+
+    # Limit is honoured, next run continues after the checkpoint
+    __signal.refresh_backlog(limit=100)
+    first = __signal.db.get_checkpoint("signal_backlog")["last_id"]
+    assert __signal.db_tweets.count_documents(dict(backlog, _id={"$lte": first})) == 100
+    __signal.refresh_backlog(limit=100)
+    second = __signal.db.get_checkpoint("signal_backlog")["last_id"]
+    assert __signal.db_tweets.count_documents(dict(backlog, _id={"$gt": first, "$lte": second})) == 100
+
+    # Read the rest, nothing left afterwards
+    assert __signal.refresh_backlog(limit=0) > 0
+    assert total > 200
+    assert __signal.refresh_backlog(limit=0) == 0
+
+    # Only new tweets are read
+    __signal.db_tweets.insert_one({"tid": "1", "text": "ALERT: Short $SPX | IN 4000 - 10 pt stop"})
+    __signal.db_tweets.insert_one({"tid": "2", "text": "Live alerts are back"})
+    assert __signal.refresh_backlog() == 1
+    assert __signal.db_tweets.find_one({"tid": "1"})["signals"] == ["SPX_TRADE_SHORT_IN_4000_SL_10"]
+
 def test_manual():
     # Non-existing tweet
     assert signal.manual(tid="1234567890") == None
@@ -0,0 +1,44 @@
+from northy.signal_grammar import SignalGrammar, TweetTokens
+
+grammar = SignalGrammar()
+
+def test_normalize_text():
+    text = "ALERT: Closed 2nd scale $NDX add-on\n\nIN 11818 OUT 12360 +542"
+    expected = "CLOSED 2ND SCALE $NDX ADD-ON | | IN 11818 OUT 12360 +542"
+    assert grammar.normalize_text(text) == expected
+    assert grammar.is_normalized(expected) == True
+
+    # Not idempotent, upper() exposes "ALERT: " after it was removed
+    text = grammar.normalize_text("ALErt: $SPX stop adj to flat.")
+    assert text == "ALERT: $SPX STOP ADJ TO FLAT."
+    assert grammar.is_normalized(text) == False
+
+def test_tokenize():
+    tokens = grammar.tokenize("ALERT: Closed 3rd scale $NDX add-on\nIN 11818 OUT 12760 + 942")
+    assert isinstance(tokens, TweetTokens)
+    assert tokens.symbols == ["NDX"]
+    assert tokens.keywords == {"CLOSED", "OUT"}
+    assert tokens.IN == [11818]
+    assert tokens.OUT == [12760]
+    assert tokens.POINTS == [942]
+
+def test_tokenize_multiple_symbols():
+    text = "ALERT: Long $NDX $SPX $RUT\n\nIN 3713 - 10 pt stop\nIN 11348 - 25 pt stop\nIN: 1703 - 10 pt stop"
+    tokens = grammar.tokenize(text)
+    assert tokens.symbols == ["NDX", "RUT", "SPX"]
+    assert tokens.keywords == {"LONG"}
+    assert tokens.IN == [3713, 11348, 1703]
+    assert tokens.OUT == []
+
+def test_tokenize_overlapping():
+    # "$JOIN 4000" is both a symbol and an entry price
+    tokens = grammar.tokenize("SHORT $JOIN 4000 ABOUT")
+    assert tokens.symbols == ["JOIN"]
+    assert tokens.IN == [4000]
+    assert tokens.keywords == {"SHORT", "OUT"}
+
+    # Colons are treated as spaces
+    tokens = grammar.tokenize("CLOSED $SPX IN : 4000 OUT:4100 OUT:|4200 +100")
+    assert tokens.IN == [4000]
+    assert tokens.OUT == [4100]
+    assert tokens.POINTS == [100]
@@ -0,0 +1,187 @@
+import os
+import sys
+import time
+import pytest
+import threading
+import subprocess
+from unittest import mock
+from northy.utils import Utils
+from northy.tickers import TickerRegistry, TickerRefresher, FileLock
+
+u = Utils()
+
+tickers = {
+    "NDX": { "Uic": 4912, "AssetType": "CfdOnIndex", "stoploss_points": 25 },
+    "SPX": { "Uic": 4913, "AssetType": "CfdOnIndex", "stoploss_points": 10 },
+    "RUT": { "Uic": 31933, "AssetType": "CfdOnEtf", "stoploss_points": 10 },
+}
+
+@pytest.fixture
+def ticker_file(tmp_path):
+    filename = str(tmp_path / ".tickers")
+    u.write_json(tickers, filename=filename)
+    return filename
+
+def test_instance_is_shared():
+    assert TickerRegistry.instance() is TickerRegistry.instance()
+    assert TickerRegistry.instance() is not TickerRegistry.instance("other")
+
+def test_lookups(ticker_file):
+    registry = TickerRegistry(ticker_file)
+    assert registry.tickers == tickers
+    assert registry.symbol_to_uic("SPX") == 4913
+    assert registry.symbol_to_uic("INVALID") == None
+    assert registry.uic_to_symbol(4912) == "NDX"
+    assert registry.uic_to_symbol(0) == None
+    assert registry.uic_to_asset_type(31933) == "CfdOnEtf"
+    assert registry.uic_to_asset_type(0) == None
+
+def test_reload_on_change(ticker_file):
+    registry = TickerRegistry(ticker_file, check_interval=0)
+    assert registry.symbol_to_uic("DJIA") == None
+
+    # File is not read again, as long as it's unchanged
+    tickers_before = registry.tickers
+    assert registry.tickers is tickers_before
+
+    # Update file and bump mtime
+    updated = dict(tickers, DJIA={ "Uic": 4911, "AssetType": "CfdOnIndex" })
+    u.write_json(updated, filename=ticker_file)
+    mtime = os.stat(ticker_file).st_mtime_ns + 1_000_000_000
+    os.utime(ticker_file, ns=(mtime, mtime))
+
+    assert registry.symbol_to_uic("DJIA") == 4911
+    assert registry.uic_to_symbol(4911) == "DJIA"
+
+def test_missing_file(tmp_path):
+    registry = TickerRegistry(str(tmp_path / "missing"))
+    assert registry.tickers == {}
+    assert registry.symbol_to_uic("SPX") == None
+
+def test_version(ticker_file):
+    registry = TickerRegistry(ticker_file, check_interval=0)
+    version = registry.version
+    assert isinstance(version, str)
+    assert registry.moving_averages == {"NDX": None, "SPX": None, "RUT": None}
+
+    def update(data):
+        u.write_json(data, filename=ticker_file)
+        mtime = os.stat(ticker_file).st_mtime_ns + 1_000_000_000
+        os.utime(ticker_file, ns=(mtime, mtime))
+
+    # 200ma changes don't change the version
+    update({s: dict(v, **{"200ma": 100}) for s, v in tickers.items()})
+    assert registry.version == version
+    assert registry.moving_averages["SPX"] == 100
+
+    # Config changes do
+    update(dict(tickers, SPX=dict(tickers["SPX"], stoploss_points=15)))
+    assert registry.version != version
+
+def make_old(filename, age=2 * 86400):
+    mtime = os.path.getmtime(filename) - age
+    os.utime(filename, (mtime, mtime))
+
+def test_refresher_builds_missing_file(tmp_path):
+    filename = str(tmp_path / ".tickers")
+    build = mock.Mock(return_value=tickers)
+    refresher = TickerRefresher(build=build, filename=filename)
+    assert refresher.get() == tickers
+    build.assert_called_once_with(None)
+    assert not os.path.exists(f"{filename}.lock")
+
+def test_refresher_missing_file_build_fails(tmp_path):
+    filename = str(tmp_path / ".tickers")
+    refresher = TickerRefresher(build=mock.Mock(side_effect=ValueError), filename=filename)
+
+    # Nothing is published, and there is nothing to wait for
+    start = time.monotonic()
+    assert refresher.get() is None
+    assert time.monotonic() - start < 1
+    assert not os.path.exists(filename)
+
+def test_refresher_waits_for_other_process(tmp_path):
+    filename = str(tmp_path / ".tickers")
+    build = mock.Mock(return_value=tickers)
+    refresher = TickerRefresher(build=build, filename=filename)
+
+    # Another process is building the missing file
+    lock = FileLock(f"{filename}.lock")
+    assert lock.acquire()
+    def publish():
+        time.sleep(0.2)
+        refresher.publish(tickers)
+        lock.release()
+    threading.Thread(target=publish).start()
+
+    assert refresher.get() == tickers
+    build.assert_not_called()
+
+def test_refresher_serves_snapshot_while_refreshing(ticker_file):
+    make_old(ticker_file)
+    release = threading.Event()
+    updated = dict(tickers, DJIA={ "Uic": 4911, "AssetType": "CfdOnIndex" })
+    def build(previous):
+        release.wait(5)
+        return updated
+
+    refresher = TickerRefresher(build=build, filename=ticker_file)
+    assert refresher.get(background=True) == tickers
+    thread = refresher.refresh_in_background()
+    assert refresher.get(background=True) == tickers  # One refresh at a time
+    assert refresher.refresh_in_background() is thread
+
+    release.set()
+    thread.join(5)
+    assert refresher.get() == updated
+    assert refresher.metrics["refreshes"] == 1
+
+def test_refresher_refreshes_stale_file(ticker_file):
+    # One-shot command, e.g. `cli_saxo.py tconf`: the stale file is
+    # republished before the process exits
+    make_old(ticker_file)
+    updated = dict(tickers, DJIA={ "Uic": 4911, "AssetType": "CfdOnIndex" })
+    script = (
+        "import sys, time\n"
+        "from northy.tickers import TickerRefresher\n"
+        "def build(previous):\n"
+        "    time.sleep(0.2)\n"
+        f"    return {updated!r}\n"
+        "TickerRefresher(build=build, filename=sys.argv[1]).get()\n"
+    )
+    subprocess.run([sys.executable, "-c", script, ticker_file], check=True,
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    assert u.read_json(filename=ticker_file) == updated
+    assert not TickerRefresher(build=None, filename=ticker_file).stale()
+    assert not os.path.exists(f"{ticker_file}.lock")
+
+def test_refresher_lock(ticker_file):
+    make_old(ticker_file)
+    build = mock.Mock(return_value=tickers)
+    refresher = TickerRefresher(build=build, filename=ticker_file, lock_expire=60)
+
+    # Another process is refreshing
+    lock = FileLock(f"{ticker_file}.lock")
+    assert lock.acquire()
+    assert not lock.acquire()
+    assert refresher.refresh() is False
+    build.assert_not_called()
+
+    # Lock of a crashed process expires
+    make_old(f"{ticker_file}.lock", age=120)
+    assert refresher.refresh() is True
+    build.assert_called_once_with(tickers)
+    assert not refresher.stale()
+
+    # Published by another process while waiting for the lock
+    assert refresher.refresh() is False
+    assert build.call_count == 1
+
+def test_refresher_keeps_file_on_error(ticker_file):
+    make_old(ticker_file)
+    refresher = TickerRefresher(build=mock.Mock(side_effect=ValueError), filename=ticker_file)
+    assert refresher.refresh() is False
+    assert refresher.metrics["errors"] == 1
+    assert refresher.get() == tickers
+    assert not os.path.exists(f"{ticker_file}.lock")
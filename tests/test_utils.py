@@ -18,3 +18,18 @@ def test_file_rw():
     # Cleanup
     os.remove(filename)
 
+
+def test_write_atomic(tmp_path):
+    import json
+    filename = str(tmp_path / "data.json")
+    u.write_atomic(filename, lambda f: json.dump({"hello": "world"}, f))
+    assert u.read_json(filename=filename) == {"hello": "world"}
+
+    # File is kept, and the temp file removed
+    def fail(f):
+        f.write("partial")
+        raise ValueError("failed")
+    with pytest.raises(ValueError):
+        u.write_atomic(filename, fail)
+    assert u.read_json(filename=filename) == {"hello": "world"}
+    assert os.listdir(tmp_path) == ["data.json"]